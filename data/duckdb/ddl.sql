@@ -1,23 +1,23 @@
 CREATE TABLE IF NOT EXISTS fact_dk_props (
-    subcategory_subcategoryId VARCHAR,
+    subcategory_subcategoryId BIGINT,
     subcategory_name VARCHAR,
     offer_label VARCHAR,
     offer_providerOfferId VARCHAR,
-    offer_eventId VARCHAR,
-    offer_eventGroupId VARCHAR,
+    offer_eventId BIGINT,
+    offer_eventGroupId BIGINT,
     offer_playerNameIdentifier VARCHAR,
     outcome_label VARCHAR,
-    outcome_oddsAmerican VARCHAR,
+    outcome_oddsAmerican INTEGER,
     outcome_oddsDecimal DOUBLE,
     outcome_line DOUBLE,
-    participant_id VARCHAR,
+    participant_id BIGINT,
     participant_name VARCHAR,
     participant_type VARCHAR,
     timestamp TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS dim_participant (
-    participant_id VARCHAR PRIMARY KEY,
+    participant_id BIGINT PRIMARY KEY,
     participant_name VARCHAR,
     participant_type VARCHAR
 );
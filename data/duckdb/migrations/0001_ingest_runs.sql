@@ -0,0 +1,59 @@
+/*
+Every load into fact_dk_offers belongs to an ingest run. The projection queries
+read the latest completed run with `run_id = $run_id` instead of a
+max(timestamp) window. Runs are appended in run_id order, so each row group's
+run_id zone map is narrow and DuckDB skips every row group of older runs.
+*/
+CREATE TABLE IF NOT EXISTS fact_dk_offers (
+    subcategory_subcategoryId VARCHAR,
+    subcategory_name VARCHAR,
+    offer_label VARCHAR,
+    offer_providerOfferId VARCHAR,
+    offer_eventId VARCHAR,
+    offer_eventGroupId VARCHAR,
+    offer_playerNameIdentifier VARCHAR,
+    outcome_label VARCHAR,
+    outcome_oddsAmerican VARCHAR,
+    outcome_oddsDecimal DOUBLE,
+    outcome_line DOUBLE,
+    participant_id VARCHAR,
+    participant_name VARCHAR,
+    participant_type VARCHAR,
+    timestamp TIMESTAMP
+);
+
+CREATE SEQUENCE IF NOT EXISTS ingest_run_id_seq START 1;
+
+CREATE TABLE IF NOT EXISTS ingest_runs (
+    run_id BIGINT PRIMARY KEY DEFAULT nextval('ingest_run_id_seq'),
+    started_at TIMESTAMP NOT NULL,
+    completed_at TIMESTAMP,
+    status VARCHAR NOT NULL, -- running, completed or failed
+    rows_loaded BIGINT,
+    subcategories_loaded INTEGER,
+    subcategories_carried_forward INTEGER
+);
+
+ALTER TABLE fact_dk_offers ADD COLUMN IF NOT EXISTS run_id BIGINT;
+
+/* 
+Backfill: scrapes start at :17 and take under 15 minutes, so each hour of
+existing snapshots is one run.
+*/
+INSERT INTO ingest_runs (started_at, completed_at, status, rows_loaded)
+SELECT min(timestamp), max(timestamp), 'completed', count(*)
+FROM fact_dk_offers
+WHERE run_id IS NULL
+GROUP BY date_trunc('hour', timestamp)
+ORDER BY 1;
+
+UPDATE fact_dk_offers SET run_id = ingest_runs.run_id
+FROM ingest_runs
+WHERE 
+    fact_dk_offers.run_id IS NULL
+    AND fact_dk_offers.timestamp BETWEEN ingest_runs.started_at AND ingest_runs.completed_at;
+
+CREATE OR REPLACE VIEW latest_ingest_run AS
+SELECT max(run_id) AS run_id
+FROM ingest_runs
+WHERE status = 'completed';
@@ -0,0 +1,118 @@
+/*
+Odds history: one row per (subcategory, offer, outcome, participant) price
+interval instead of one row per run. An interval opens at valid_from when a
+price is first seen and closes at valid_to when the price, line or outcome
+changes or disappears; valid_to is NULL while the price is current.
+run_id / closed_run_id are the ingest runs that opened and closed it.
+*/
+CREATE TABLE IF NOT EXISTS fact_dk_odds_history (
+    subcategory_subcategoryId VARCHAR,
+    subcategory_name VARCHAR,
+    offer_label VARCHAR,
+    offer_providerOfferId VARCHAR,
+    offer_eventId VARCHAR,
+    offer_eventGroupId VARCHAR,
+    offer_playerNameIdentifier VARCHAR,
+    outcome_label VARCHAR,
+    outcome_oddsAmerican VARCHAR,
+    outcome_oddsDecimal DOUBLE,
+    outcome_line DOUBLE,
+    participant_id VARCHAR,
+    participant_name VARCHAR,
+    participant_type VARCHAR,
+    valid_from TIMESTAMP NOT NULL,
+    valid_to TIMESTAMP,
+    run_id BIGINT,
+    closed_run_id BIGINT
+);
+
+/*
+Backfill from the fact_dk_offers snapshots. Each subcategory's runs are
+numbered; consecutive observations of a key at the same price form one
+interval, which closes at the subcategory's next run after its last
+observation (or stays open if that was the subcategory's latest run).
+*/
+INSERT INTO fact_dk_odds_history
+WITH
+    subcategory_runs AS (
+        SELECT
+            subcategory_subcategoryId ,
+            run_id ,
+            min(timestamp) AS run_timestamp ,
+            row_number() OVER (PARTITION BY subcategory_subcategoryId ORDER BY run_id) AS seq
+        FROM fact_dk_offers
+        GROUP BY subcategory_subcategoryId, run_id
+    ),
+    subcategory_runs_next AS (
+        SELECT
+            * ,
+            lead(run_id) OVER (PARTITION BY subcategory_subcategoryId ORDER BY seq) AS next_run_id ,
+            lead(run_timestamp) OVER (PARTITION BY subcategory_subcategoryId ORDER BY seq) AS next_run_timestamp
+        FROM subcategory_runs
+    ),
+    observations AS (
+        SELECT
+            o.* ,
+            r.seq ,
+            r.next_run_id ,
+            r.next_run_timestamp
+        FROM fact_dk_offers o
+        JOIN subcategory_runs_next r USING (subcategory_subcategoryId, run_id)
+    ),
+    starts AS (
+        SELECT
+            * ,
+            CASE WHEN
+                lag(seq) OVER w IS DISTINCT FROM seq - 1
+                OR lag(outcome_oddsAmerican) OVER w IS DISTINCT FROM outcome_oddsAmerican
+                OR lag(outcome_oddsDecimal) OVER w IS DISTINCT FROM outcome_oddsDecimal
+                OR lag(outcome_line) OVER w IS DISTINCT FROM outcome_line
+            THEN 1 ELSE 0 END AS is_start
+        FROM observations
+        WINDOW w AS (PARTITION BY subcategory_subcategoryId, offer_providerOfferId, outcome_label, participant_id ORDER BY seq)
+    ),
+    islands AS (
+        SELECT
+            * ,
+            sum(is_start) OVER (
+                PARTITION BY subcategory_subcategoryId, offer_providerOfferId, outcome_label, participant_id 
+                ORDER BY seq ROWS UNBOUNDED PRECEDING
+            ) AS island
+        FROM starts
+    )
+SELECT
+    subcategory_subcategoryId ,
+    arg_min(subcategory_name, seq) ,
+    arg_min(offer_label, seq) ,
+    offer_providerOfferId ,
+    arg_min(offer_eventId, seq) ,
+    arg_min(offer_eventGroupId, seq) ,
+    arg_min(offer_playerNameIdentifier, seq) ,
+    outcome_label ,
+    arg_min(outcome_oddsAmerican, seq) ,
+    arg_min(outcome_oddsDecimal, seq) ,
+    arg_min(outcome_line, seq) ,
+    participant_id ,
+    arg_min(participant_name, seq) ,
+    arg_min(participant_type, seq) ,
+    min(timestamp) AS valid_from ,
+    -- arg_max skips NULLs, so an island reaching the latest run would be closed
+    -- at its own last run; NULL (still open) has to win explicitly
+    CASE WHEN bool_or(next_run_id IS NULL) THEN NULL ELSE max(next_run_timestamp) END AS valid_to ,
+    arg_min(run_id, seq) AS run_id ,
+    CASE WHEN bool_or(next_run_id IS NULL) THEN NULL ELSE max(next_run_id) END AS closed_run_id
+FROM islands
+GROUP BY subcategory_subcategoryId, offer_providerOfferId, outcome_label, participant_id, island;
+
+CREATE OR REPLACE VIEW current_dk_odds AS
+SELECT * FROM fact_dk_odds_history WHERE valid_to IS NULL;
+
+-- Snapshot as of a point in time, e.g. SELECT * FROM dk_odds_as_of(TIMESTAMP '2024-09-01 12:00:00')
+CREATE OR REPLACE MACRO dk_odds_as_of(as_of) AS TABLE
+SELECT * FROM fact_dk_odds_history
+WHERE valid_from <= as_of AND (valid_to IS NULL OR valid_to > as_of);
+
+-- Snapshot as seen by an ingest run, e.g. SELECT * FROM dk_odds_as_of_run(42)
+CREATE OR REPLACE MACRO dk_odds_as_of_run(as_of_run_id) AS TABLE
+SELECT * FROM fact_dk_odds_history
+WHERE run_id <= as_of_run_id AND (closed_run_id IS NULL OR closed_run_id > as_of_run_id);
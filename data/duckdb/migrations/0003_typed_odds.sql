@@ -0,0 +1,109 @@
+/*
+Typed odds columns: American odds become INTEGER and the numeric DraftKings IDs
+BIGINT, so queries no longer cast per row and a Unicode minus sign ('−110') no
+longer breaks them. Odds are normalized the same way as at parse time (see
+utils.columnar_utils.normalize_american_odds): malformed values become NULL.
+offer_providerOfferId is not guaranteed numeric and stays VARCHAR.
+
+Labels and names stay VARCHAR: DuckDB already dictionary-compresses low-cardinality
+strings on disk, while an ENUM would reject every new subcategory or player.
+*/
+ALTER TABLE fact_dk_offers ALTER outcome_oddsAmerican TYPE INTEGER
+    USING TRY_CAST(replace(replace(trim(outcome_oddsAmerican::VARCHAR), '−', '-'), '+', '') AS INTEGER);
+ALTER TABLE fact_dk_offers ALTER subcategory_subcategoryId TYPE BIGINT USING TRY_CAST(subcategory_subcategoryId AS BIGINT);
+ALTER TABLE fact_dk_offers ALTER offer_eventId TYPE BIGINT USING TRY_CAST(offer_eventId AS BIGINT);
+ALTER TABLE fact_dk_offers ALTER offer_eventGroupId TYPE BIGINT USING TRY_CAST(offer_eventGroupId AS BIGINT);
+ALTER TABLE fact_dk_offers ALTER participant_id TYPE BIGINT USING TRY_CAST(participant_id AS BIGINT);
+
+ALTER TABLE fact_dk_odds_history ALTER outcome_oddsAmerican TYPE INTEGER
+    USING TRY_CAST(replace(replace(trim(outcome_oddsAmerican::VARCHAR), '−', '-'), '+', '') AS INTEGER);
+ALTER TABLE fact_dk_odds_history ALTER subcategory_subcategoryId TYPE BIGINT USING TRY_CAST(subcategory_subcategoryId AS BIGINT);
+ALTER TABLE fact_dk_odds_history ALTER offer_eventId TYPE BIGINT USING TRY_CAST(offer_eventId AS BIGINT);
+ALTER TABLE fact_dk_odds_history ALTER offer_eventGroupId TYPE BIGINT USING TRY_CAST(offer_eventGroupId AS BIGINT);
+ALTER TABLE fact_dk_odds_history ALTER participant_id TYPE BIGINT USING TRY_CAST(participant_id AS BIGINT);
+
+/*
+Written before this migration, '+110' and '110' were different strings, so
+some intervals were split without the price changing. Merge consecutive
+intervals of a key that now compare equal.
+*/
+CREATE TEMP TABLE merged_odds_history AS
+WITH
+    starts AS (
+        SELECT
+            * ,
+            CASE WHEN
+                lag(valid_to) OVER w IS DISTINCT FROM valid_from
+                OR lag(outcome_oddsAmerican) OVER w IS DISTINCT FROM outcome_oddsAmerican
+                OR lag(outcome_oddsDecimal) OVER w IS DISTINCT FROM outcome_oddsDecimal
+                OR lag(outcome_line) OVER w IS DISTINCT FROM outcome_line
+            THEN 1 ELSE 0 END AS is_start
+        FROM fact_dk_odds_history
+        WINDOW w AS (PARTITION BY subcategory_subcategoryId, offer_providerOfferId, outcome_label, participant_id ORDER BY valid_from)
+    ),
+    islands AS (
+        SELECT
+            * ,
+            sum(is_start) OVER (
+                PARTITION BY subcategory_subcategoryId, offer_providerOfferId, outcome_label, participant_id
+                ORDER BY valid_from ROWS UNBOUNDED PRECEDING
+            ) AS island
+        FROM starts
+    )
+SELECT
+    subcategory_subcategoryId ,
+    arg_min(subcategory_name, valid_from) AS subcategory_name ,
+    arg_min(offer_label, valid_from) AS offer_label ,
+    offer_providerOfferId ,
+    arg_min(offer_eventId, valid_from) AS offer_eventId ,
+    arg_min(offer_eventGroupId, valid_from) AS offer_eventGroupId ,
+    arg_min(offer_playerNameIdentifier, valid_from) AS offer_playerNameIdentifier ,
+    outcome_label ,
+    arg_min(outcome_oddsAmerican, valid_from) AS outcome_oddsAmerican ,
+    arg_min(outcome_oddsDecimal, valid_from) AS outcome_oddsDecimal ,
+    arg_min(outcome_line, valid_from) AS outcome_line ,
+    participant_id ,
+    arg_min(participant_name, valid_from) AS participant_name ,
+    arg_min(participant_type, valid_from) AS participant_type ,
+    min(valid_from) AS valid_from ,
+    -- NULL (still open) wins over any closing time
+    CASE WHEN bool_or(valid_to IS NULL) THEN NULL ELSE max(valid_to) END AS valid_to ,
+    arg_min(run_id, valid_from) AS run_id ,
+    CASE WHEN bool_or(valid_to IS NULL) THEN NULL ELSE arg_max(closed_run_id, valid_from) END AS closed_run_id
+FROM islands
+GROUP BY subcategory_subcategoryId, offer_providerOfferId, outcome_label, participant_id, island;
+
+DELETE FROM fact_dk_odds_history;
+INSERT INTO fact_dk_odds_history BY NAME SELECT * FROM merged_odds_history;
+DROP TABLE merged_odds_history;
+
+-- Views keep the column types they were created with
+CREATE OR REPLACE VIEW current_dk_odds AS
+SELECT * FROM fact_dk_odds_history WHERE valid_to IS NULL;
+
+/*
+dim_participant.participant_id becomes BIGINT too, so it joins the fact tables
+without a cast. DuckDB cannot change the type of a PRIMARY KEY column, so the
+table is rebuilt. IDs that are not numeric could never match a BIGINT fact row
+and are dropped; IDs that only differed in formatting ('007', '7') keep one row.
+*/
+CREATE TABLE IF NOT EXISTS dim_participant (
+    participant_id VARCHAR PRIMARY KEY,
+    participant_name VARCHAR,
+    participant_type VARCHAR
+);
+CREATE TABLE dim_participant_typed (
+    participant_id BIGINT PRIMARY KEY,
+    participant_name VARCHAR,
+    participant_type VARCHAR
+);
+INSERT INTO dim_participant_typed
+SELECT DISTINCT ON (TRY_CAST(participant_id AS BIGINT))
+    TRY_CAST(participant_id AS BIGINT) AS participant_id ,
+    participant_name ,
+    participant_type
+FROM dim_participant
+WHERE TRY_CAST(participant_id AS BIGINT) IS NOT NULL
+ORDER BY TRY_CAST(participant_id AS BIGINT);
+DROP TABLE dim_participant;
+ALTER TABLE dim_participant_typed RENAME TO dim_participant;
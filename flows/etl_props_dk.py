@@ -1,19 +1,24 @@
 # Standard
 import os
-import sys
-import json
-import requests
-from io import StringIO
 # External
-import duckdb
 import pandas as pd
-from typing import Dict, Any, List, Optional
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, Any, List, Optional, Iterator, Tuple
 from prefect import flow, task, get_run_logger
 # Internal
-from handlers.s3_handler import S3Handler
-from handlers.request_handler import RequestHandler
+from handlers.s3_handler import S3Handler, get_s3_handler
+from handlers.async_request_handler import AsyncRequestHandler
+from handlers.rate_limiter import get_rate_limiter
+from handlers.validator_store import ValidatorStore
+from handlers.cassette import Cassette
+from handlers.retry_policy import RetryPolicy
+from handlers.parse_pool import ParsePool
+from handlers.raw_archive import RawArchiveWriter, RawHashIndex
+from handlers.s3_uploader import BackgroundUploader
 from handlers.duckdb_handler import DuckDBHandler
-from utils.utils import load_config, get_event_group_by_name, generate_timestamp, parse_dk_offers
+from utils.utils import load_config, get_event_group_by_name, generate_timestamp
+from utils.columnar_utils import parse_dk_offers_columnar, concat_dk_offers_columnar, dk_offers_columnar_to_arrow
 
 ################################################################################
 # Configuration
@@ -30,19 +35,52 @@ sleep_secs_min = requests_config['sleep_secs_min']
 sleep_secs_max = requests_config['sleep_secs_max']
 retries_max = requests_config['retries_max']
 headers = requests_config['headers']
-# NOTE: uncomment when introducing proxy rotation.
-#proxies = requests_config['proxies']
-proxies = None
+# Politeness budget: concurrent requests per host and a per-host request rate.
+# The default rate is that of the old serial scraper, sleeping sleep_secs_min-sleep_secs_max
+# between requests; running requests concurrently does not raise it.
+max_in_flight_per_host = requests_config.get('max_in_flight_per_host', 4)
+requests_per_minute = requests_config.get('requests_per_minute', 60 * 2 / (sleep_secs_min + sleep_secs_max))
+proxy_requests_per_minute = requests_config.get('proxy_requests_per_minute')
+jitter_secs = requests_config.get('jitter_secs', 1)
+# Total seconds a run may spend waiting to retry, and the longest single wait (e.g. Retry-After)
+retry_budget_secs = requests_config.get('retry_budget_secs', 300)
+max_backoff_secs = requests_config.get('max_backoff_secs', 120)
+# ETag / Last-Modified / body hash per URL, used to skip unchanged subcategories
+validator_store_path = requests_config.get('validator_store_path', 'data/draftkings/validators.json')
+# 'record' archives every response; 'replay' re-runs the flow from the archive with no network
+cassette_mode = requests_config.get('cassette_mode')
+cassette_path = requests_config.get('cassette_path', 'data/draftkings/cassettes/etl_props_dk.jsonl.gz')
+# Optional list of proxy URLs, rotated through a latency- and health-scored pool
+proxies = requests_config.get('proxies')
+max_requests_per_proxy = requests_config.get('max_requests_per_proxy', 10)
+
+# Parsing runs in worker processes alongside fetching; None means one worker per CPU.
+parse_workers = base_config['draftkings'].get('parse_workers')
+parse_max_pending = base_config['draftkings'].get('parse_max_pending')
 
 # S3
 s3_bucket = environment_config['aws']['s3_bucket']
 s3_base_key = environment_config['aws']['s3_key']
 file_extension_raw = environment_config['aws']['file_extension_raw']
 file_extension_processed = environment_config['aws']['file_extension_processed']
+# Background S3 uploads: threads, and bytes held in memory before the flow waits
+upload_workers = environment_config['aws'].get('upload_workers', 8)
+upload_max_pending_bytes = environment_config['aws'].get('upload_max_pending_bytes', 256 * 1024 * 1024)
+# One gzip NDJSON bundle of raw responses per run, plus its .index.json
+raw_archive_prefix = f'{s3_base_key}/draftkings/raw'
+raw_archive_key_template = f'{raw_archive_prefix}/{{timestamp}}.ndjson.gz'
+# MD5 hash -> archive location of every raw payload stored so far; repeats are only referenced
+raw_hash_index_path = environment_config['aws'].get('raw_hash_index_path', 'data/draftkings/raw_hashes.json')
+# Parsed offers as Parquet, partitioned sport=/date=/subcategory_subcategoryId=
+parsed_lake_key = f'{s3_base_key}/draftkings/parsed_lake'
+# Each prefix's runs are indexed in <prefix>/_runs/<YYYYMMDD>.json and <prefix>/_latest.json; local copies are cached here
+run_index_cache_dir = environment_config['aws'].get('run_index_cache_dir', 'data/s3_index_cache')
 
 # DuckDB
 db_path = environment_config['duckdb']['db_path']
 db_name = environment_config['duckdb']['db_name']
+# Content-addressed chunk store for incremental backups after each run
+duckdb_backup_key = environment_config['duckdb'].get('backup_key', f'{s3_base_key}/duckdb/backups')
 
 # Prefect flow
 retries = environment_config['prefect']['retries']
@@ -52,103 +90,174 @@ log_prints = environment_config['prefect']['log_prints']
 ################################################################################
 # Tasks
 ################################################################################
-@task
-def issue_request(request_handler: RequestHandler, url: str, logger):
+def collect_parsed_data(
+        parsed: Iterator[Tuple[Any, Any, Optional[BaseException]]],
+        parsed_offers_list: list,
+        parsed_subcategory_ids: list,
+        logger
+    ) -> None:
     """
-    Request props data from each endpoint.
+    Collects columnar batches returned by the parse pool.
 
-    :return: Dictionary containing subcategory names and HTTP responses.
+    :param parsed: Iterator of ((subcategory name, subcategory ID), batch, error) from ParsePool.ready() or drain().
+    :param parsed_offers_list: List the non-empty batches are appended to.
+    :param parsed_subcategory_ids: List the IDs of successfully parsed subcategories are appended to.
     """
-    logger.info(f"Fetching data from {url}")
-    return request_handler.get(url, headers)
-                    
-
+    for (subcategory_name, subcategory_id), parsed_offers, error in parsed:
+        if error is not None:
+            logger.info(f"Could not parse {subcategory_name}.\n{error}")
+            continue
+        parsed_subcategory_ids.append(str(subcategory_id))
+        if parsed_offers['num_rows']:
+            parsed_offers_list.append(parsed_offers)
+        else:
+            logger.info(f"No offers parsed for {subcategory_name}.")
+    
 @task
-def upload_raw_data_s3(s3_handler: S3Handler, response: requests.Response, subcategory_name: str, timestamp: str, logger) -> None:
+def upload_parsed_data_s3(s3_handler: S3Handler, uploader: BackgroundUploader, combined_offers: pa.Table, sport: str, timestamp: str, logger) -> List[Dict[str, Any]]:
     """
-    Converts objects to JSON strings and uploads to S3.
+    Writes parsed offers to the parsed-offers lake in S3: zstd-compressed Parquet,
+    partitioned by sport, date and subcategory.
 
-    :param response: requests.Response HTTP response (json).
+    :param uploader: BackgroundUploader the objects are queued on.
+    :param combined_offers: Arrow table of parsed offers.
+    :param sport: Sport partition, e.g. 'nfl'.
+    :param timestamp: 14-character timestamp string, keeping each run's objects unique.
+    :return: {key, size, hash, sport, date, subcategory_subcategoryId} of each object queued.
     """
-    try:
-        json_obj = response.json()
-    except AttributeError as e:
-        logger.info(f"No JSON object found.\n{e}")
-        return None
-    json_string_obj = json.dumps(json_obj)
-    s3_handler.upload_object(
-        obj=json_string_obj, 
-        object_name=subcategory_name,
-        base_key=f'{s3_base_key}/draftkings/raw',
-        file_extension=file_extension_raw,
-        timestamp=timestamp
+    manifest = []
+    partitioned = combined_offers.append_column(
+        'sport', pa.array([sport] * combined_offers.num_rows, type=pa.string())
+    ).append_column(
+        'date', pc.strftime(combined_offers['timestamp'], format='%Y-%m-%d')
     )
-    
+    keys = s3_handler.write_parquet_dataset(
+        partitioned,
+        base_key=parsed_lake_key,
+        partition_cols=['sport', 'date', 'subcategory_subcategoryId'],
+        timestamp=timestamp,
+        uploader=uploader,
+        manifest=manifest
+    )
+    logger.info(f"Queued {combined_offers.num_rows} parsed offers in {len(keys)} partitions for upload.")
+    return manifest
 
 @task
-def parse_raw_data(response: requests.Response, timestamp: str, logger) -> list:
+def start_ingest_run(duckdb_handler: DuckDBHandler, started_at: str, logger) -> int:
     """
-    Parses and flattens data from each endpoint, then concatenates the data
-    into a Pandas DataFrame.
+    Registers a new ingest run. Its rows are invisible to the projection queries until
+    the run is marked completed.
 
-    :param response: requests.Response HTTP response (json).
-    :param timestamp: 14-character timestamp string.
+    :param started_at: 14-character timestamp string.
+    :return: The new run ID.
+    """
+    run_id = duckdb_handler.conn.execute(
+        "INSERT INTO ingest_runs (started_at, status) VALUES (?, 'running') RETURNING run_id",
+        [pd.to_datetime(started_at, format='%Y%m%d%H%M%S')]
+    ).fetchone()[0]
+    logger.info(f"Started ingest run {run_id}.")
+    return run_id
 
-    :return: Flattened JSON containing parsed player prop data.
+@task
+def merge_odds_history_duckdb(
+        combined_offers: pa.Table,
+        unchanged_subcategory_ids: List[str],
+        run_id: int,
+        timestamp: str,
+        duckdb_handler: DuckDBHandler,
+        logger
+    ) -> Dict[str, int]:
     """
-    try:
-        json_obj = response.json()
-    except AttributeError as e:
-        logger.info(f"No JSON object found.\n{e}")
-        return None
-    
-    return parse_dk_offers(json_obj, timestamp)
-    
+    Merges parsed offers into fact_dk_odds_history straight from Arrow. Only prices whose
+    odds or line changed are written. Intervals of unchanged subcategories stay open; every
+    other open interval missing from the offers is closed, so a subcategory that failed to
+    fetch or parse, or is no longer listed, drops out of current_dk_odds.
+
+    :param combined_offers: Arrow table of parsed offers, one chunk per subcategory.
+    :param unchanged_subcategory_ids: Subcategory IDs that have not changed since the last run.
+    :param run_id: Ingest run that opens and closes the intervals.
+    :param timestamp: 14-character timestamp string at which the offers were observed.
+    :return: Dictionary with the number of intervals 'inserted', 'closed' and 'unchanged'.
+    """
+    counts = duckdb_handler.merge_history(
+        "fact_dk_odds_history",
+        combined_offers.drop_columns(['timestamp']),
+        key_columns=['subcategory_subcategoryId', 'offer_providerOfferId', 'outcome_label', 'participant_id'],
+        compare_columns=['outcome_oddsAmerican', 'outcome_oddsDecimal', 'outcome_line'],
+        valid_from=pd.to_datetime(timestamp, format='%Y%m%d%H%M%S'),
+        scope_column='subcategory_subcategoryId',
+        run_id=run_id,
+        skip_scope_values=unchanged_subcategory_ids
+    )
+    logger.info(f"Odds history: {counts['inserted']} prices opened, {counts['closed']} closed, {counts['unchanged']} unchanged.")
+    return counts
+
 @task
-def upload_parsed_data_s3(s3_handler: S3Handler, combined_offers: str, subcategory_name: str, timestamp: str, logger) -> None:
+def finish_ingest_run(
+        duckdb_handler: DuckDBHandler,
+        run_id: int,
+        status: str,
+        rows_loaded: int,
+        subcategories_loaded: int,
+        subcategories_carried_forward: int,
+        logger
+    ) -> None:
     """
-    Converts objects to JSON strings and uploads to S3.
+    Marks an ingest run completed or failed. The latest completed run is what
+    latest_ingest_run, and so the projection queries, point at.
 
-    :param combined_offers: JSON string of combined offers
-    :param response: requests.Response HTTP response (json).
+    :param status: 'completed' or 'failed'.
     """
-    s3_handler.upload_object(
-        obj=combined_offers, 
-        object_name=subcategory_name,
-        base_key=f'{s3_base_key}/draftkings/parsed',
-        file_extension=file_extension_processed,
-        timestamp=timestamp
+    duckdb_handler.execute(
+        """
+        UPDATE ingest_runs 
+        SET completed_at = now(), status = ?, rows_loaded = ?, subcategories_loaded = ?, subcategories_carried_forward = ?
+        WHERE run_id = ?
+        """,
+        [status, rows_loaded, subcategories_loaded, subcategories_carried_forward, run_id]
     )
+    logger.info(f"Ingest run {run_id} {status} with {rows_loaded} rows.")
+
+@task
+def backup_duckdb_s3(duckdb_handler: DuckDBHandler, backup_name: str, logger) -> None:
+    """
+    Backs the database up to the chunk store in S3, uploading only the chunks that changed.
+    A failed backup is logged rather than failing the run; the next run backs up again.
+
+    :param backup_name: Name of the backup, e.g. the run's timestamp.
+    """
+    try:
+        stats = duckdb_handler.backup_to_s3_incremental(duckdb_backup_key, backup_name)
+        logger.info(f"Backed up DuckDB as {backup_name}: {stats['uploaded_bytes']} of {stats['bytes']} bytes uploaded.")
+    except Exception as e:
+        logger.info(f"DuckDB backup failed.\n{e}")
 
 @task
-def load_parsed_data_duckdb(parsed_json: dict, db_path_full: str, logger) -> None:
-    table_name = "fact_dk_offers"
-    duckdb_handler = DuckDBHandler(db_path_full)
-
-    create_table_statement = f"""
-    CREATE TABLE IF NOT EXISTS {table_name} (
-        subcategory_subcategoryId VARCHAR,
-        subcategory_name VARCHAR,
-        offer_label VARCHAR,
-        offer_providerOfferId VARCHAR,
-        offer_eventId VARCHAR,
-        offer_eventGroupId VARCHAR,
-        offer_playerNameIdentifier VARCHAR,
-        outcome_label VARCHAR,
-        outcome_oddsAmerican VARCHAR,
-        outcome_oddsDecimal DOUBLE,
-        outcome_line DOUBLE,
-        participant_id VARCHAR,
-        participant_name VARCHAR,
-        participant_type VARCHAR,
-        timestamp TIMESTAMP
-    );
-    """
-    duckdb_handler.execute(create_table_statement)
-
-    combined_offers_df = pd.DataFrame(parsed_json)
-    combined_offers_df['timestamp'] = pd.to_datetime(combined_offers_df['timestamp'], format='%Y%m%d%H%M%S')
-    duckdb_handler.insert_data(table_name, combined_offers_df)
+def record_runs_s3(s3_handler: S3Handler, run_id: Optional[int], timestamp: str, raw_entries: List[Dict[str, Any]], parsed_objects: List[Dict[str, Any]], logger) -> None:
+    """
+    Records the run in the run indexes of the raw archive and parsed lake prefixes, so
+    later lookups by time or subcategory need no listing. A failure is logged rather
+    than failing the run; the objects themselves are already stored.
+
+    :param run_id: Ingest run ID, or None if the run never reached DuckDB.
+    :param timestamp: 14-character timestamp string of the run.
+    :param raw_entries: Index entries of the run's raw archive.
+    :param parsed_objects: Objects written to the parsed lake.
+    """
+    raw_objects = [
+        {
+            'key': entry['archive_key'], 'subcategory': entry['name'], 'timestamp': entry['timestamp'],
+            'offset': entry['offset'], 'length': entry['length'], 'size': entry['size'], 'hash': entry['hash']
+        }
+        for entry in raw_entries
+    ]
+    try:
+        if raw_objects:
+            s3_handler.run_index(raw_archive_prefix, cache_dir=run_index_cache_dir).record_run(run_id, timestamp, raw_objects)
+        if parsed_objects:
+            s3_handler.run_index(parsed_lake_key, cache_dir=run_index_cache_dir).record_run(run_id, timestamp, parsed_objects)
+    except Exception as e:
+        logger.info(f"Recording run {timestamp} in the run indexes failed.\n{e}")
 
 ################################################################################
 # Flow
@@ -158,10 +267,11 @@ def etl_props_dk(log_prints=log_prints, retries=retries, retry_delay_seconds=ret
     """
     ***Extract / Load***
     1. Request props data from each endpoint.
-    2. Upload raw response JSON to S3.
+    2. Append raw responses to the run's archive in S3.
     3. Parse response JSON.
-    4a. Upload parsed CSV to S3.
-    4b. Load parsed CSV to DuckDB.
+    4a. Upload parsed offers to the Parquet lake in S3.
+    4b. Merge changed prices into the DuckDB odds history.
+    4c. Record the run in the run indexes of the raw and parsed prefixes in S3.
     -----------------------------------
     ***Transformations***
     5. Group data by player.
@@ -170,29 +280,39 @@ def etl_props_dk(log_prints=log_prints, retries=retries, retry_delay_seconds=ret
     8. Read the finished view and upload CSV to S3. 
     """
     logger = get_run_logger()
+    run_started_at = generate_timestamp()
     logger.info(f"duckdb location: {db_path}/{db_name}")
 
-    s3_handler = S3Handler(s3_bucket)
+    s3_handler = get_s3_handler(s3_bucket)
 
-    request_handler = RequestHandler(
-        sleep_secs_min=sleep_secs_min,
-        sleep_secs_max=sleep_secs_max,
+    # Shared with any other handler in this process so they draw on one budget
+    rate_limiter = get_rate_limiter(
+        requests_per_minute=requests_per_minute,
+        proxy_requests_per_minute=proxy_requests_per_minute,
+        jitter_secs=jitter_secs
+    )
+    validator_store = ValidatorStore(validator_store_path)
+    retry_policy = RetryPolicy(retries_max, max_backoff_secs=max_backoff_secs, retry_budget_secs=retry_budget_secs)
+    request_handler = AsyncRequestHandler(
         retries_max=retries_max,
-        proxies=proxies
+        max_in_flight_per_host=max_in_flight_per_host,
+        proxies=proxies,
+        max_requests_per_proxy=max_requests_per_proxy,
+        rate_limiter=rate_limiter,
+        validator_store=validator_store,
+        cassette=Cassette(cassette_path, cassette_mode) if cassette_mode else None,
+        retry_policy=retry_policy
     )
-    # Extract, load, and parse
+    # Collect the URL for every subcategory up front so they can be fetched concurrently
     logger.info("Scraping DraftKings odds.")
     nfl_seasonlong_eventgroup = get_event_group_by_name(api, 'nfl')
-    parsed_offers_list = []
+    subcategory_urls = []
     for category in nfl_seasonlong_eventgroup['categories']:
         if category['name'] != 'player-stats': # Don't get full season stuff
             logger.info(f"Category: {category['name']}")
             # Check if subcategories exist
             if 'subcategories' in category and category['subcategories']:
                 for subcategory in category['subcategories']:
-                    subcategory_name = subcategory['name']
-                    logger.info(f"Subcategory: {subcategory_name}")
-
                     # Construct URL
                     url_params = {
                         'eventgroup_id': nfl_seasonlong_eventgroup['eventgroup_id'],
@@ -200,38 +320,89 @@ def etl_props_dk(log_prints=log_prints, retries=retries, retry_delay_seconds=ret
                         'subcategory_id': subcategory['subcategory_id']
                     }
                     url = request_handler.construct_url(url_template, **url_params)
-                    response = issue_request(request_handler, url, logger)
-                    # Use the timestamp of the response for all future operations
-                    timestamp = generate_timestamp()
-                    upload_raw_data_s3(s3_handler, response, subcategory_name, timestamp, logger)
-                    parsed_offers = parse_raw_data(response, timestamp, logger)
-                    parsed_offers_list.append(parsed_offers)
-                    if parsed_offers_list:
-                        logger.info("Parsed offer list is not empty after updating for this category.")
-                    else:
-                        logger.info("Parsed offer list is empty after updating for this category.")
+                    subcategory_urls.append(((subcategory['name'], subcategory['subcategory_id']), url))
+
+    # Extract, load, and parse each response as soon as it arrives
+    logger.info(f"Fetching {len(subcategory_urls)} subcategories, {max_in_flight_per_host} at a time, {requests_per_minute:.1f} per minute.")
+    parsed_offers_list = []
+    parsed_subcategory_ids = []
+    unchanged_subcategory_ids = []
+    parsed_objects = []
+    run_id = None
+    # S3 uploads run in the background; fetching and parsing only wait if its queue is full
+    uploader = s3_handler.background_uploader(max_workers=upload_workers, max_pending_bytes=upload_max_pending_bytes)
+    raw_hash_index = RawHashIndex(raw_hash_index_path)
+    raw_archive = RawArchiveWriter(
+        s3_handler, raw_archive_key_template.format(timestamp=run_started_at),
+        uploader=uploader, hash_index=raw_hash_index
+    )
+    try:
+        with ParsePool(parse_dk_offers_columnar, max_workers=parse_workers, max_pending=parse_max_pending) as parse_pool:
+            for (subcategory_name, subcategory_id), response in request_handler.iter_as_completed(subcategory_urls, headers):
+                logger.info(f"Subcategory: {subcategory_name}")
+                if response is None:
+                    logger.info("No response received; skipping.")
+                    continue
+                if getattr(response, 'unchanged', False):
+                    logger.info("Unchanged since last run; skipping upload, parse and load.")
+                    unchanged_subcategory_ids.append(str(subcategory_id))
+                    continue
+                # Use the timestamp of the response for all future operations
+                timestamp = generate_timestamp()
+                # Original bytes, no JSON round trip; uploaded in multipart chunks as they build up.
+                # A payload already stored, e.g. by another subcategory or run, is only referenced.
+                raw_archive.add(subcategory_name, response.content, timestamp)
+                # Parsed in a worker process; blocks while the pool is full so unparsed payloads cannot pile up
+                parse_pool.submit((subcategory_name, subcategory_id), response.content, timestamp)
+                collect_parsed_data(parse_pool.ready(), parsed_offers_list, parsed_subcategory_ids, logger)
+            collect_parsed_data(parse_pool.drain(), parsed_offers_list, parsed_subcategory_ids, logger)
+        if request_handler.proxy_pool is not None:
+            request_handler.proxy_pool.report()
+        retried_urls = retry_policy.report()
+        if retried_urls:
+            logger.info(f"Attempts per retried URL: {retried_urls}")
     
-    # Combine parsed offers and upload to S3
-    combined_offers = []
-    for sublist in parsed_offers_list:
-        if not sublist:
-            logger.info("Sublist is empty.")
-            continue
-        else:
-            logger.info("Sublist is not empty.")
-        for item in sublist:
-            combined_offers.append(item)
-    combined_offers_json_str = json.dumps(combined_offers, indent=4)
-    logger.info("Uploading parsed data.")
-    upload_parsed_data_s3(s3_handler, combined_offers_json_str, 'parsed_props', timestamp, logger)
-
-    # Insert into duckdb
-    db_path_full = f"{db_path}/{db_name}"
-    combined_offers_json_obj = json.loads(combined_offers_json_str)
-    load_parsed_data_duckdb(combined_offers_json_obj, db_path_full, logger)
+        # One connection for every load in this run
+        with DuckDBHandler(f"{db_path}/{db_name}", s3_bucket) as duckdb_handler:
+            duckdb_handler.apply_migrations()
+            run_id = start_ingest_run(duckdb_handler, run_started_at, logger)
+            rows_loaded = 0
+            try:
+                # Combine parsed offers and upload to S3
+                if parsed_offers_list:
+                    # Each subcategory's batch becomes one chunk; nothing is copied
+                    combined_offers = pa.concat_tables([dk_offers_columnar_to_arrow(batch) for batch in parsed_offers_list])
+                    logger.info(f"Parsed {combined_offers.num_rows} offers.")
+                    logger.info("Queueing parsed data for upload.")
+                    parsed_objects = upload_parsed_data_s3(s3_handler, uploader, combined_offers, 'nfl', run_started_at, logger)
+                else:
+                    logger.info("Parsed offer list empty.")
+                    combined_offers = dk_offers_columnar_to_arrow(concat_dk_offers_columnar([]))
+
+                # Unchanged subcategories need no rows at all: their open intervals carry them forward.
+                # Everything else missing from this run, e.g. a failed request, is closed.
+                counts = merge_odds_history_duckdb(combined_offers, unchanged_subcategory_ids, run_id, run_started_at, duckdb_handler, logger)
+                rows_loaded = counts['inserted']
+            except Exception:
+                finish_ingest_run(duckdb_handler, run_id, 'failed', rows_loaded, len(parsed_subcategory_ids), len(unchanged_subcategory_ids), logger)
+                raise
+            finish_ingest_run(duckdb_handler, run_id, 'completed', rows_loaded, len(parsed_subcategory_ids), len(unchanged_subcategory_ids), logger)
+            backup_duckdb_s3(duckdb_handler, run_started_at, logger)
+    finally:
+        # Keep whatever was fetched even if the run failed later on
+        raw_archive.close()
+        uploader.close()
+        request_handler.close()
+    # Barrier: every upload has landed, or the run fails here
+    uploader.flush()
+    uploader.report()
 
+    # Only remember validators and payload locations once their data is safely stored.
+    # A response that failed to parse is fetched and loaded again next run.
+    validator_store.save(urls=[url for (_, subcategory_id), url in subcategory_urls if str(subcategory_id) in parsed_subcategory_ids])
+    raw_hash_index.save()
+    record_runs_s3(s3_handler, run_id, run_started_at, raw_archive.entries, parsed_objects, logger)
     logger.info("Done.")
-    logger.info("Parsed offer list empty; database not updated.")
 
 
 if __name__ == "__main__":
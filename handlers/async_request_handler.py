@@ -0,0 +1,303 @@
+import time
+import asyncio
+import contextlib
+import itertools
+import queue
+import threading
+import httpx
+from urllib.parse import urlsplit
+from typing import Dict, Any, List, Optional, Iterable, Iterator, AsyncIterator, Tuple
+from handlers.rate_limiter import RateLimiter
+from handlers.validator_store import ValidatorStore
+from handlers.cassette import Cassette
+from handlers.retry_policy import RetryPolicy
+from handlers.proxy_pool import ProxyPool
+
+class AsyncRequestHandler:
+    def __init__(
+            self,
+            retries_max: int,
+            timeout: int = 10,
+            max_in_flight_per_host: int = 4,
+            proxies: Optional[List[str]] = None,
+            max_requests_per_proxy: int = 10,
+            rate_limiter: Optional[RateLimiter] = None,
+            validator_store: Optional[ValidatorStore] = None,
+            cassette: Optional[Cassette] = None,
+            retry_policy: Optional[RetryPolicy] = None,
+            transport: Optional[httpx.AsyncBaseTransport] = None
+        ):
+        """
+        Initializes the AsyncRequestHandler, an asyncio counterpart to RequestHandler
+        that keeps several requests in flight at once.
+
+        Each host gets max_in_flight_per_host slots, and every attempt also waits for
+        a token from the rate limiter, so the request rate stays inside the politeness
+        budget however many requests are in flight. There are no other sleeps.
+
+        :param retries_max: Maximum number of retry attempts on a failed request.
+        :param timeout: Request timeout in seconds.
+        :param max_in_flight_per_host: Maximum number of concurrent requests per host.
+        :param proxies: Optional list of proxies for rotation through a health-scored ProxyPool.
+        :param max_requests_per_proxy: Maximum number of requests before rotating proxies.
+        :param rate_limiter: Optional RateLimiter, e.g. one shared with other handlers via 
+        get_rate_limiter(). Without one, only max_in_flight_per_host limits requests.
+        :param validator_store: Optional ValidatorStore. When set, GET requests are sent
+        conditionally and responses carry an 'unchanged' attribute.
+        :param cassette: Optional Cassette. In 'record' mode every response is archived; in 
+        'replay' mode responses come from the archive with no network, sleeps or backoff.
+        :param retry_policy: Optional RetryPolicy, e.g. one with a per-run retry budget.
+        Defaults to a policy allowing retries_max attempts.
+        :param transport: Optional httpx transport, e.g. httpx.MockTransport for offline tests.
+        """
+        self.retries_max = retries_max
+        self.timeout = timeout
+        self.max_in_flight_per_host = max_in_flight_per_host
+        self.proxy_pool = ProxyPool(proxies, max_requests_per_proxy) if proxies else None
+        self.rate_limiter = rate_limiter or RateLimiter(None)
+        self.validator_store = validator_store
+        self.cassette = cassette
+        self.retry_policy = retry_policy or RetryPolicy(retries_max)
+        self.transport = transport
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.clients: Dict[Optional[str], httpx.AsyncClient] = {}
+
+    def construct_url(self, url_template: str, **kwargs) -> str:
+        """
+        Constructs a URL from a template and a dictionary describing the API endpoint structure.
+
+        :param url_template: A string template for the URL which contains placeholders.
+        :param kwargs: A dictionary containing the parameters to format the URL template.
+        :return: A formatted URL string.
+        """
+        return url_template.format(**kwargs)
+
+    def host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """
+        Returns the semaphore bounding in-flight requests for the URL's host.
+
+        :param url: URL whose host is being limited.
+        :return: asyncio.Semaphore shared by every request to that host.
+        """
+        host = urlsplit(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.max_in_flight_per_host)
+        return self.host_semaphores[host]
+
+    def client(self, proxy: Optional[str]) -> httpx.AsyncClient:
+        """
+        Returns the connection-pooled client for a proxy, or the direct client for None.
+
+        :param proxy: Proxy URL, or None.
+        :return: httpx.AsyncClient
+        """
+        if proxy not in self.clients:
+            self.clients[proxy] = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=self.transport,
+                # A test transport stands in for the network, proxies included
+                proxy=None if self.transport else proxy
+            )
+        return self.clients[proxy]
+
+    def replay(self, method: str, url: str) -> Optional[httpx.Response]:
+        """
+        Rebuilds a recorded response from the cassette, applying the same error handling
+        as a live request.
+
+        :param method: HTTP method of the request.
+        :param url: URL of the request.
+        :return: Response object, or None if the recorded response was an error or is missing.
+        """
+        entry = self.cassette.replay(method, url)
+        if entry is None:
+            return None
+        response = httpx.Response(
+            entry['status_code'],
+            headers=entry['headers'],
+            content=entry['body'],
+            request=httpx.Request(method.upper(), url)
+        )
+        print(f"Status code: {response.status_code} (replayed)")
+        if response.status_code >= 400:
+            print(f"HTTPError: {response.status_code} (replayed)")
+            return None
+        response.unchanged = response.status_code == 304
+        return response
+
+    async def request_with_retry(self, method: str, url: str, headers=None) -> Optional[httpx.Response]:
+        """
+        Makes an HTTP request with the same rate limiting and retry rules as RequestHandler: the
+        retry policy decides which errors are retried and how long to wait, honouring Retry-After.
+
+        :param method: HTTP method to use ('get' or 'post').
+        :param url: URL to which the request is sent.
+        :param headers: Optional headers for the request.
+        :return: Response object from httpx, or None if the request failed.
+        """
+        if self.cassette is not None and self.cassette.mode == 'replay':
+            return self.replay(method, url)
+
+        async with self.host_semaphore(url):
+            print(f"Method: {method.upper()}")
+            print(f"URL: {url}")
+
+            conditional = self.validator_store is not None and method.lower() == 'get'
+            if conditional:
+                headers = {**(headers or {}), **self.validator_store.conditional_headers(url)}
+
+            attempt = 0
+            while True:
+                self.retry_policy.record_attempt(url)
+                retry_after = None
+                proxy = self.proxy_pool.choose() if self.proxy_pool is not None else None
+                if self.proxy_pool is not None and proxy is None:
+                    return None
+                try:
+                    await self.rate_limiter.acquire_async(url, proxy)
+                    start = time.monotonic()
+                    response = await self.client(proxy).request(method=method.upper(), url=url, headers=headers)
+                    if proxy:
+                        self.proxy_pool.record_response(proxy, response.status_code, time.monotonic() - start)
+                    if self.cassette is not None:
+                        self.cassette.record(method, url, response)
+                    print(f"Status code: {response.status_code} ({url})")
+                    # httpx treats 304 Not Modified as an error; here it is the expected answer to a conditional GET
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                    print("Success.")
+                    if conditional:
+                        response.unchanged = self.validator_store.is_unchanged(url, response)
+                    return response
+                except httpx.HTTPStatusError as e:
+                    print(f"HTTPError:\n{e}")
+                    if not self.retry_policy.is_retryable_status(e.response.status_code):
+                        return None
+                    retry_after = e.response.headers.get('Retry-After')
+                except httpx.RequestError as e:
+                    print(f"Attempt {attempt + 1} failed: {e}")
+                    if proxy:
+                        self.proxy_pool.record_failure(proxy)
+                sleep_secs = self.retry_policy.next_delay(attempt, retry_after)
+                if sleep_secs is None:
+                    print(f"Giving up on {url} after {attempt + 1} attempts.")
+                    return None
+                print(f"Retrying in {sleep_secs} seconds.")
+                await asyncio.sleep(sleep_secs)
+                attempt += 1
+
+    async def fetch_as_completed(self, requests: Iterable[Tuple[Any, str]], headers=None, max_pending: Optional[int] = None) -> AsyncIterator[Tuple[Any, Optional[httpx.Response]]]:
+        """
+        Sends a GET request for every (key, url) pair and yields (key, response) pairs
+        in the order the responses finish.
+
+        :param requests: Iterable of (key, url) pairs. The key is handed back with the response.
+        :param headers: Optional headers sent with every request.
+        :param max_pending: Maximum number of requests started but not yet yielded. A new
+        request starts only once a response has been yielded. None starts every request at once.
+        :return: Async iterator of (key, response) pairs. The response is None if the request failed.
+        """
+        # Semaphores and clients are bound to the event loop they are first used in.
+        self.host_semaphores = {}
+        self.clients = {}
+
+        async def fetch(key: Any, url: str) -> Tuple[Any, Optional[httpx.Response]]:
+            return key, await self.request_with_retry('get', url, headers)
+
+        requests = iter(requests)
+        tasks = set()
+
+        def start(count: Optional[int]) -> None:
+            for key, url in itertools.islice(requests, count):
+                tasks.add(asyncio.create_task(fetch(key, url)))
+
+        start(max_pending)
+        try:
+            while tasks:
+                completed, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in completed:
+                    tasks.remove(task)
+                    yield task.result()
+                    start(1)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for client in self.clients.values():
+                await client.aclose()
+
+    def iter_as_completed(self, requests: Iterable[Tuple[Any, str]], headers=None, max_pending: Optional[int] = None) -> Iterator[Tuple[Any, Optional[httpx.Response]]]:
+        """
+        Synchronous wrapper around fetch_as_completed for use in flows. The event loop runs
+        in a background thread so responses can be processed while later requests are in flight.
+        At most max_pending requests are in flight or waiting for the consumer, so fetching
+        pauses while the consumer is busy. If the consumer stops early, outstanding requests
+        are cancelled and the thread joined.
+
+        :param requests: Iterable of (key, url) pairs. The key is handed back with the response.
+        :param headers: Optional headers sent with every request.
+        :param max_pending: Maximum number of responses in flight or held for the consumer.
+        Defaults to twice max_in_flight_per_host, so every slot stays busy while the consumer works.
+        :return: Iterator of (key, response) pairs in completion order.
+        """
+        max_pending = max_pending or 2 * self.max_in_flight_per_host
+        results = queue.Queue(maxsize=max_pending)
+        done = object()
+        loop = asyncio.new_event_loop()
+
+        async def produce():
+            async with contextlib.aclosing(self.fetch_as_completed(requests, headers, max_pending)) as responses:
+                async for result in responses:
+                    # Wait for the consumer without blocking the event loop
+                    while results.full():
+                        await asyncio.sleep(0.01)
+                    results.put_nowait(result)
+
+        producer = loop.create_task(produce())
+
+        def run():
+            try:
+                loop.run_until_complete(producer)
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                results.put(e)
+            finally:
+                results.put(done)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                result = results.get()
+                if result is done:
+                    break
+                if isinstance(result, Exception):
+                    raise result
+                yield result
+        finally:
+            loop.call_soon_threadsafe(producer.cancel)
+            # Make room for the thread's last put
+            while thread.is_alive():
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
+            loop.close()
+
+    def close(self) -> None:
+        """
+        Closes the proxy pool's sessions. The httpx clients are closed when each fetch ends.
+        """
+        if self.proxy_pool is not None:
+            self.proxy_pool.close()
+
+    def fetch_all(self, requests: Iterable[Tuple[Any, str]], headers=None) -> List[Tuple[Any, Optional[httpx.Response]]]:
+        """
+        Fetches every (key, url) pair and returns the (key, response) pairs in completion order.
+
+        :param requests: Iterable of (key, url) pairs.
+        :param headers: Optional headers sent with every request.
+        :return: List of (key, response) pairs.
+        """
+        return list(self.iter_as_completed(requests, headers))
@@ -0,0 +1,86 @@
+import os
+import gzip
+import json
+import base64
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Any, Optional, Tuple
+
+# Headers describing the wire encoding; recorded bodies are already decoded.
+_WIRE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+class Cassette:
+    def __init__(self, path: str, mode: str):
+        """
+        Initializes a Cassette, a gzip-compressed JSON Lines archive of HTTP responses.
+
+        In 'record' mode every response is appended to the archive, which is started fresh.
+        In 'replay' mode responses are served from the archive with no network access;
+        a URL requested more often than it was recorded gets its last recording again.
+
+        :param path: Path to the .jsonl.gz archive.
+        :param mode: 'record' or 'replay'.
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', got '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.entries: Dict[Tuple[str, str], deque] = defaultdict(deque)
+        self.last_entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        if mode == 'record':
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            open(path, 'wb').close()
+            print(f"Recording responses to {path}")
+        else:
+            with gzip.open(path, 'rt') as file:
+                for line in file:
+                    entry = json.loads(line)
+                    self.entries[(entry['method'], entry['url'])].append(entry)
+            print(f"Replaying {sum(len(e) for e in self.entries.values())} responses from {path}")
+
+    def record(self, method: str, url: str, response: Any) -> None:
+        """
+        Appends a response to the archive. Each entry is written as its own gzip member,
+        so the archive stays readable if the run dies part way through.
+
+        :param method: HTTP method of the request.
+        :param url: URL of the request.
+        :param response: requests.Response or httpx.Response.
+        """
+        entry = {
+            'method': method.upper(),
+            'url': url,
+            'status_code': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in _WIRE_HEADERS},
+            'body': base64.b64encode(response.content).decode('ascii')
+        }
+        line = json.dumps(entry) + '\n'
+        with self.lock:
+            with gzip.open(self.path, 'ab') as file:
+                file.write(line.encode('utf-8'))
+
+    def replay(self, method: str, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the next recorded response for a request.
+
+        :param method: HTTP method of the request.
+        :param url: URL of the request.
+        :return: Dictionary with status_code, headers and body (bytes), or None if never recorded.
+        """
+        key = (method.upper(), url)
+        with self.lock:
+            if self.entries[key]:
+                self.last_entries[key] = self.entries[key].popleft()
+            entry = self.last_entries.get(key)
+        if entry is None:
+            print(f"No recorded response for {method.upper()} {url}")
+            return None
+        return {
+            'status_code': entry['status_code'],
+            'headers': entry['headers'],
+            'body': base64.b64decode(entry['body'])
+        }
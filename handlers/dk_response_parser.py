@@ -1,212 +1,221 @@
+import re
 import pandas as pd
 import json
-from typing import Dict, Any, List, Set, Optional
+from typing import Dict, Any, List, Iterator, Optional, Tuple, Union
+
+# One step of a path: a dictionary key, a list index, or '*' for every element of a list.
+_PATH_TOKEN = re.compile(r'\.?([^.\[\]]+)|\[(\d+|\*)\]')
+WILDCARD = '*'
+
+class PathExtractor:
+    def __init__(self, row_path: str, columns: Dict[str, str]):
+        """
+        Initializes a PathExtractor, which turns nested JSON into table columns from a
+        declarative spec. Paths are compiled once and every payload is then walked a
+        single time, emitting values straight into one list per column.
+
+        Paths use dots for keys and brackets for list indices, e.g. 'team1.name' or
+        'outcomes[0].label'. The row path may use [*] to fan out over every element of a
+        list; each item it reaches becomes one row. Column paths are relative to that item.
+
+        :param row_path: Path from the payload to the row items, e.g. '[*][*]' for a list of lists.
+        :param columns: Dictionary of output column name to path within a row item.
+        """
+        self.row_path = self.compile_path(row_path)
+        self.columns = {name: self.compile_path(path) for name, path in columns.items()}
+        for name, path in self.columns.items():
+            if WILDCARD in path:
+                raise ValueError(f"Column '{name}' path may not contain [*]; only the row path fans out.")
+
+    @staticmethod
+    def compile_path(path: str) -> Tuple[Union[str, int], ...]:
+        """
+        Compiles a path string into a tuple of keys, indices and wildcards.
+
+        :param path: Path string, e.g. 'outcomes[0].label'. An empty string is the item itself.
+        :return: Tuple of steps.
+        :raises ValueError: If the path cannot be parsed.
+        """
+        steps = []
+        position = 0
+        while position < len(path):
+            match = _PATH_TOKEN.match(path, position)
+            if match is None:
+                raise ValueError(f"Invalid path '{path}' at position {position}.")
+            key, index = match.groups()
+            if key is not None:
+                steps.append(key)
+            else:
+                steps.append(WILDCARD if index == WILDCARD else int(index))
+            position = match.end()
+        return tuple(steps)
+
+    @staticmethod
+    def resolve(item: Any, path: Tuple[Union[str, int], ...]) -> Any:
+        """
+        Follows a compiled path without wildcards.
+
+        :param item: Dictionary or list to start from.
+        :param path: Compiled path.
+        :return: The value at the path, or None if any step is missing.
+        """
+        for step in path:
+            try:
+                item = item[step]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return item
+
+    def rows(self, item: Any) -> Iterator[Any]:
+        """
+        Yields every item reached by the row path.
+
+        :param item: Payload to walk.
+        """
+        def walk(current: Any, depth: int) -> Iterator[Any]:
+            if depth == len(self.row_path):
+                yield current
+                return
+            step = self.row_path[depth]
+            if step == WILDCARD:
+                if isinstance(current, list):
+                    for element in current:
+                        yield from walk(element, depth + 1)
+            else:
+                child = self.resolve(current, (step,))
+                if child is not None:
+                    yield from walk(child, depth + 1)
+        return walk(item, 0)
+
+    def extract(self, item: Any) -> Dict[str, List[Any]]:
+        """
+        Walks the payload once and collects every column.
+
+        :param item: Payload to walk.
+        :return: Dictionary of column name to list of values, missing values as None.
+        """
+        columns = {name: [] for name in self.columns}
+        resolve = self.resolve
+        compiled = list(self.columns.items())
+        for row in self.rows(item):
+            for name, path in compiled:
+                columns[name].append(resolve(row, path))
+        return columns
+
+    def to_dataframe(self, item: Any) -> pd.DataFrame:
+        """
+        :param item: Payload to walk.
+        :return: DataFrame with one row per row item and the columns in spec order.
+        """
+        return pd.DataFrame(self.extract(item), columns=list(self.columns))
 
 class DKResponseParser:
-    def __init__(self, json_obj: Dict[str, Any]):
+    def __init__(self, json_obj: Dict[str, Any], eager_index: bool = False):
         """
         Initializes the DKResponseParser which handles responses from DraftKings.
+
+        Key lookups are answered from an index of every key in the payload, built in a
+        single traversal on the first lookup (or straight away with eager_index).
         
-        :param response: Response returned from DraftKings API.
+        :param json_obj: Decoded response returned from DraftKings API.
+        :param eager_index: Build the key index now instead of on the first lookup.
         """
         self.json_obj = json_obj
+        self._key_index: Optional[Dict[str, List[Tuple[Tuple[Union[str, int], ...], Any]]]] = None
+        if eager_index:
+            self.build_index()
 
     def parse_and_clean_game_lines():
         pass
 
     def parse_and_clean_player_props():
         pass
-    
-    @staticmethod
-    def flatten_item(item: Any, exclude: Optional[Set[str]] = None) -> Dict[str, Any]:
+
+    def build_index(self) -> Dict[str, List[Tuple[Tuple[Union[str, int], ...], Any]]]:
         """
-        Recursively flattens the specified item. Nested structures may include
-        dictionaries, lists, or a list of dictionaries.
+        Walks the payload once and records the path and value of every occurrence of
+        every dictionary key, in document order. Values are referenced, not copied.
 
-        :param item: Dictionary or list containing dictionaries to flatten.
-        :param exclude: Fields to leave intact. Meant to be used for fields that can
-        contain a list of arbitrary length, which would break normalization.
-        :return: Flattened (single layer) dictionary.
+        :return: Dictionary of key to list of (path, value) occurrences.
         """
-        if exclude is None:
-            exclude = set()
-        
-        def flatten(current_item: Any, key_prefix: str = '') -> Dict[str, Any]:
-            flat_dict = {}
-            if isinstance(current_item, dict):
-                for k, v in current_item.items():
-                    full_key = f"{key_prefix}.{k}" if key_prefix else k
-                    if k in exclude:
-                        flat_dict[full_key] = v
-                    else:
-                        flat_dict.update(flatten(v, full_key))
-            elif isinstance(current_item, list):
-                for index, elem in enumerate(current_item):
-                    full_key = f"{key_prefix}[{index}]"
-                    flat_dict.update(flatten(elem, full_key))
-            else:
-                flat_dict[key_prefix] = current_item
-            return flat_dict
-        
-        return flatten(item)
-    
-    @staticmethod
-    def find_nested_value(d: Dict[Any, Any], key: str, found=None) -> Any:
+        index: Dict[str, List[Tuple[Tuple[Union[str, int], ...], Any]]] = {}
+        stack: List[Tuple[Tuple[Union[str, int], ...], Any]] = [((), self.json_obj)]
+        while stack:
+            path, current = stack.pop()
+            if isinstance(current, dict):
+                children = []
+                for k, v in current.items():
+                    child_path = path + (k,)
+                    index.setdefault(k, []).append((child_path, v))
+                    if isinstance(v, (dict, list)):
+                        children.append((child_path, v))
+                stack.extend(reversed(children))
+            elif isinstance(current, list):
+                stack.extend(
+                    (path + (i,), v) for i, v in reversed(list(enumerate(current)))
+                    if isinstance(v, (dict, list))
+                )
+        self._key_index = index
+        return index
+
+    @property
+    def key_index(self) -> Dict[str, List[Tuple[Tuple[Union[str, int], ...], Any]]]:
         """
-        Recursively searches through nested dictionary until locating the specified key,
-        then extracts the value of that key. If the key appears multiple times at any level,
-        an error is thrown.
-
-        Note: must pass 'd' instead of using self.response because of recursion.
-
-        :params d: The dictionary to search.
-        :params key: The key to locate.
-        :return: The value corresponding to the specified key, in this case a list of 
-        offers or events.
-        :raises ValueError: If the key is found more than once in the dictionary structure.
+        :return: The key index, built on first access.
         """
+        if self._key_index is None:
+            self.build_index()
+        return self._key_index
 
-        if found is None:
-            found = []
-
-        if key in d:
-            if key in found:
-                raise ValueError(f"Key '{key}' found more than once.")
-            found.append(key)
-            return d[key]
-
-        for value in d.values():
-            if isinstance(value, dict):
-                result = DKResponseParser.find_nested_value(value, key, found)
-                if result is not None:
-                    return result
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict):
-                        result = DKResponseParser.find_nested_value(item, key, found)
-                        if result is not None:
-                            return result
-        if not found:
-            return None
-    
-    @staticmethod
-    def flattened_events_to_dataframe(d: Dict[str, Any]) -> pd.DataFrame:
+    def find_all(self, key: str) -> List[Any]:
+        """
+        :param key: The key to locate.
+        :return: Values of every occurrence of the key, in document order.
         """
-        Converts a dictionary to a Pandas Dataframe.
+        return [value for _, value in self.key_index.get(key, [])]
 
-        :param d: dictionary to convert
-        :return: DataFrame
+    def find(self, key: str) -> Any:
         """
-        rows = {}
-
-        for key, value in d.items():
-            # Extract index and field name from the key
-            index = int(key.split('].')[0][1:])
-            field_name = key.split('].')[1]
-            
-            # Initialize the row if it hasn't been started yet
-            if index not in rows:
-                rows[index] = {}
-            
-            # Add data to the correct dictionary based on the index
-            rows[index][field_name] = value
-
-        rows_list = list(rows.values())
-
-        return pd.DataFrame(rows_list)
-    
-    @staticmethod
-    def flattened_offers_to_dataframe(d: Dict[str, Any]) -> pd.DataFrame:
+        Returns the value of the first occurrence of a key, searching each dictionary's
+        own keys before the dictionaries nested in it, as find_nested_value always has.
+
+        :param key: The key to locate.
+        :return: The value of the key, or None if it does not appear.
         """
-        Converts a dictionary to a Pandas Dataframe.
+        occurrences = self.key_index.get(key, [])
+        return occurrences[0][1] if occurrences else None
 
-        :param d: dictionary to convert
-        :return: DataFrame
+    def find_unique(self, key: str) -> Any:
         """
-        # Initialize a dictionary to hold the processed rows
-        rows = {}
-
-        # Parse the flattened data
-        for key, value in d.items():
-            # Correct parsing of the key to extract indices and property names
-            # Example key format: "[0][0].outcomes[0].label"
-            parts = key.replace(']', '').split('[')
-            main_index = int(parts[1])  # First index for DataFrame row
-            # Initialize the row if it hasn't been started yet
-            if main_index not in rows:
-                rows[main_index] = {}
-
-            # Iterate over parts to handle multiple nested levels
-            for part in parts[1:]:
-                # Handle outcome indices and properties, assuming format 'outcomes[0].label'
-                if 'outcomes' in part:
-                    try:
-                        outcome_idx = part.split('[')[1].split(']')[0]
-                    except IndexError:
-                        outcome_idx = 0
-                    property_name = part.split('.')[-1]
-                    column_name = f"outcomes[{outcome_idx}].{property_name}"
-                    rows[main_index][column_name] = value
-                else:
-                    # Direct properties without further nesting
-                    property_name = part
-                    if '.' in property_name:
-                        property_name = property_name.split('.')[1]  # Strip off any leading indices if still attached
-                    rows[main_index][property_name] = value
-
-        # Convert the dictionary of rows into a list of dictionaries for DataFrame creation
-        rows_list = [rows[key] for key in sorted(rows.keys())]
-
-        for i,row in enumerate(rows_list):
-            print(f"({i}) {row}")
-
-        # Create a DataFrame from the list of dictionaries
-        return pd.DataFrame(rows_list)
-
-  
-    @staticmethod
-    def flattened_props_offers_to_dataframe(d: Dict[str, Any]) -> pd.DataFrame:
-        # Initialize a dictionary to hold the processed rows
-        rows = {}
+        Returns the value of a key that must appear at most once anywhere in the payload.
 
+        :param key: The key to locate.
+        :return: The value of the key, or None if it does not appear.
+        :raises ValueError: If the key appears more than once.
         """
-        [5][0].isSubcategoryFeatured": false,
-        "[5][0].betOfferTypeId": 0,
-        "[5][0].providerCriterionId": "5207",
-        "[5][0].outcomes[0].providerOutcomeId": "0QA195641493#1789967200_13L88808Q11619917Q2-1",
-        "[5][0].outcomes[0].providerId": 2,
-        "[5][0].outcomes[0].providerOfferId": "195641493",
-        "[5][0].outcomes[0].label": "Over 3600.5",
-
-        ["[5", "[0", ".outcomes[0", ".label"]
+        occurrences = self.key_index.get(key, [])
+        if len(occurrences) > 1:
+            paths = ', '.join(str(list(path)) for path, _ in occurrences[:3])
+            raise ValueError(f"Key '{key}' found {len(occurrences)} times, e.g. at {paths}.")
+        return occurrences[0][1] if occurrences else None
+    
+    @staticmethod
+    def find_nested_value(d: Dict[Any, Any], key: str) -> Any:
         """
+        Searches through a nested dictionary for the specified key and extracts the value
+        of its first occurrence. Use find_unique() on a parser instance to require that
+        the key appears only once.
 
-        # Parse the flattened data
-        for key, value in d.items():
-            # Split the key at '].' to handle nested properties correctly
-            parts = key.split(']')
-            main_index = int(parts[0][1:])  # Extract the main index, assuming format '[0]'
-            
-            # Initialize the row if it hasn't been started yet
-            if main_index not in rows:
-                rows[main_index] = {}
-
-            if 'outcomes' in key:
-                outcome_idx = parts[2][-1]
-                property_name = parts[-1][1:]
-                column_name = f'outcomes[{outcome_idx}]_{property_name}'
-            else:
-                column_name = parts[-1][1:]
-            
-            rows[main_index][column_name] = value
-
-        # Convert the dictionary of rows into a list of dictionaries for DataFrame creation
-        rows_list = [rows[key] for key in sorted(rows.keys())]
-
-        # Create a DataFrame from the list of dictionaries
-        return pd.DataFrame(rows_list)
-
+        Note: this indexes d on every call. Use find() on a parser instance to look up
+        several keys in one payload.
 
+        :params d: The dictionary to search.
+        :params key: The key to locate.
+        :return: The value corresponding to the specified key, in this case a list of 
+        offers or events.
+        """
+        return DKResponseParser(d).find(key)
+    
     @staticmethod
     def split_series(series: pd.Series, delimiter: str, new_colnames: List[str]) -> pd.DataFrame:
         """
@@ -1,45 +1,213 @@
 import os
+import itertools
+import threading
+from datetime import datetime
 import duckdb
 import pandas as pd
-from typing import List
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from utils.utils import load_config
-from handlers.s3_handler import S3Handler
+from handlers.s3_handler import S3Handler, get_s3_handler
+
+MIGRATIONS_DIR = 'data/duckdb/migrations'
+# Bytes before the first storage block of a database file: the file header and two database headers
+DUCKDB_HEADER_SIZE = 3 * 4096
+
+_shared_connections: Dict[str, duckdb.DuckDBPyConnection] = {}
+_shared_references: Dict[str, int] = {}
+# Every cursor opened on each connection, so closing the connection can close them too
+_shared_cursors: Dict[str, List[duckdb.DuckDBPyConnection]] = {}
+_shared_lock = threading.Lock()
+
+def _connection_key(db_path: str) -> str:
+    return db_path if db_path == ':memory:' else os.path.abspath(db_path)
+
+def get_connection(db_path: str) -> duckdb.DuckDBPyConnection:
+    """
+    Returns the process-wide connection to a database file, opening it on first use.
+    Threads should not share it directly; use DuckDBHandler.get_cursor() instead.
+
+    :param db_path: The file path for the DuckDB database.
+    :return: DuckDB connection.
+    """
+    key = _connection_key(db_path)
+    with _shared_lock:
+        if key not in _shared_connections:
+            _shared_connections[key] = duckdb.connect(database=db_path, read_only=False)
+            print(f"Connected to DuckDB at {db_path}")
+        return _shared_connections[key]
+
+def close_connection(db_path: str) -> None:
+    """
+    Closes every cursor and the process-wide connection to a database file.
+
+    :param db_path: The file path for the DuckDB database.
+    """
+    key = _connection_key(db_path)
+    with _shared_lock:
+        for cursor in _shared_cursors.pop(key, []):
+            cursor.close()
+        connection = _shared_connections.pop(key, None)
+        _shared_references.pop(key, None)
+    if connection is not None:
+        connection.close()
+        print(f"Connection to DuckDB at {db_path} closed")
 
 class DuckDBHandler:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, s3_bucket: Optional[str] = None):
         """
-        Initializes the DuckDBHandler with the path to the DuckDB database file and an instance of the S3Handler class.
+        Initializes the DuckDBHandler with the path to the DuckDB database file.
+
+        Handlers share one connection per database file for the life of the process; each
+        thread works through its own cursor on it, which the handler closes when it is
+        closed. The connection is closed when the last handler using it is closed, either
+        explicitly or by leaving a with block. The S3 client is only built when a backup or
+        restore needs it.
         
         :param db_path: The file path for the DuckDB database.
-        :param s3_handler: An instance of the S3Handler class for handling operations with S3.
+        :param s3_bucket: Bucket for backups. Defaults to aws.s3_bucket in the environment config.
         """
-        # S3Handler needs a bucket
-        environment = os.getenv('PROPS_ENVIRONMENT')
-        environment_config = load_config(environment)
-        s3_bucket = environment_config['aws']['s3_bucket']
-
         self.db_path = db_path
-        self.s3_handler = S3Handler(s3_bucket)
-        self.conn = duckdb.connect(database=self.db_path, read_only=False)
+        self.s3_bucket = s3_bucket
+        self._s3_handler: Optional[S3Handler] = None
+        self.closed = False
+        self.stream_stats: Dict[str, int] = {}
+        # The calling thread's (connection, cursor)
+        self._local = threading.local()
+        self._cursors: List[duckdb.DuckDBPyConnection] = []
+        get_connection(db_path)
+        with _shared_lock:
+            key = _connection_key(db_path)
+            _shared_references[key] = _shared_references.get(key, 0) + 1
         print(f"DuckDBHandler initialized with database at {db_path}")
 
-    def backup_to_s3(self, backup_file_name: str) -> None:
+    def get_cursor(self) -> duckdb.DuckDBPyConnection:
+        """
+        Returns the calling thread's cursor on the shared connection, opening it on first
+        use. Cursors share the database but not transactions or registered relations.
+
+        :return: DuckDB cursor.
+        """
+        if self.closed:
+            raise ValueError(f"DuckDBHandler for {self.db_path} is closed")
+        connection = get_connection(self.db_path)
+        # A restore reopens the connection, closing the cursors on the old one
+        if getattr(self._local, 'connection', None) is not connection:
+            cursor = connection.cursor()
+            with _shared_lock:
+                _shared_cursors.setdefault(_connection_key(self.db_path), []).append(cursor)
+                self._cursors.append(cursor)
+            self._local.connection = connection
+            self._local.cursor = cursor
+        return self._local.cursor
+
+    @property
+    def conn(self) -> duckdb.DuckDBPyConnection:
+        """
+        :return: The calling thread's cursor on the shared connection.
+        """
+        return self.get_cursor()
+
+    @property
+    def s3_handler(self) -> S3Handler:
+        """
+        :return: The process-wide S3Handler for the backup bucket, created on first use.
         """
-        Backs up the DuckDB database file to an S3 bucket using the S3Handler.
+        if self._s3_handler is None:
+            if self.s3_bucket is None:
+                # S3Handler needs a bucket
+                environment_config = load_config(os.getenv('PROPS_ENVIRONMENT'))
+                self.s3_bucket = environment_config['aws']['s3_bucket']
+            self._s3_handler = get_s3_handler(self.s3_bucket)
+        return self._s3_handler
+
+    def backup_to_s3(self, backup_file_name: str, part_size: int = 16 * 1024 * 1024, max_workers: int = 8) -> Dict[str, float]:
+        """
+        Backs up the DuckDB database file to S3. A CHECKPOINT first folds the WAL into the
+        database file, so the file alone is a complete copy; it is then uploaded in parallel
+        parts with per-part checksums (see S3Handler.upload_file_parallel).
         
         :param backup_file_name: The name of the file in the S3 bucket.
+        :param part_size: Bytes per uploaded part.
+        :param max_workers: Number of parts uploaded at once.
+        :return: Transfer stats with 'bytes', 'parts', 'seconds' and 'mb_per_sec'.
         """
-        self.s3_handler.upload_file(self.db_path, backup_file_name)
+        self.conn.execute("CHECKPOINT")
+        stats = self.s3_handler.upload_file_parallel(self.db_path, backup_file_name, part_size=part_size, max_workers=max_workers)
         print(f"Database backed up to S3 as {backup_file_name}")
+        return stats
 
-    def restore_from_s3(self, backup_file_name: str) -> None:
+    def restore_from_s3(self, backup_file_name: str, max_workers: int = 8) -> Dict[str, float]:
         """
-        Restores the DuckDB database file from an S3 bucket using the S3Handler.
+        Restores the DuckDB database file from S3 with parallel ranged downloads, verified
+        against the backup's part checksums. The shared connection is closed while the file
+        is swapped in and any stale WAL removed, then reopened; every handler on this
+        database sees the restored data.
         
         :param backup_file_name: The name of the file in the S3 bucket.
+        :param max_workers: Number of ranges downloaded at once.
+        :return: Transfer stats with 'bytes', 'parts', 'seconds' and 'mb_per_sec'.
         """
-        self.s3_handler.download_file(self.db_path, backup_file_name)
+        if self.closed:
+            raise ValueError(f"DuckDBHandler for {self.db_path} is closed")
+        # Download and verify next to the database before touching it
+        restore_path = f"{self.db_path}.restore"
+        stats = self.s3_handler.download_file_parallel(backup_file_name, restore_path, max_workers=max_workers)
+        self._swap_in_database(restore_path)
         print(f"Database restored from S3 from {backup_file_name}")
+        return stats
+
+    def backup_to_s3_incremental(self, base_key: str, backup_name: str, max_workers: int = 8) -> Dict[str, float]:
+        """
+        Backs up the DuckDB database file to a content-addressed chunk store in S3 after a
+        CHECKPOINT, uploading only the chunks no earlier backup has stored (see
+        S3Handler.upload_file_incremental). Chunks start after the file's headers, so they
+        line up with storage blocks. Between ingest runs few blocks change, so this is
+        cheap enough to run after every run.
+
+        :param base_key: Prefix of the chunk store.
+        :param backup_name: Name of this backup, e.g. a timestamp.
+        :param max_workers: Number of chunks hashed and uploaded at once.
+        :return: Transfer stats, including 'uploaded_chunks' and 'uploaded_bytes'.
+        """
+        self.conn.execute("CHECKPOINT")
+        stats = self.s3_handler.upload_file_incremental(
+            self.db_path, base_key, backup_name, max_workers=max_workers, first_chunk_size=DUCKDB_HEADER_SIZE
+        )
+        print(f"Database backed up incrementally to S3 as {backup_name}")
+        return stats
+
+    def restore_from_s3_incremental(self, base_key: str, backup_name: str, max_workers: int = 8) -> Dict[str, float]:
+        """
+        Restores the DuckDB database file from a backup written by backup_to_s3_incremental,
+        swapping it in the same way as restore_from_s3.
+
+        :param base_key: Prefix of the chunk store.
+        :param backup_name: Name of the backup to restore.
+        :param max_workers: Number of chunks downloaded at once.
+        :return: Transfer stats.
+        """
+        if self.closed:
+            raise ValueError(f"DuckDBHandler for {self.db_path} is closed")
+        restore_path = f"{self.db_path}.restore"
+        stats = self.s3_handler.download_file_incremental(base_key, backup_name, restore_path, max_workers=max_workers)
+        self._swap_in_database(restore_path)
+        print(f"Database restored from S3 from {backup_name}")
+        return stats
+
+    def _swap_in_database(self, restore_path: str) -> None:
+        key = _connection_key(self.db_path)
+        with _shared_lock:
+            references = _shared_references.get(key, 0)
+        close_connection(self.db_path)
+        os.replace(restore_path, self.db_path)
+        if os.path.exists(f"{self.db_path}.wal"):
+            os.remove(f"{self.db_path}.wal")
+        get_connection(self.db_path)
+        with _shared_lock:
+            _shared_references[key] = references
 
     def insert_data(self, table_name: str, data: pd.DataFrame) -> None:
         """
@@ -54,34 +222,218 @@ class DuckDBHandler:
         self.conn.execute(f"INSERT INTO {table_name} SELECT * FROM temp_df")
         print(f"Data inserted into {table_name}")
 
-    def upsert_data(self, table_name: str, data: pd.DataFrame, key_columns: List[str]) -> None:
+    def append_arrow(
+            self,
+            table_name: str,
+            data: Union[pa.Table, pa.RecordBatchReader, Iterable[pa.RecordBatch]],
+            commit_every: Optional[int] = None
+        ) -> int:
+        """
+        Appends Arrow data to a table. DuckDB scans the Arrow buffers directly, with no
+        pandas conversion. Columns are matched by name, so their order does not matter and
+        table columns missing from the data are left NULL.
+
+        :param table_name: The name of the table to insert data into.
+        :param data: pyarrow Table, RecordBatchReader, or iterable of RecordBatches sharing a schema.
+        :param commit_every: Commit after this many record batches. None loads everything in one transaction.
+        :return: Number of rows inserted.
+        """
+        if isinstance(data, pa.Table):
+            schema, batches = data.schema, data.to_batches()
+        elif isinstance(data, pa.RecordBatchReader):
+            schema, batches = data.schema, data
+        else:
+            batches = iter(data)
+            first = next(batches, None)
+            if first is None:
+                print(f"No data to insert into {table_name}")
+                return 0
+            schema, batches = first.schema, itertools.chain([first], batches)
+
+        batches = iter(batches)
+        if commit_every is None:
+            groups = [batches]
+        else:
+            groups = iter(lambda: list(itertools.islice(batches, commit_every)), [])
+
+        rows = 0
+        for group in groups:
+            reader = pa.RecordBatchReader.from_batches(schema, group)
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                self.conn.register('arrow_batches', reader)
+                rows += self.conn.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM arrow_batches").fetchone()[0]
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            finally:
+                self.conn.unregister('arrow_batches')
+        print(f"{rows} rows inserted into {table_name}")
+        return rows
+
+    def upsert_data(self, table_name: str, data: pd.DataFrame, key_columns: List[str]) -> Dict[str, int]:
         """
         Upserts data into a specified table using a pandas DataFrame.
+
+        Rows whose key matches an existing row replace its other columns; the rest are
+        inserted. DuckDB finds conflicts through the index of a PRIMARY KEY or UNIQUE
+        constraint on the key columns, so the cost tracks the size of the data rather than
+        of the table. If the table has no such constraint, the first upsert creates a unique
+        index on the key columns. Everything runs in one transaction and leaves no helper tables behind.
         
         :param table_name: The name of the table.
         :param data: pandas DataFrame containing the data.
         :param key_columns: List of columns that define the uniqueness constraint.
+        :return: Dictionary with the number of rows 'inserted' and 'updated'.
+        :raises ValueError: If a key column is missing, or the data or table contain duplicate keys.
         """
         if not isinstance(data, pd.DataFrame):
             raise ValueError('Data should be a pandas DataFrame')
-        temp_table = f"{table_name}_temp"
-        self.conn.register('temp_df', data)
-        self.conn.execute(f"CREATE TABLE {temp_table} AS SELECT * FROM temp_df")
-        key_condition = " AND ".join([f"{table_name}.{col} = {temp_table}.{col}" for col in key_columns])
+        missing_columns = [col for col in key_columns if col not in data.columns]
+        if missing_columns:
+            raise ValueError(f"Key columns {missing_columns} not found in data")
+        duplicates = data[data.duplicated(subset=key_columns, keep=False)]
+        if not duplicates.empty:
+            raise ValueError(f"Data contains {len(duplicates)} rows with duplicate keys, e.g.\n{duplicates[key_columns].head()}")
+
+        index_name = f"{table_name}_{'_'.join(key_columns)}_key"
+        keys = ", ".join(key_columns)
         insert_columns = ", ".join(data.columns)
-        insert_values = ", ".join([f"{temp_table}.{col}" for col in data.columns])
+        update_columns = [col for col in data.columns if col not in key_columns]
+        if update_columns:
+            on_conflict = "DO UPDATE SET " + ", ".join([f"{col} = excluded.{col}" for col in update_columns])
+        else:
+            on_conflict = "DO NOTHING"
+
+        self.conn.register('upsert_df', data)
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            index_exists = self.conn.execute(
+                "SELECT count(*) FROM duckdb_indexes() WHERE index_name = ?", [index_name]
+            ).fetchone()[0]
+            # A PRIMARY KEY or UNIQUE constraint on the same columns already has an index
+            constraint_exists = self.conn.execute(
+                """
+                SELECT count(*) FROM duckdb_constraints()
+                WHERE table_name = ? AND constraint_type IN ('PRIMARY KEY', 'UNIQUE')
+                AND list_sort(constraint_column_names) = list_sort(?::VARCHAR[])
+                """,
+                [table_name.split('.')[-1], key_columns]
+            ).fetchone()[0]
+            if not index_exists and not constraint_exists:
+                duplicates = self.conn.execute(
+                    f"SELECT {keys}, count(*) AS rows FROM {table_name} GROUP BY {keys} HAVING count(*) > 1 LIMIT 5"
+                ).fetchdf()
+                if not duplicates.empty:
+                    raise ValueError(f"{table_name} already contains duplicate keys on ({keys}), e.g.\n{duplicates}")
+                self.conn.execute(f"CREATE UNIQUE INDEX {index_name} ON {table_name} ({keys})")
+            updated = self.conn.execute(f"SELECT count(*) FROM upsert_df JOIN {table_name} USING ({keys})").fetchone()[0]
+            self.conn.execute(f"""
+            INSERT INTO {table_name} ({insert_columns}) SELECT {insert_columns} FROM upsert_df
+            ON CONFLICT ({keys}) {on_conflict}
+            """)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.conn.unregister('upsert_df')
+        counts = {'inserted': len(data) - updated, 'updated': updated}
+        print(f"Data upserted into {table_name}: {counts['inserted']} inserted, {counts['updated']} updated")
+        return counts
+
+    def merge_history(
+            self,
+            table_name: str,
+            data: Union[pa.Table, pd.DataFrame],
+            key_columns: List[str],
+            compare_columns: List[str],
+            valid_from: datetime,
+            scope_column: str,
+            scope_values: Optional[List] = None,
+            run_id: Optional[int] = None,
+            skip_scope_values: Optional[List] = None
+        ) -> Dict[str, int]:
+        """
+        Merges a snapshot into a history table that keeps one row per key and value interval,
+        open while valid_to is NULL. Only what changed is written: a current row whose key
+        is missing from the snapshot, or whose compare_columns differ, is closed at valid_from,
+        and a snapshot row is inserted only if its key has no current row left. Keys match
+        NULL to NULL, and snapshot values are cast to the table's column types before comparing.
+        Columns missing from the snapshot count as NULL.
 
-        upsert_query = f"""
-        BEGIN TRANSACTION;
-        DELETE FROM {table_name} WHERE EXISTS (
-            SELECT 1 FROM {temp_table} WHERE {key_condition}
-        );
-        INSERT INTO {table_name} ({insert_columns}) SELECT {insert_values} FROM {temp_table};
-        DROP TABLE {temp_table};
-        COMMIT;
+        Only current rows whose scope_column is in scope_values, or every current row if it is
+        None, are considered, and rows whose scope_column is in skip_scope_values never are. So
+        a snapshot covering part of the data (e.g. the subcategories that changed in one run)
+        leaves the other intervals open. Everything runs in one transaction.
+
+        :param table_name: History table with the data columns plus valid_from and valid_to
+            (and run_id and closed_run_id if run_id is given).
+        :param data: Snapshot as a pyarrow Table or pandas DataFrame, without the history columns.
+        :param key_columns: Columns identifying an entity, e.g. an outcome of an offer.
+        :param compare_columns: Columns whose change opens a new interval, e.g. odds and line.
+        :param valid_from: Time the snapshot was taken.
+        :param scope_column: Column that says which part of the data a row belongs to.
+        :param scope_values: Values of scope_column covered by the snapshot. None for all.
+        :param run_id: Recorded in run_id on opened rows and closed_run_id on closed rows.
+        :param skip_scope_values: Values of scope_column whose current rows are left open,
+            e.g. subcategories that have not changed.
+        :return: Dictionary with the number of rows 'inserted', 'closed' and 'unchanged'.
         """
-        self.conn.execute(upsert_query)
-        print(f"Data upserted into {table_name}")
+        column_types = dict(self.conn.execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = ?", [table_name]
+        ).fetchall())
+        data_columns = data.column_names if isinstance(data, pa.Table) else list(data.columns)
+        snapshot_columns = [col for col in data_columns if col in column_types]
+        # Columns missing from the snapshot are inserted as NULL, so they match NULL
+        matches = lambda columns: " AND ".join([
+            f"h.{col} IS NOT DISTINCT FROM CAST(b.{col} AS {column_types[col]})" if col in data_columns else f"h.{col} IS NULL"
+            for col in columns
+        ])
+        open_columns = "$valid_from AS valid_from" + (", $run_id AS run_id" if run_id is not None else "")
+        close_columns = "valid_to = $valid_from" + (", closed_run_id = $run_id" if run_id is not None else "")
+        parameters = {'valid_from': valid_from}
+        if run_id is not None:
+            parameters['run_id'] = run_id
+        scope_filters = ""
+        if scope_values is not None:
+            scope_filters += f"AND list_contains(CAST($scope AS {column_types[scope_column]}[]), h.{scope_column})"
+            parameters['scope'] = list(scope_values)
+        if skip_scope_values:
+            scope_filters += f" AND NOT list_contains(CAST($skip_scope AS {column_types[scope_column]}[]), h.{scope_column})"
+            parameters['skip_scope'] = list(skip_scope_values)
+
+        self.conn.register('history_batch', data)
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            closed = self.conn.execute(f"""
+            UPDATE {table_name} AS h SET {close_columns}
+            WHERE h.valid_to IS NULL
+            {scope_filters}
+            AND NOT EXISTS (
+                SELECT 1 FROM history_batch b WHERE {matches(key_columns)} AND {matches(compare_columns)}
+            )
+            """, parameters).fetchone()[0]
+            parameters.pop('scope', None)
+            parameters.pop('skip_scope', None)
+            inserted = self.conn.execute(f"""
+            INSERT INTO {table_name} BY NAME
+            SELECT {', '.join([f'b.{col}' for col in snapshot_columns])}, {open_columns}
+            FROM history_batch b
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table_name} h WHERE h.valid_to IS NULL AND {matches(key_columns)}
+            )
+            """, parameters).fetchone()[0]
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.conn.unregister('history_batch')
+        counts = {'inserted': inserted, 'closed': closed, 'unchanged': len(data) - inserted}
+        print(f"History merged into {table_name}: {inserted} inserted, {closed} closed, {counts['unchanged']} unchanged")
+        return counts
 
     def query(self, query: str) -> pd.DataFrame:
         """
@@ -93,21 +445,193 @@ class DuckDBHandler:
         result = self.conn.execute(query).fetchdf()
         print(f"Query executed successfully")
         return result
-    
-    def execute(self, statement: str) -> pd.DataFrame:
+
+    def query_parquet_lake(
+            self,
+            query: str,
+            base_key: str,
+            partition_filters: Optional[Dict[str, Iterable]] = None,
+            columns: Optional[List[str]] = None,
+            filters: Optional[List[Tuple]] = None,
+            parameters: Optional[Union[list, dict]] = None,
+            partition_cols: Optional[List[str]] = None
+        ) -> pd.DataFrame:
+        """
+        Runs a query against a Hive-partitioned Parquet dataset in the backup bucket, read
+        with S3Handler.read_parquet_dataset and visible to the query as the relation 'lake'.
+        Only the partitions, columns and row groups the filters allow are fetched, e.g. to
+        rebuild a table with "INSERT INTO t BY NAME SELECT * FROM lake".
+
+        :param query: SQL referencing 'lake'.
+        :param base_key: Prefix of the dataset.
+        :param partition_filters: Allowed values per partition column, e.g. {'date': ['2024-09-01']}.
+        :param columns: Data columns to read. None reads all of them.
+        :param filters: Row filters on data columns, e.g. [('outcome_label', '=', 'Over')].
+        :param parameters: Query parameters.
+        :param partition_cols: Partition columns, outermost first, as written.
+        :return: pandas DataFrame, empty if no objects match.
+        """
+        lake = self.s3_handler.read_parquet_dataset(base_key, partition_filters, columns, filters, partition_cols=partition_cols)
+        if lake is None:
+            return pd.DataFrame()
+        self.conn.register('lake', lake)
+        try:
+            result = self.conn.execute(query, parameters).fetchdf()
+        finally:
+            self.conn.unregister('lake')
+        print(f"Query on {base_key} executed successfully")
+        return result
+
+    def apply_migrations(self, migrations_dir: str = MIGRATIONS_DIR) -> List[str]:
+        """
+        Applies the .sql files in migrations_dir that have not been applied to this database
+        yet, in file name order. Each file runs in its own transaction together with its
+        entry in schema_migrations, so a failed migration leaves no trace and is retried
+        on the next call.
+
+        :param migrations_dir: Directory of numbered migration files, e.g. 0001_ingest_runs.sql.
+        :return: Versions (file names without .sql) applied by this call.
+        """
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL
+        )
+        """)
+        applied = {row[0] for row in self.conn.execute("SELECT version FROM schema_migrations").fetchall()}
+        versions = []
+        for file_name in sorted(os.listdir(migrations_dir)):
+            version, extension = os.path.splitext(file_name)
+            if extension != '.sql' or version in applied:
+                continue
+            with open(os.path.join(migrations_dir, file_name), 'r') as file:
+                statements = file.read()
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                self.conn.execute(statements)
+                self.conn.execute("INSERT INTO schema_migrations VALUES (?, now())", [version])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            print(f"Applied migration {version}")
+            versions.append(version)
+        return versions
+
+    def stream_query(
+            self,
+            query: str,
+            parameters: Optional[list] = None,
+            batch_size: int = 100_000,
+            as_pandas: bool = False
+        ) -> Iterator[Union[pa.RecordBatch, pd.DataFrame]]:
+        """
+        Executes a SQL query and yields the results in chunks, so memory stays bounded by
+        batch_size rather than by the size of the result. The query runs on its own cursor,
+        so other queries can be issued while the stream is being consumed. Rows and bytes
+        streamed are printed at the end and kept in self.stream_stats.
+
+        :param query: The SQL query string.
+        :param parameters: Optional values for the query's ? placeholders.
+        :param batch_size: Maximum number of rows per chunk.
+        :param as_pandas: Yield pandas DataFrames instead of Arrow record batches.
+        :return: Iterator of Arrow RecordBatches or pandas DataFrames.
+        """
+        cursor = get_connection(self.db_path).cursor()
+        self.stream_stats = {'rows': 0, 'bytes': 0, 'batches': 0}
+        try:
+            reader = cursor.execute(query, parameters).fetch_record_batch(batch_size)
+            for batch in reader:
+                self.stream_stats['rows'] += batch.num_rows
+                self.stream_stats['bytes'] += batch.nbytes
+                self.stream_stats['batches'] += 1
+                yield batch.to_pandas() if as_pandas else batch
+        finally:
+            cursor.close()
+        print(f"Streamed {self.stream_stats['rows']} rows ({self.stream_stats['bytes']} bytes) in {self.stream_stats['batches']} batches")
+
+    def export_query(
+            self,
+            query: str,
+            path: str,
+            file_format: str = 'parquet',
+            parameters: Optional[list] = None,
+            batch_size: int = 100_000
+        ) -> Dict[str, int]:
+        """
+        Streams the results of a SQL query to a Parquet or CSV file one batch at a time.
+
+        :param query: The SQL query string.
+        :param path: Path of the file to write.
+        :param file_format: 'parquet' or 'csv'.
+        :param parameters: Optional values for the query's ? placeholders.
+        :param batch_size: Maximum number of rows held in memory at once.
+        :return: Dictionary with 'rows' and 'bytes' streamed, 'batches', and 'file_bytes' written.
+        """
+        if file_format not in ('parquet', 'csv'):
+            raise ValueError(f"Export format must be 'parquet' or 'csv', got '{file_format}'")
+        writer = None
+        try:
+            for batch in self.stream_query(query, parameters, batch_size):
+                if writer is None:
+                    if file_format == 'parquet':
+                        writer = pq.ParquetWriter(path, batch.schema, compression='zstd')
+                    else:
+                        writer = pa_csv.CSVWriter(path, batch.schema)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            # No batches: still produce a file with the result's columns
+            empty = get_connection(self.db_path).cursor()
+            try:
+                table = empty.execute(query, parameters).arrow()
+            finally:
+                empty.close()
+            if file_format == 'parquet':
+                pq.write_table(table, path)
+            else:
+                pa_csv.write_csv(table, path)
+        stats = dict(self.stream_stats, file_bytes=os.path.getsize(path))
+        print(f"Exported {stats['rows']} rows to {path} ({stats['file_bytes']} bytes)")
+        return stats
+
+    def execute(self, statement: str, parameters: Optional[list] = None) -> pd.DataFrame:
         """
         Executes a SQL statement.
         
         :param query: The SQL statement string.
+        :param parameters: Optional values for the statement's ? placeholders.
         :return: None
         """
 
-        self.conn.execute(statement)
+        self.conn.execute(statement, parameters)
         print(f"Statement executed successfully")
 
-    def __del__(self):
+    def close(self) -> None:
         """
-        Ensure that the DuckDB connection is closed when the object is deleted.
+        Closes this handler's cursors and releases its use of the shared connection,
+        closing it if no other handler is using it.
         """
-        self.conn.close()
-        print(f"Connection to DuckDB closed")
+        if self.closed:
+            return
+        self.closed = True
+        key = _connection_key(self.db_path)
+        with _shared_lock:
+            cursors = _shared_cursors.get(key, [])
+            for cursor in self._cursors:
+                if cursor in cursors:
+                    cursors.remove(cursor)
+                    cursor.close()
+            self._cursors = []
+            _shared_references[key] = _shared_references.get(key, 1) - 1
+            last = _shared_references[key] <= 0
+        if last:
+            close_connection(self.db_path)
+
+    def __enter__(self) -> 'DuckDBHandler':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
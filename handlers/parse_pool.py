@@ -0,0 +1,95 @@
+import os
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+class ParsePool:
+    def __init__(self, parse_fn: Callable[..., Any], max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        """
+        Initializes the ParsePool, which parses raw payloads in worker processes so that
+        parsing overlaps with fetching and uses every core.
+
+        Payloads are handed over as bytes, which pickle as a single buffer, and results come
+        back as column arrays rather than dict trees. At most max_pending payloads are queued
+        or being parsed at once; submit() blocks beyond that, which slows the consumer of
+        responses instead of letting raw payloads pile up in memory.
+
+        :param parse_fn: Module-level function called as parse_fn(raw, *args) in a worker.
+        :param max_workers: Number of worker processes. Defaults to the number of CPUs.
+        :param max_pending: Maximum number of payloads in flight. Defaults to twice max_workers.
+        """
+        self.parse_fn = parse_fn
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        # The flow fetches on background threads, which a forked worker would inherit mid-state
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.completed: queue.Queue = queue.Queue()
+        self.pending = 0
+        self.lock = threading.Lock()
+        print(f"ParsePool started with {self.max_workers} workers, {self.max_pending} payloads in flight.")
+
+    def submit(self, key: Any, raw: bytes, *args) -> None:
+        """
+        Queues a payload for parsing, blocking while max_pending payloads are in flight.
+
+        :param key: Handed back with the result.
+        :param raw: Raw payload bytes, e.g. response.content.
+        :param args: Further arguments for parse_fn.
+        """
+        self.slots.acquire()
+        with self.lock:
+            self.pending += 1
+        future = self.executor.submit(self.parse_fn, raw, *args)
+        future.add_done_callback(lambda f: self._complete(key, f))
+
+    def _complete(self, key: Any, future: Future) -> None:
+        self.completed.put((key, future))
+        self.slots.release()
+
+    def _result(self, key: Any, future: Future) -> Tuple[Any, Any, Optional[BaseException]]:
+        with self.lock:
+            self.pending -= 1
+        error = future.exception()
+        return key, None if error else future.result(), error
+
+    def ready(self) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+        """
+        Yields the payloads parsed so far without waiting.
+
+        :return: Iterator of (key, result, error) tuples; result is None when error is set.
+        """
+        while True:
+            try:
+                key, future = self.completed.get_nowait()
+            except queue.Empty:
+                return
+            yield self._result(key, future)
+
+    def drain(self) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+        """
+        Yields every remaining result, waiting for payloads still being parsed.
+
+        :return: Iterator of (key, result, error) tuples; result is None when error is set.
+        """
+        while True:
+            with self.lock:
+                if self.pending == 0:
+                    return
+            key, future = self.completed.get()
+            yield self._result(key, future)
+
+    def close(self) -> None:
+        """
+        Shuts down the worker processes.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> 'ParsePool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,198 @@
+import time
+import random
+import threading
+import requests
+from typing import Dict, Any, List, Optional
+
+# Responses that mean the exit node itself is blocked or broken, not the request.
+PROXY_FAILURE_STATUS_CODES = {403, 407, 429}
+
+class ProxyPool:
+    def __init__(
+            self,
+            proxies: List[str],
+            max_requests_per_proxy: int = 10,
+            cooldown_secs: float = 60,
+            cooldown_after_failures: int = 2,
+            eject_after_failures: int = 5,
+            eject_error_rate: float = 0.5,
+            min_requests_for_error_rate: int = 10,
+            latency_smoothing: float = 0.3
+        ):
+        """
+        Initializes the ProxyPool, which tracks latency, error rate and cooldown per proxy and
+        picks proxies weighted toward fast, healthy ones.
+
+        A proxy is reused for up to max_requests_per_proxy requests while it stays healthy.
+        Consecutive failures first put a proxy into cooldown, then eject it for the rest of
+        the run, as does a high error rate. Each proxy gets its own pooled requests.Session.
+
+        :param proxies: List of proxy URLs.
+        :param max_requests_per_proxy: Requests sent through one proxy before choosing again.
+        :param cooldown_secs: Seconds a proxy sits out after cooldown_after_failures consecutive failures.
+        :param cooldown_after_failures: Consecutive failures that trigger a cooldown.
+        :param eject_after_failures: Consecutive failures that eject a proxy.
+        :param eject_error_rate: Error rate that ejects a proxy once it has min_requests_for_error_rate requests.
+        :param min_requests_for_error_rate: Requests needed before the error rate is trusted.
+        :param latency_smoothing: Weight of the newest sample in the latency moving average.
+        """
+        self.max_requests_per_proxy = max_requests_per_proxy
+        self.cooldown_secs = cooldown_secs
+        self.cooldown_after_failures = cooldown_after_failures
+        self.eject_after_failures = eject_after_failures
+        self.eject_error_rate = eject_error_rate
+        self.min_requests_for_error_rate = min_requests_for_error_rate
+        self.latency_smoothing = latency_smoothing
+        self.stats: Dict[str, Dict[str, Any]] = {
+            proxy: {
+                'latency': None,
+                'requests': 0,
+                'errors': 0,
+                'consecutive_failures': 0,
+                'cooldown_until': 0.0,
+                'ejected': False
+            }
+            for proxy in proxies
+        }
+        self.sessions: Dict[str, requests.Session] = {}
+        self.current_proxy: Optional[str] = None
+        self.current_uses = 0
+        self.lock = threading.Lock()
+
+    def is_available(self, proxy: str, now: float) -> bool:
+        """
+        :return: True if the proxy is neither ejected nor cooling down.
+        """
+        stats = self.stats[proxy]
+        return not stats['ejected'] and stats['cooldown_until'] <= now
+
+    def weight(self, proxy: str) -> float:
+        """
+        Scores a proxy by success rate over latency. Proxies without latency samples are
+        scored at the pool's average latency so that they still get tried.
+
+        :param proxy: Proxy URL.
+        :return: Selection weight.
+        """
+        stats = self.stats[proxy]
+        latencies = [s['latency'] for s in self.stats.values() if s['latency'] is not None]
+        latency = stats['latency'] or (sum(latencies) / len(latencies) if latencies else 1.0)
+        # Laplace smoothing keeps one early error from zeroing a proxy's weight
+        success_rate = (stats['requests'] - stats['errors'] + 1) / (stats['requests'] + 2)
+        return success_rate / max(latency, 0.001)
+
+    def choose(self) -> Optional[str]:
+        """
+        Returns the proxy for the next request. The current proxy is kept until it has served
+        max_requests_per_proxy requests or becomes unavailable. If every proxy is cooling down,
+        the one that recovers first is used.
+
+        :return: Proxy URL, or None if every proxy has been ejected.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if (
+                self.current_proxy is not None
+                and self.current_uses < self.max_requests_per_proxy
+                and self.is_available(self.current_proxy, now)
+            ):
+                self.current_uses += 1
+                return self.current_proxy
+
+            available = [proxy for proxy in self.stats if self.is_available(proxy, now)]
+            if available:
+                proxy = random.choices(available, weights=[self.weight(p) for p in available])[0]
+            else:
+                cooling = [proxy for proxy in self.stats if not self.stats[proxy]['ejected']]
+                if not cooling:
+                    print("All proxies have been ejected.")
+                    return None
+                proxy = min(cooling, key=lambda p: self.stats[p]['cooldown_until'])
+            self.current_proxy = proxy
+            self.current_uses = 1
+            return proxy
+
+    def session(self, proxy: str) -> requests.Session:
+        """
+        Returns the connection-pooled session that sends requests through the proxy.
+
+        :param proxy: Proxy URL.
+        :return: requests.Session
+        """
+        with self.lock:
+            if proxy not in self.sessions:
+                session = requests.Session()
+                session.proxies.update({"http": proxy, "https": proxy})
+                self.sessions[proxy] = session
+            return self.sessions[proxy]
+
+    def record_success(self, proxy: str, latency_secs: float) -> None:
+        """
+        :param proxy: Proxy URL.
+        :param latency_secs: Time the request took.
+        """
+        with self.lock:
+            stats = self.stats[proxy]
+            stats['requests'] += 1
+            stats['consecutive_failures'] = 0
+            if stats['latency'] is None:
+                stats['latency'] = latency_secs
+            else:
+                stats['latency'] += self.latency_smoothing * (latency_secs - stats['latency'])
+
+    def record_failure(self, proxy: str) -> None:
+        """
+        Counts a failure against the proxy, cooling it down or ejecting it as needed.
+
+        :param proxy: Proxy URL.
+        """
+        with self.lock:
+            stats = self.stats[proxy]
+            stats['requests'] += 1
+            stats['errors'] += 1
+            stats['consecutive_failures'] += 1
+            error_rate = stats['errors'] / stats['requests']
+            if (
+                stats['consecutive_failures'] >= self.eject_after_failures
+                or (stats['requests'] >= self.min_requests_for_error_rate and error_rate >= self.eject_error_rate)
+            ):
+                stats['ejected'] = True
+                print(f"Ejected proxy {proxy} ({stats['errors']}/{stats['requests']} failed).")
+            elif stats['consecutive_failures'] >= self.cooldown_after_failures:
+                stats['cooldown_until'] = time.monotonic() + self.cooldown_secs
+                print(f"Cooling down proxy {proxy} for {self.cooldown_secs} seconds.")
+
+    def record_response(self, proxy: str, status_code: int, latency_secs: float) -> None:
+        """
+        Records a response received through the proxy. Statuses in PROXY_FAILURE_STATUS_CODES
+        count as proxy failures; anything else shows the proxy is working.
+
+        :param proxy: Proxy URL.
+        :param status_code: HTTP status code of the response.
+        :param latency_secs: Time the request took.
+        """
+        if status_code in PROXY_FAILURE_STATUS_CODES:
+            self.record_failure(proxy)
+        else:
+            self.record_success(proxy, latency_secs)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Prints and returns the latency, request and error counts of every proxy.
+
+        :return: Dictionary of proxy URL to stats.
+        """
+        for proxy, stats in self.stats.items():
+            latency = f"{stats['latency']:.2f}s" if stats['latency'] is not None else 'n/a'
+            status = 'ejected' if stats['ejected'] else 'ok'
+            print(f"{proxy}: {stats['requests']} requests, {stats['errors']} errors, latency {latency}, {status}")
+        return self.stats
+
+    def close(self) -> None:
+        """
+        Closes every proxy session. A proxy used afterwards gets a new one.
+        """
+        with self.lock:
+            sessions, self.sessions = self.sessions, {}
+        for session in sessions.values():
+            session.close()
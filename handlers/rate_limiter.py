@@ -0,0 +1,152 @@
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from typing import Dict, Optional, Tuple
+
+class TokenBucket:
+    def __init__(self, requests_per_minute: Optional[float], burst: int = 1):
+        """
+        Initializes a thread-safe token bucket that refills at requests_per_minute.
+
+        Tokens accrue on the wall clock, so time already spent waiting on the network
+        counts toward the budget and only the remainder has to be slept.
+
+        :param requests_per_minute: Target rate. None or 0 disables limiting.
+        :param burst: Maximum number of tokens that can accumulate while idle.
+        """
+        self.rate = requests_per_minute / 60 if requests_per_minute else None
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token and returns how long the caller must wait before using it.
+        Reservations are never cancelled, so concurrent callers queue up behind each other.
+
+        :return: Seconds to wait. 0 if a token was available.
+        """
+        if self.rate is None:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+class RateLimiter:
+    def __init__(
+            self,
+            requests_per_minute: Optional[float],
+            proxy_requests_per_minute: Optional[float] = None,
+            burst: int = 1,
+            jitter_secs: float = 0.0
+        ):
+        """
+        Initializes a rate limiter with one token bucket per host and one per proxy.
+        A request waits until both its host and its proxy have a token available.
+
+        :param requests_per_minute: Target requests per minute for each host.
+        :param proxy_requests_per_minute: Target requests per minute through each proxy. None disables.
+        :param burst: Number of requests a host or proxy may send back to back after being idle.
+        :param jitter_secs: Upper bound of the random delay added whenever a request has to wait.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.proxy_requests_per_minute = proxy_requests_per_minute
+        self.burst = burst
+        self.jitter_secs = jitter_secs
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, kind: str, name: str) -> TokenBucket:
+        """
+        Returns the token bucket for a host or proxy, creating it on first use.
+
+        :param kind: 'host' or 'proxy'.
+        :param name: Host name or proxy URL.
+        :return: TokenBucket shared by every request to that host or through that proxy.
+        """
+        with self.lock:
+            if (kind, name) not in self.buckets:
+                rate = self.requests_per_minute if kind == 'host' else self.proxy_requests_per_minute
+                self.buckets[(kind, name)] = TokenBucket(rate, self.burst)
+            return self.buckets[(kind, name)]
+
+    def reserve(self, url: str, proxy: Optional[str] = None) -> float:
+        """
+        Reserves a token for the URL's host and, if given, for the proxy.
+
+        :param url: URL about to be requested.
+        :param proxy: Optional proxy the request is sent through.
+        :return: Seconds to wait before sending the request.
+        """
+        wait_secs = self.bucket('host', urlsplit(url).netloc).reserve()
+        if proxy:
+            wait_secs = max(wait_secs, self.bucket('proxy', proxy).reserve())
+        if wait_secs > 0 and self.jitter_secs:
+            wait_secs += random.uniform(0, self.jitter_secs)
+        return wait_secs
+
+    def acquire(self, url: str, proxy: Optional[str] = None) -> float:
+        """
+        Blocks until a request to the URL fits inside the budget.
+
+        :param url: URL about to be requested.
+        :param proxy: Optional proxy the request is sent through.
+        :return: Seconds slept.
+        """
+        wait_secs = self.reserve(url, proxy)
+        if wait_secs > 0:
+            print(f"Rate limited; sleeping for {wait_secs:.2f} seconds.")
+            time.sleep(wait_secs)
+        return wait_secs
+
+    async def acquire_async(self, url: str, proxy: Optional[str] = None) -> float:
+        """
+        Waits, without blocking the event loop, until a request to the URL fits inside the budget.
+
+        :param url: URL about to be requested.
+        :param proxy: Optional proxy the request is sent through.
+        :return: Seconds slept.
+        """
+        wait_secs = self.reserve(url, proxy)
+        if wait_secs > 0:
+            print(f"Rate limited; sleeping for {wait_secs:.2f} seconds.")
+            await asyncio.sleep(wait_secs)
+        return wait_secs
+
+    @classmethod
+    def from_sleep_range(cls, sleep_secs_min: int, sleep_secs_max: int) -> 'RateLimiter':
+        """
+        Builds a limiter equivalent on average to sleeping randint(sleep_secs_min, sleep_secs_max)
+        between requests: sleep_secs_min sets the rate and the spread becomes jitter.
+
+        :param sleep_secs_min: Minimum number of seconds between requests.
+        :param sleep_secs_max: Maximum number of seconds between requests.
+        :return: RateLimiter
+        """
+        requests_per_minute = 60 / sleep_secs_min if sleep_secs_min else None
+        return cls(requests_per_minute, jitter_secs=sleep_secs_max - sleep_secs_min)
+
+_shared_rate_limiters: Dict[str, RateLimiter] = {}
+_shared_lock = threading.Lock()
+
+def get_rate_limiter(name: str = 'default', **kwargs) -> RateLimiter:
+    """
+    Returns the process-wide rate limiter registered under name, creating it with kwargs
+    on first use. Later calls ignore kwargs so every handler and flow shares one budget.
+
+    :param name: Name of the shared limiter.
+    :param kwargs: Arguments passed to RateLimiter on first use.
+    :return: RateLimiter
+    """
+    with _shared_lock:
+        if name not in _shared_rate_limiters:
+            _shared_rate_limiters[name] = RateLimiter(**kwargs)
+        return _shared_rate_limiters[name]
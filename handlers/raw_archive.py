@@ -0,0 +1,256 @@
+import os
+import gzip
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+from handlers.s3_handler import S3Handler
+from handlers.s3_uploader import BackgroundUploader
+from utils.utils import compute_md5_hash
+
+# S3 rejects multipart parts under 5 MiB, except the last one.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+class RawHashIndex:
+    def __init__(self, path: str):
+        """
+        Initializes the RawHashIndex, a local record of where each distinct raw payload,
+        by MD5 hash, is already stored in S3. Lets RawArchiveWriter skip payloads it has
+        stored before without a HEAD request per payload.
+
+        Locations added during a run are held back until save() is called, so payloads
+        of a run whose archive never completed are stored again next time. Losing the
+        file only costs storing payloads again.
+
+        :param path: Path to the JSON file holding the index.
+        """
+        self.path = path
+        self.locations: Dict[str, Dict[str, Any]] = {}
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.locations = json.load(file)
+        print(f"Loaded locations of {len(self.locations)} raw payloads from {path}")
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        :param digest: MD5 hash of a payload.
+        :return: {archive_key, offset, length} of the stored payload, or None if unknown.
+        """
+        with self.lock:
+            return self.pending.get(digest) or self.locations.get(digest)
+
+    def add(self, digest: str, location: Dict[str, Any]) -> None:
+        """
+        Stages a payload's location for the next save().
+
+        :param digest: MD5 hash of the payload.
+        :param location: {archive_key, offset, length} of the stored payload.
+        """
+        with self.lock:
+            self.pending[digest] = location
+
+    def save(self) -> None:
+        """
+        Commits locations staged during the run and writes the index to disk.
+        Call this only once the archives they point into are complete.
+        """
+        with self.lock:
+            self.locations.update(self.pending)
+            self.pending = {}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w') as file:
+                json.dump(self.locations, file)
+            os.replace(temp_path, self.path)
+        print(f"Saved locations of {len(self.locations)} raw payloads to {self.path}")
+
+class RawArchiveWriter:
+    def __init__(
+            self,
+            s3_handler: S3Handler,
+            archive_key: str,
+            part_size: int = 8 * 1024 * 1024,
+            compresslevel: int = 6,
+            uploader: Optional[BackgroundUploader] = None,
+            hash_index: Optional[RawHashIndex] = None
+        ):
+        """
+        Initializes a RawArchiveWriter, which bundles a run's raw responses into one
+        gzip-compressed NDJSON object in S3 instead of one object per response.
+
+        Each payload is appended unchanged, followed by a newline, as its own gzip member,
+        so the whole object decompresses as a single stream while any one payload can be
+        fetched with a ranged GET of its member. Compressed data is streamed to S3 as a
+        multipart upload whenever part_size bytes have built up.
+
+        Payloads are content-addressed by MD5 hash: one already stored, earlier in this
+        archive or (per hash_index) in an earlier run's, is not stored again; its entry
+        points at the existing copy. On close, the run's manifest, an index of
+        {name, timestamp, hash, archive_key, offset, length, size} per payload, is written
+        next to the archive as <archive_key>.index.json.
+
+        :param s3_handler: S3Handler for the archive's bucket.
+        :param archive_key: Key of the archive, e.g. .../raw/20240901121700.ndjson.gz.
+        :param part_size: Bytes of compressed data per uploaded part, at least 5 MiB.
+        :param compresslevel: gzip compression level, 1 (fastest) to 9 (smallest).
+        :param uploader: Uploads parts in the background if given, so add() never waits on S3
+            unless the uploader's queue is full. Otherwise parts are uploaded inline.
+        :param hash_index: Locations of payloads stored by earlier runs. New payloads are
+            staged in it; save it once the archive is closed.
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes, got {part_size}")
+        self.s3_handler = s3_handler
+        self.archive_key = archive_key
+        self.index_key = f"{archive_key}.index.json"
+        self.part_size = part_size
+        self.compresslevel = compresslevel
+        self.lock = threading.Lock()
+        self.entries: List[Dict[str, Any]] = []
+        self.buffer = bytearray()
+        self.offset = 0
+        self.uploader = uploader
+        self.hash_index = hash_index
+        self.locations: Dict[str, Dict[str, Any]] = {}
+        # (part number, upload_part response or Future of it)
+        self.parts: List[Tuple[int, Any]] = []
+        self.upload_id: Optional[str] = None
+        self.closed = False
+
+    def add(self, name: str, payload: bytes, timestamp: str) -> Dict[str, Any]:
+        """
+        Appends a payload to the archive, uploading a part if enough data has built up.
+        A payload stored before is only recorded in the manifest.
+
+        :param name: Name the payload is looked up by, e.g. the subcategory name.
+        :param payload: Raw response bytes, e.g. response.content.
+        :param timestamp: 14-character timestamp string of the response.
+        :return: The payload's index entry.
+        """
+        digest = compute_md5_hash(payload)
+        with self.lock:
+            if self.closed:
+                raise ValueError(f"RawArchiveWriter for {self.archive_key} is closed")
+            location = self.locations.get(digest)
+            if location is None and self.hash_index is not None:
+                location = self.hash_index.get(digest)
+            if location is None:
+                member = gzip.compress(payload + b'\n', compresslevel=self.compresslevel)
+                location = {'archive_key': self.archive_key, 'offset': self.offset, 'length': len(member)}
+                self.locations[digest] = location
+                if self.hash_index is not None:
+                    self.hash_index.add(digest, location)
+                self.buffer += member
+                self.offset += len(member)
+                if len(self.buffer) >= self.part_size:
+                    self._upload_part()
+            entry = {'name': name, 'timestamp': timestamp, 'hash': digest, **location, 'size': len(payload)}
+            self.entries.append(entry)
+        return entry
+
+    def _upload_part(self) -> None:
+        client = self.s3_handler.s3_client
+        if self.upload_id is None:
+            self.upload_id = client.create_multipart_upload(Bucket=self.s3_handler.bucket_name, Key=self.archive_key)['UploadId']
+        part_number = len(self.parts) + 1
+        part = {
+            'Bucket': self.s3_handler.bucket_name,
+            'Key': self.archive_key,
+            'UploadId': self.upload_id,
+            'PartNumber': part_number,
+            'Body': bytes(self.buffer)
+        }
+        if self.uploader is None:
+            self.parts.append((part_number, client.upload_part(**part)))
+        else:
+            self.parts.append((part_number, self.uploader.submit(self.archive_key, client.upload_part, size=len(part['Body']), **part)))
+        self.buffer = bytearray()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Uploads the last part, completes the upload and writes the manifest. Does nothing
+        if no payload was added, and writes only the manifest if every payload was stored
+        before. If completing fails the upload is aborted, so no orphaned parts are left
+        behind.
+
+        :return: The index entries.
+        """
+        with self.lock:
+            if self.closed:
+                return self.entries
+            self.closed = True
+            if not self.entries:
+                print(f"No payloads archived; {self.archive_key} not written.")
+                return self.entries
+            client = self.s3_handler.s3_client
+            if self.offset > 0:
+                try:
+                    if self.buffer:
+                        self._upload_part()
+                    parts = [
+                        {'PartNumber': part_number, 'ETag': (response.result() if isinstance(response, Future) else response)['ETag']}
+                        for part_number, response in self.parts
+                    ]
+                    client.complete_multipart_upload(
+                        Bucket=self.s3_handler.bucket_name,
+                        Key=self.archive_key,
+                        UploadId=self.upload_id,
+                        MultipartUpload={'Parts': parts}
+                    )
+                except Exception:
+                    client.abort_multipart_upload(Bucket=self.s3_handler.bucket_name, Key=self.archive_key, UploadId=self.upload_id)
+                    raise
+            index = {'archive_key': self.archive_key, 'entries': self.entries}
+            client.put_object(Bucket=self.s3_handler.bucket_name, Key=self.index_key, Body=json.dumps(index).encode('utf-8'))
+        stored = sum(1 for entry in self.entries if entry['archive_key'] == self.archive_key)
+        print(
+            f"Archived {len(self.entries)} payloads ({stored} stored, {len(self.entries) - stored} already stored; "
+            f"{self.offset} bytes compressed, {len(self.parts)} parts) to {self.archive_key}."
+        )
+        return self.entries
+
+    def __enter__(self) -> 'RawArchiveWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Keep whatever was fetched even if the run failed later on
+        self.close()
+
+class RawArchiveReader:
+    def __init__(self, s3_handler: S3Handler, archive_key: str):
+        """
+        Initializes a RawArchiveReader for an archive written by RawArchiveWriter.
+        The index is downloaded once; each payload is then a single ranged GET, from
+        whichever archive its entry points at.
+
+        :param s3_handler: S3Handler for the archive's bucket.
+        :param archive_key: Key of the archive.
+        """
+        self.s3_handler = s3_handler
+        self.archive_key = archive_key
+        index = json.loads(s3_handler.download_file(f"{archive_key}.index.json", raise_exception=True))
+        self.entries: List[Dict[str, Any]] = index['entries']
+        # A name archived more than once (e.g. refetched) resolves to its last payload
+        self.by_name = {entry['name']: entry for entry in self.entries}
+
+    def get(self, name: str) -> bytes:
+        """
+        Downloads one payload.
+
+        :param name: Name the payload was archived under.
+        :return: The original payload bytes.
+        :raises KeyError: If no payload was archived under name.
+        :raises ValueError: If the payload does not match its recorded hash.
+        """
+        entry = self.by_name[name]
+        # Indexes written before deduplication have no per-entry archive_key or hash
+        archive_key = entry.get('archive_key', self.archive_key)
+        member = self.s3_handler.download_range(archive_key, entry['offset'], entry['length'], raise_exception=True)
+        payload = gzip.decompress(member)[:-1]
+        if 'hash' in entry and compute_md5_hash(payload) != entry['hash']:
+            raise ValueError(f"Payload {name} from {archive_key} does not match hash {entry['hash']}")
+        return payload
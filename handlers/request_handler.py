@@ -1,7 +1,12 @@
 import requests
+from requests.structures import CaseInsensitiveDict
 import time
-import random
 from typing import Dict, Any, List, Optional
+from handlers.rate_limiter import RateLimiter
+from handlers.validator_store import ValidatorStore
+from handlers.cassette import Cassette
+from handlers.retry_policy import RetryPolicy
+from handlers.proxy_pool import ProxyPool
 
 class RequestHandler:
     def __init__(
@@ -11,56 +16,65 @@ class RequestHandler:
             retries_max: int, 
             timeout: int = 10, 
             proxies: Optional[List[str]] = None, 
-            max_requests_per_proxy: int = 10
+            max_requests_per_proxy: int = 10,
+            rate_limiter: Optional[RateLimiter] = None,
+            validator_store: Optional[ValidatorStore] = None,
+            cassette: Optional[Cassette] = None,
+            retry_policy: Optional[RetryPolicy] = None
         ):
         """
         Initializes the RequestHandler with optional proxy rotation.
         
         :param headers: A dictionary of headers to be used in HTTP requests.
-        :param sleep_secs_min: Minimum number of seconds to sleep between requests.
-        :param sleep_secs_max: Maximum number of seconds to sleep between requests.
+        :param sleep_secs_min: Minimum number of seconds between requests.
+        :param sleep_secs_max: Maximum number of seconds between requests.
         :param retries_max: Maximum number of retry attempts on a failed request.
-        :param proxies: Optional list of proxies for rotation.
+        :param proxies: Optional list of proxies for rotation through a health-scored ProxyPool.
         :param max_requests_per_proxy: Maximum number of requests before rotating proxies.
+        :param rate_limiter: Optional RateLimiter, e.g. one shared with other handlers via 
+        get_rate_limiter(). Defaults to a private limiter built from the sleep range.
+        :param validator_store: Optional ValidatorStore. When set, GET requests are sent
+        conditionally and responses carry an 'unchanged' attribute.
+        :param cassette: Optional Cassette. In 'record' mode every response is archived; in 
+        'replay' mode responses come from the archive with no network, sleeps or backoff.
+        :param retry_policy: Optional RetryPolicy, e.g. one with a per-run retry budget.
+        Defaults to a policy allowing retries_max attempts.
         """
         self.sleep_secs_min = sleep_secs_min
         self.sleep_secs_max = sleep_secs_max
         self.retries_max = retries_max
         self.timeout = timeout
-        self.request_count = 0
         self.session = requests.Session()
         self.proxies = proxies
         self.max_requests_per_proxy = max_requests_per_proxy
-        
-        if proxies:
-            self.current_proxy = random.choice(proxies)
-            self.session.proxies.update({"http": self.current_proxy, "https": self.current_proxy})
-        else:
-            self.current_proxy = None
+        self.rate_limiter = rate_limiter or RateLimiter.from_sleep_range(sleep_secs_min, sleep_secs_max)
+        self.validator_store = validator_store
+        self.cassette = cassette
+        self.retry_policy = retry_policy or RetryPolicy(retries_max)
+        self.proxy_pool = ProxyPool(proxies, max_requests_per_proxy) if proxies else None
+        self.current_proxy = None
 
-    def sleep(self):
+    def throttle(self, url: str) -> None:
         """
-        Sleeps for a random amount of time between sleep_secs_min and sleep_secs_max, inclusive.
+        Waits until the rate limiter allows a request to the URL's host through the current proxy.
+        Time spent since the previous request, including time on the network, counts toward the wait.
+
+        :param url: URL about to be requested.
         """
-        sleep_secs = random.randint(self.sleep_secs_min, self.sleep_secs_max)
-        print(f"Sleeping for {sleep_secs} seconds.")
-        time.sleep(sleep_secs)
+        self.rate_limiter.acquire(url, self.current_proxy)
 
-    def rotate_proxy(self) -> Dict[str, str]:
+    def rotate_proxy(self) -> Optional[str]:
         """
-        Rotates and selects a random proxy from the list for use in the next request.
+        Selects the proxy for the next attempt from the proxy pool, which keeps a healthy proxy
+        for max_requests_per_proxy requests and then picks one weighted by speed and health.
 
         Tip: 5-10 requests from the same proxy mimics human behavior. 
-        Note: switching proxies does not require a new requests.Session()
         
-        :return: A dictionary with the http proxy settings.
+        :return: The proxy URL, or None if there are no proxies or all have been ejected.
         """
-        if self.proxies and self.request_count >= self.max_requests_per_proxy:
-            self.current_proxy = random.choice(self.proxies)
-            self.session.proxies.update({"http": self.current_proxy, "https": self.current_proxy})
-            self.request_count = 0  # Reset the count
-        elif self.proxies:
-            self.request_count += 1
+        if self.proxy_pool is not None:
+            self.current_proxy = self.proxy_pool.choose()
+        return self.current_proxy
 
     def construct_url(self, url_template: str, **kwargs) -> str:
         """
@@ -72,50 +86,99 @@ class RequestHandler:
         """
         return url_template.format(**kwargs)
 
+    def replay(self, method: str, url: str) -> Optional[requests.Response]:
+        """
+        Rebuilds a recorded response from the cassette, applying the same error handling
+        as a live request.
+
+        :param method: HTTP method of the request.
+        :param url: URL of the request.
+        :return: Response object, or None if the recorded response was an error or is missing.
+        """
+        entry = self.cassette.replay(method, url)
+        if entry is None:
+            return None
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.url = url
+        print(f"Status code: {response.status_code} (replayed)")
+        if response.status_code >= 400:
+            print(f"HTTPError: {response.status_code} (replayed)")
+            return None
+        response.unchanged = response.status_code == 304
+        return response
+
     def request_with_retry(self, method: str, url: str, headers=None) -> requests.Response:
         """
-        Makes HTTP requests with retries, exponential backoff, and proxy rotation.
+        Makes HTTP requests with rate limiting, retries, and proxy rotation. The retry policy decides
+        which errors are retried and how long to wait, honouring Retry-After.
         
         :param method: HTTP method to use ('get' or 'post').
         :param url: URL to which the request is sent.
         :param kwargs: Additional arguments to pass to requests methods.
         :return: Response object from requests.
 
-        from session.requests doc: :param proxies: (optional) Dictionary mapping protocol or protocol and
-            hostname to the URL of the proxy.
+        Each proxy has its own pooled session, so no proxies argument is passed per request.
         """
 
         print(f"Method: {method.upper()}")
         print(f"URL: {url}")
         print(f"Headers: {headers}")
-        print(f"Proxies: {self.proxies}")
+
+        if self.cassette is not None and self.cassette.mode == 'replay':
+            return self.replay(method, url)
+
+        conditional = self.validator_store is not None and method.lower() == 'get'
+        if conditional:
+            headers = {**(headers or {}), **self.validator_store.conditional_headers(url)}
         
         # Attempt request
         attempt = 0
-        while attempt < self.retries_max:
+        while True:
+            self.retry_policy.record_attempt(url)
+            retry_after = None
+            proxy = self.rotate_proxy()
+            if self.proxy_pool is not None and proxy is None:
+                return None
+            print(f"Proxy: {proxy}")
+            session = self.proxy_pool.session(proxy) if proxy else self.session
             try:
-                response = self.session.request(
+                self.throttle(url)
+                start = time.monotonic()
+                response = session.request(
                     method=method.upper(), 
                     url=url, 
                     headers=headers,
-                    proxies=self.proxies
+                    timeout=self.timeout
                 )
+                if proxy:
+                    self.proxy_pool.record_response(proxy, response.status_code, time.monotonic() - start)
+                if self.cassette is not None:
+                    self.cassette.record(method, url, response)
                 print(f"Status code: {response.status_code}")
                 response.raise_for_status()
                 print("Success.")
-                self.sleep()
+                if conditional:
+                    response.unchanged = self.validator_store.is_unchanged(url, response)
                 return response
             except requests.HTTPError as e:
                 print(f"HTTPError:\n{e}")
-                return None
+                if not self.retry_policy.is_retryable_status(e.response.status_code):
+                    return None
+                retry_after = e.response.headers.get('Retry-After')
             except requests.RequestException as e:
                 print(f"Attempt {attempt + 1} failed: {e}")
-                sleep_secs = (2 ** attempt) * random.uniform(1, 2) # Exponential backoff with jitter
-                print(f"Retrying in {sleep_secs} seconds.")
-                time.sleep(sleep_secs)
-                attempt += 1
-        print(f"All retry attempts failed after {self.retries_max} attempts.")
-        return None
+                if proxy:
+                    self.proxy_pool.record_failure(proxy)
+            sleep_secs = self.retry_policy.next_delay(attempt, retry_after)
+            if sleep_secs is None:
+                print(f"Giving up on {url} after {attempt + 1} attempts.")
+                return None
+            print(f"Retrying in {sleep_secs} seconds.")
+            time.sleep(sleep_secs)
+            attempt += 1
 
     def get(self, url: str, headers=None) -> requests.Response:
         """
@@ -145,3 +208,11 @@ class RequestHandler:
             self.session.headers.update(headers)
 
         return self.request_with_retry('post', url, headers, json=payload)
+
+    def close(self) -> None:
+        """
+        Closes the session and the proxy pool's sessions, releasing their connections.
+        """
+        self.session.close()
+        if self.proxy_pool is not None:
+            self.proxy_pool.close()
@@ -0,0 +1,106 @@
+import random
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+# Status codes worth retrying: timeouts, throttling and transient server errors.
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+class RetryPolicy:
+    def __init__(self, retries_max: int, max_backoff_secs: float = 120, retry_budget_secs: Optional[float] = None):
+        """
+        Initializes the RetryPolicy, which decides whether and when a failed request is retried.
+
+        Connection errors and the status codes in RETRYABLE_STATUS_CODES are retried; any other
+        HTTP error is fatal. A Retry-After header sets the delay, otherwise the delay is
+        exponential backoff with jitter. All retries of a run draw on one time budget.
+
+        :param retries_max: Maximum number of attempts per request.
+        :param max_backoff_secs: Longest single delay. A Retry-After beyond this makes the failure final.
+        :param retry_budget_secs: Total seconds the run may spend waiting to retry. None means unlimited.
+        """
+        self.retries_max = retries_max
+        self.max_backoff_secs = max_backoff_secs
+        self.retry_budget_secs = retry_budget_secs
+        self.retry_secs_spent = 0.0
+        self.attempts: Dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def is_retryable_status(status_code: int) -> bool:
+        """
+        :param status_code: HTTP status code of a failed response.
+        :return: True if the error is transient and worth retrying.
+        """
+        return status_code in RETRYABLE_STATUS_CODES
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Parses a Retry-After header given either as seconds or as an HTTP date.
+
+        :param value: Header value, or None.
+        :return: Seconds to wait, or None if the header is missing or malformed.
+        """
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def record_attempt(self, url: str) -> None:
+        """
+        Counts an attempt against the URL for the end-of-run report.
+
+        :param url: URL being requested.
+        """
+        with self.lock:
+            self.attempts[url] += 1
+
+    def next_delay(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """
+        Returns how long to wait before the next attempt, or None if the request should
+        not be retried. The delay is charged to the run's retry budget.
+
+        :param attempt: Zero-based number of the attempt that just failed.
+        :param retry_after: Retry-After header of the failed response, if any.
+        :return: Seconds to wait, or None to give up.
+        """
+        if attempt + 1 >= self.retries_max:
+            return None
+        retry_after_secs = self.parse_retry_after(retry_after)
+        if retry_after_secs is not None:
+            if retry_after_secs > self.max_backoff_secs:
+                print(f"Retry-After of {retry_after_secs:.0f} seconds exceeds the {self.max_backoff_secs} second cap.")
+                return None
+            delay = retry_after_secs
+        else:
+            delay = min(self.max_backoff_secs, (2 ** attempt) * random.uniform(1, 2)) # Exponential backoff with jitter
+        with self.lock:
+            if self.retry_budget_secs is not None and self.retry_secs_spent + delay > self.retry_budget_secs:
+                print(f"Retry budget of {self.retry_budget_secs} seconds exhausted.")
+                return None
+            self.retry_secs_spent += delay
+        return delay
+
+    def report(self) -> Dict[str, int]:
+        """
+        Prints and returns the attempt count of every URL that needed more than one attempt.
+
+        :return: Dictionary of URL to attempt count.
+        """
+        retried = {url: count for url, count in self.attempts.items() if count > 1}
+        print(f"{len(self.attempts)} URLs requested, {len(retried)} retried, {self.retry_secs_spent:.1f} seconds spent waiting to retry.")
+        for url, count in retried.items():
+            print(f"{count} attempts: {url}")
+        return retried
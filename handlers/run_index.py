@@ -0,0 +1,218 @@
+import os
+import json
+import threading
+from urllib.parse import quote
+from botocore.exceptions import ClientError
+from typing import Any, Dict, List, Optional, Tuple
+from handlers.s3_handler import S3Handler
+
+# Runs are sharded by day: <prefix>/_runs/<YYYYMMDD>.json
+RUN_SHARD_DIR = '_runs'
+RUN_SHARD_LENGTH = 8 # Leading characters of the 14-character timestamp
+# Newest run plus the list of shards: <prefix>/_latest.json
+LATEST_NAME = '_latest.json'
+
+class RunIndex:
+    def __init__(self, s3_handler: S3Handler, prefix: str, cache_dir: str = 'data/s3_index_cache'):
+        """
+        Initializes a RunIndex, which lists every run written under prefix: its run ID,
+        timestamp and objects, each with at least a key, size and hash. Lookups read a
+        few small JSON objects instead of listing every key under the prefix.
+
+        Runs are stored in one shard per day, <prefix>/_runs/<YYYYMMDD>.json, so a run
+        rewrites only its day's shard. <prefix>/_latest.json holds the newest run and the
+        list of shards. latest() reads just that pointer, and the shards further back only
+        if the newest run has no matching object. between() reads only the shards in its
+        range. The amount read therefore depends on the range asked for, not on how long
+        the index has existed.
+
+        Local copies are cached in cache_dir along with their ETags, and only downloaded
+        again if the ETag in S3 has changed (a conditional GET). Past days' shards rarely
+        change, so they are mostly served from the cache.
+
+        The pointer and shards are rewritten whole with plain PUTs: the pinned boto3 has no
+        conditional (If-Match) writes. Two writers on one prefix can therefore lose each
+        other's runs, and nothing enforces a single writer. Keep to one ETL flow per prefix.
+
+        :param s3_handler: S3Handler for the prefix's bucket.
+        :param prefix: Prefix of the indexed objects, e.g. .../draftkings/raw.
+        :param cache_dir: Directory of the local cached copies.
+        """
+        self.s3_handler = s3_handler
+        self.prefix = prefix
+        self.latest_key = f"{prefix}/{LATEST_NAME}"
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        # key -> {'etag', 'body'}
+        self.cache: Dict[str, Dict[str, Any]] = {}
+
+    def _shard_key(self, shard: str) -> str:
+        return f"{self.prefix}/{RUN_SHARD_DIR}/{shard}.json"
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{quote(key, safe='')}.json")
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Reads an index object, from the local cache unless it has changed in S3.
+        Returns None if it does not exist.
+        """
+        cached = self.cache.get(key)
+        if cached is None and os.path.exists(self._cache_path(key)):
+            with open(self._cache_path(key), 'r') as file:
+                cached = json.load(file)
+            self.cache[key] = cached
+        kwargs = {'Bucket': self.s3_handler.bucket_name, 'Key': key}
+        if cached is not None:
+            kwargs['IfNoneMatch'] = cached['etag']
+        try:
+            response = self.s3_handler.s3_client.get_object(**kwargs)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code in ('304', 'NotModified'):
+                return cached['body'] # Cached copy is current
+            if code in ('404', 'NoSuchKey'):
+                return None
+            raise
+        body = json.loads(response['Body'].read())
+        self._save_cache(key, response['ETag'], body)
+        return body
+
+    def _put(self, key: str, body: Dict[str, Any]) -> None:
+        response = self.s3_handler.s3_client.put_object(
+            Bucket=self.s3_handler.bucket_name,
+            Key=key,
+            Body=json.dumps(body).encode('utf-8'),
+            ContentType='application/json'
+        )
+        self._save_cache(key, response['ETag'], body)
+
+    def _save_cache(self, key: str, etag: str, body: Dict[str, Any]) -> None:
+        self.cache[key] = {'etag': etag, 'body': body}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(key)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(self.cache[key], file)
+        os.replace(temp_path, path)
+
+    def _latest(self) -> Dict[str, Any]:
+        return self._get(self.latest_key) or {'run': None, 'shards': []}
+
+    def _shard_runs(self, shard: str) -> List[Dict[str, Any]]:
+        body = self._get(self._shard_key(shard))
+        return body['runs'] if body else []
+
+    def record_run(self, run_id: Any, timestamp: str, objects: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Adds a run to its day's shard, replacing any earlier record of the same run ID and
+        timestamp, and updates the latest-run pointer. Call it once the run's objects are
+        in S3.
+
+        The pointer is written first, so the run's shard is listed before it exists. If
+        the shard write never happens, e.g. the writer crashes, the newest run is still
+        served from the pointer, and the next record_run adds it to its shard.
+
+        :param run_id: ID of the run, e.g. the ingest run ID. May be None.
+        :param timestamp: 14-character timestamp string of the run.
+        :param objects: The run's objects, each with 'key', 'size' and 'hash', plus any
+            attributes to look them up by, e.g. 'subcategory'.
+        :return: The recorded run.
+        """
+        run = {'run_id': run_id, 'timestamp': timestamp, 'objects': objects}
+        shard = timestamp[:RUN_SHARD_LENGTH]
+        with self.lock:
+            latest = self._latest()
+            previous = latest['run']
+            newest = run if previous is None or timestamp >= previous['timestamp'] else previous
+            shards = sorted(set(latest['shards']) | {shard})
+            self._put(self.latest_key, {'prefix': self.prefix, 'run': newest, 'shards': shards})
+
+            self._add_to_shard(run, replace=True)
+            if previous is not None and self._key(previous) != self._key(run):
+                self._add_to_shard(previous, replace=False)
+        print(f"Recorded run {run_id} ({len(objects)} objects) in {self._shard_key(shard)}.")
+        return run
+
+    @staticmethod
+    def _key(run: Dict[str, Any]) -> Tuple[Any, str]:
+        return run['run_id'], run['timestamp']
+
+    def _add_to_shard(self, run: Dict[str, Any], replace: bool) -> None:
+        """
+        Writes a run to its day's shard. Without replace, the shard is only written if the
+        run is missing from it, e.g. because an earlier writer crashed after the pointer.
+        """
+        shard = run['timestamp'][:RUN_SHARD_LENGTH]
+        runs = self._shard_runs(shard)
+        if not replace and any(self._key(existing) == self._key(run) for existing in runs):
+            return
+        runs = [existing for existing in runs if self._key(existing) != self._key(run)] + [run]
+        runs.sort(key=lambda existing: existing['timestamp'])
+        self._put(self._shard_key(shard), {'prefix': self.prefix, 'shard': shard, 'runs': runs})
+
+    @staticmethod
+    def _matching(run: Dict[str, Any], attributes: Dict[str, Any]) -> Dict[str, Any]:
+        objects = [obj for obj in run['objects'] if all(obj.get(name) == value for name, value in attributes.items())]
+        return {**run, 'objects': objects}
+
+    def shards(self) -> List[str]:
+        """
+        :return: Days (YYYYMMDD) that have runs, oldest first.
+        """
+        with self.lock:
+            return self._latest()['shards']
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None, **attributes) -> List[Dict[str, Any]]:
+        """
+        Finds the runs in a time range, keeping only objects that match attributes.
+        Only the shards of days in the range are read.
+
+        :param start: Earliest 14-character timestamp string, inclusive. None for no limit.
+        :param end: Latest 14-character timestamp string, inclusive. None for no limit.
+        :param attributes: Object attributes to match, e.g. subcategory='Receptions'.
+            Runs with no matching object are left out.
+        :return: Matching runs, oldest first.
+        """
+        runs = []
+        with self.lock:
+            latest = self._latest()
+            for shard in latest['shards']:
+                if (start is not None and shard < start[:RUN_SHARD_LENGTH]) or (end is not None and shard > end[:RUN_SHARD_LENGTH]):
+                    continue
+                runs.extend(self._shard_runs(shard))
+            # The newest run may not have reached its shard yet
+            newest = latest['run']
+            if newest is not None and all(self._key(run) != self._key(newest) for run in runs):
+                runs.append(newest)
+        matching = []
+        for run in sorted(runs, key=lambda run: run['timestamp']):
+            if (start is not None and run['timestamp'] < start) or (end is not None and run['timestamp'] > end):
+                continue
+            run = self._matching(run, attributes)
+            if run['objects'] or not attributes:
+                matching.append(run)
+        return matching
+
+    def latest(self, **attributes) -> Optional[Dict[str, Any]]:
+        """
+        Finds the newest run, keeping only objects that match attributes. Reads only the
+        latest-run pointer unless the newest run has no matching object, in which case
+        shards are read newest first until one does.
+
+        :param attributes: Object attributes to match, e.g. subcategory='Receptions'.
+        :return: The newest run with a matching object, or None.
+        """
+        with self.lock:
+            latest = self._latest()
+            if latest['run'] is None:
+                return None
+            run = self._matching(latest['run'], attributes)
+            if run['objects'] or not attributes:
+                return run
+            for shard in reversed(latest['shards']):
+                for run in reversed(self._shard_runs(shard)):
+                    run = self._matching(run, attributes)
+                    if run['objects']:
+                        return run
+        return None
@@ -1,8 +1,24 @@
+import io
+import os
+import json
+import time
+import base64
+import hashlib
 import boto3
+import threading
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
 from utils.utils import generate_timestamp, compute_md5_hash
 
+if TYPE_CHECKING:
+    from handlers.run_index import RunIndex
+    from handlers.s3_uploader import BackgroundUploader
+
 class S3Handler:
     def __init__(self, bucket_name: str, aws_access_key_id: Optional[str] = None, aws_secret_access_key: Optional[str] = None, region_name: Optional[str] = None):
         """
@@ -81,6 +97,259 @@ class S3Handler:
                 raise
             return None
 
+    def upload_file_parallel(self, file_name: str, object_name: str, part_size: int = 16 * 1024 * 1024, max_workers: int = 8) -> Dict[str, float]:
+        """
+        Uploads a local file as a multipart upload with max_workers parts in flight. Each
+        part is read straight from disk and sent with its Content-MD5, so S3 rejects any
+        part corrupted on the way; memory use is bounded by max_workers * part_size
+        regardless of the file size. The part layout and MD5s are written to
+        <object_name>.manifest.json for download_file_parallel to verify against.
+
+        :param file_name: Path to the local file.
+        :param object_name: The S3 key to upload to.
+        :param part_size: Bytes per part, at least 5 MiB unless the file is smaller.
+        :param max_workers: Number of parts uploaded at once.
+        :return: Dictionary with 'bytes', 'parts', 'seconds' and 'mb_per_sec'.
+        """
+        started = time.perf_counter()
+        size = os.path.getsize(file_name)
+        offsets = list(range(0, size, part_size)) or [0]
+        upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket_name, Key=object_name)['UploadId']
+        fd = os.open(file_name, os.O_RDONLY)
+
+        def upload_part(part_number: int, offset: int) -> Dict[str, Any]:
+            body = os.pread(fd, min(part_size, size - offset), offset)
+            digest = hashlib.md5(body).digest()
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket_name, Key=object_name, UploadId=upload_id, PartNumber=part_number,
+                Body=body, ContentMD5=base64.b64encode(digest).decode('ascii')
+            )
+            return {'part_number': part_number, 'offset': offset, 'length': len(body), 'md5': digest.hex(), 'etag': response['ETag']}
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                parts = list(executor.map(upload_part, range(1, len(offsets) + 1), offsets))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': part['part_number'], 'ETag': part['etag']} for part in parts]}
+            )
+        except Exception:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=object_name, UploadId=upload_id)
+            raise
+        finally:
+            os.close(fd)
+        manifest = {'object_name': object_name, 'size': size, 'part_size': part_size, 'parts': parts}
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=f"{object_name}.manifest.json", Body=json.dumps(manifest).encode('utf-8'))
+        return self._transfer_stats(f"Uploaded {file_name} to {object_name}", size, len(parts), started)
+
+    def download_file_parallel(self, object_name: str, file_name: str, part_size: int = 16 * 1024 * 1024, max_workers: int = 8) -> Dict[str, float]:
+        """
+        Downloads an object to a local file with max_workers ranged GETs in flight, each
+        streamed to its place in the file in 1 MiB chunks, so memory use stays constant.
+        If the object has a manifest from upload_file_parallel, its part layout is used
+        and every part's MD5 is checked; otherwise only the size is. The data goes to a
+        temporary file that replaces file_name only once everything has been verified.
+
+        :param object_name: The S3 key to download.
+        :param file_name: Path to write the file to.
+        :param part_size: Bytes per ranged GET when the object has no manifest.
+        :param max_workers: Number of ranges downloaded at once.
+        :return: Dictionary with 'bytes', 'parts', 'seconds' and 'mb_per_sec'.
+        :raises ValueError: If a part's MD5 or the total size does not match.
+        """
+        started = time.perf_counter()
+        try:
+            manifest_body = self.s3_client.get_object(Bucket=self.bucket_name, Key=f"{object_name}.manifest.json")['Body'].read()
+            manifest = json.loads(manifest_body)
+            size, parts = manifest['size'], manifest['parts']
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+            size = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_name)['ContentLength']
+            parts = [{'offset': offset, 'length': min(part_size, size - offset), 'md5': None} for offset in range(0, size, part_size)]
+
+        parts = [part for part in parts if part['length']]
+        temp_file_name = f"{file_name}.part"
+        with open(temp_file_name, 'wb') as file:
+            file.truncate(size)
+        fd = os.open(temp_file_name, os.O_WRONLY)
+
+        def download_part(part: Dict[str, Any]) -> None:
+            offset, length = part['offset'], part['length']
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_name, Range=f"bytes={offset}-{offset + length - 1}")
+            digest = hashlib.md5()
+            position = offset
+            for chunk in response['Body'].iter_chunks(chunk_size=1024 * 1024):
+                digest.update(chunk)
+                os.pwrite(fd, chunk, position)
+                position += len(chunk)
+            if position - offset != length:
+                raise ValueError(f"Range {offset}-{offset + length - 1} of {object_name} returned {position - offset} bytes")
+            if part['md5'] is not None and digest.hexdigest() != part['md5']:
+                raise ValueError(f"MD5 mismatch in range {offset}-{offset + length - 1} of {object_name}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(download_part, parts))
+            os.fsync(fd)
+        except Exception:
+            os.close(fd)
+            os.remove(temp_file_name)
+            raise
+        os.close(fd)
+        os.replace(temp_file_name, file_name)
+        return self._transfer_stats(f"Downloaded {object_name} to {file_name}", size, len(parts), started)
+
+    def upload_file_incremental(
+            self,
+            file_name: str,
+            base_key: str,
+            backup_name: str,
+            chunk_size: int = 4 * 1024 * 1024,
+            max_workers: int = 8,
+            first_chunk_size: int = 0
+        ) -> Dict[str, float]:
+        """
+        Backs a local file up to a content-addressed chunk store. The file is split into
+        fixed-size chunks, each stored once under base_key/chunks/<sha256>, and only chunks
+        not already in the store are uploaded. base_key/manifests/<backup_name>.json lists
+        the file's chunk hashes in order, which is all download_file_incremental needs.
+
+        Fixed chunks suit files updated in place in fixed-size blocks, like a DuckDB
+        database, as long as the chunks line up with the blocks. DuckDB's 256 KiB blocks
+        start after a 12 KiB header, so pass first_chunk_size=12288 to store the header as
+        a chunk of its own; a chunk then changes only if a block in it did.
+
+        The chunks already stored are taken from the latest backup's manifest, copied to
+        base_key/latest.json, so nothing is listed and the cost does not grow with the
+        number of backups. Only a store without that copy is listed, once.
+
+        :param file_name: Path to the local file.
+        :param base_key: Prefix of the chunk store.
+        :param backup_name: Name of this backup, e.g. a timestamp.
+        :param chunk_size: Bytes per chunk; keep it a multiple of the file's block size.
+        :param max_workers: Number of chunks hashed and uploaded at once.
+        :param first_chunk_size: Bytes in the first chunk, e.g. a header before the first block. 0 for chunk_size.
+        :return: Dictionary with 'bytes', 'parts' (chunks), 'uploaded_chunks', 'uploaded_bytes', 'seconds' and 'mb_per_sec'.
+        """
+        started = time.perf_counter()
+        size = os.path.getsize(file_name)
+        latest_key = f"{base_key}/latest.json"
+        try:
+            latest = json.loads(self.s3_client.get_object(Bucket=self.bucket_name, Key=latest_key)['Body'].read())
+            existing = set(latest['chunks'])
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey'):
+                raise
+            existing = set()
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{base_key}/chunks/"):
+                existing.update(item['Key'].rsplit('/', 1)[-1] for item in page.get('Contents', []))
+        fd = os.open(file_name, os.O_RDONLY)
+        lock = threading.Lock()
+        uploaded = {'chunks': 0, 'bytes': 0}
+
+        def store_chunk(chunk_range: Tuple[int, int]) -> str:
+            chunk = os.pread(fd, chunk_range[1], chunk_range[0])
+            digest = hashlib.sha256(chunk).hexdigest()
+            with lock:
+                # Identical chunks (e.g. free blocks) are uploaded once
+                new = digest not in existing
+                existing.add(digest)
+            if new:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name, Key=f"{base_key}/chunks/{digest}", Body=chunk,
+                    ContentMD5=base64.b64encode(hashlib.md5(chunk).digest()).decode('ascii')
+                )
+                with lock:
+                    uploaded['chunks'] += 1
+                    uploaded['bytes'] += len(chunk)
+            return digest
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                chunks = list(executor.map(store_chunk, _chunk_ranges(size, chunk_size, first_chunk_size)))
+        finally:
+            os.close(fd)
+        manifest = {
+            'file_name': os.path.basename(file_name), 'size': size, 'chunk_size': chunk_size,
+            'first_chunk_size': first_chunk_size, 'chunks': chunks
+        }
+        body = json.dumps(manifest).encode('utf-8')
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=f"{base_key}/manifests/{backup_name}.json", Body=body)
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=latest_key, Body=body)
+        stats = self._transfer_stats(f"Backed up {file_name} as {backup_name}", size, len(chunks), started)
+        stats.update({'uploaded_chunks': uploaded['chunks'], 'uploaded_bytes': uploaded['bytes']})
+        print(f"{uploaded['chunks']} of {len(chunks)} chunks ({uploaded['bytes']} bytes) were new.")
+        return stats
+
+    def download_file_incremental(self, base_key: str, backup_name: str, file_name: str, max_workers: int = 8) -> Dict[str, float]:
+        """
+        Restores a backup written by upload_file_incremental. Chunks are downloaded in
+        parallel into a temporary file, each verified against its hash, and the file
+        replaces file_name only once every chunk checks out.
+
+        :param base_key: Prefix of the chunk store.
+        :param backup_name: Name of the backup to restore.
+        :param file_name: Path to write the file to.
+        :param max_workers: Number of chunks downloaded at once.
+        :return: Dictionary with 'bytes', 'parts' (chunks), 'seconds' and 'mb_per_sec'.
+        :raises ValueError: If a chunk does not match its hash.
+        """
+        started = time.perf_counter()
+        manifest_body = self.s3_client.get_object(Bucket=self.bucket_name, Key=f"{base_key}/manifests/{backup_name}.json")['Body'].read()
+        manifest = json.loads(manifest_body)
+        size = manifest['size']
+        chunk_ranges = _chunk_ranges(size, manifest['chunk_size'], manifest.get('first_chunk_size', 0))
+        temp_file_name = f"{file_name}.part"
+        with open(temp_file_name, 'wb') as file:
+            file.truncate(size)
+        fd = os.open(temp_file_name, os.O_WRONLY)
+
+        def restore_chunk(chunk_range: Tuple[int, int], digest: str) -> None:
+            chunk = self.s3_client.get_object(Bucket=self.bucket_name, Key=f"{base_key}/chunks/{digest}")['Body'].read()
+            if hashlib.sha256(chunk).hexdigest() != digest:
+                raise ValueError(f"Chunk {digest} of {backup_name} does not match its hash")
+            os.pwrite(fd, chunk, chunk_range[0])
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(restore_chunk, chunk_ranges, manifest['chunks']))
+            os.fsync(fd)
+        except Exception:
+            os.close(fd)
+            os.remove(temp_file_name)
+            raise
+        os.close(fd)
+        os.replace(temp_file_name, file_name)
+        return self._transfer_stats(f"Restored {backup_name} to {file_name}", size, len(manifest['chunks']), started)
+
+    @staticmethod
+    def _transfer_stats(description: str, size: int, parts: int, started: float) -> Dict[str, float]:
+        seconds = time.perf_counter() - started
+        stats = {'bytes': size, 'parts': parts, 'seconds': seconds, 'mb_per_sec': size / 1024 / 1024 / seconds if seconds else 0.0}
+        print(f"{description}: {size} bytes in {parts} parts, {seconds:.2f} seconds ({stats['mb_per_sec']:.1f} MB/s).")
+        return stats
+
+    def download_range(self, object_name: str, offset: int, length: int, raise_exception: bool = False) -> Optional[bytes]:
+        """
+        Downloads a byte range of a file from S3 with a ranged GET.
+
+        :param object_name: The S3 path of the file.
+        :param offset: First byte to download.
+        :param length: Number of bytes to download.
+        :param raise_exception: If True, raises any exception that occurs, otherwise prints the error.
+        :return: The bytes, or None if an error occurs.
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_name, Range=f"bytes={offset}-{offset + length - 1}")
+            return response['Body'].read()
+        except (NoCredentialsError, PartialCredentialsError, ClientError) as e:
+            print(f"Failed to download bytes {offset}-{offset + length - 1} of {object_name}: {e}")
+            if raise_exception:
+                raise
+            return None
+
     def download_etag(self, object_name: str, raise_exception: bool = False) -> Optional[str]:
         """
         Downloads a file's ETag from S3 to check the integrity and version of the file.
@@ -107,7 +376,7 @@ class S3Handler:
         :param object_name: The S3 path of the file to compare.
         :param obj: The object data in bytes.
         :param raise_exception: If True, raises any exception that occurs, otherwise prints the error.
-        :return: True if the file has changed (ETag does not match MD5 hash), False otherwise.
+        :return: True if the file has changed (ETag does not match MD5 hash) or is not in S3, False otherwise.
         """
         try:
             etag = self.download_etag(object_name, raise_exception=raise_exception)
@@ -115,9 +384,341 @@ class S3Handler:
                 md5_hash = compute_md5_hash(obj)
                 etag_cleaned = etag.strip('"')  # Remove quotes from etag
                 return etag_cleaned != md5_hash
-            return False
+            # Nothing stored under object_name yet, so it needs writing
+            return True
         except Exception as e:
             print(f"Error in comparing file hash: {e}")
             if raise_exception:
                 raise
             return False
+
+    def background_uploader(self, max_workers: int = 8, max_pending_bytes: int = 256 * 1024 * 1024) -> 'BackgroundUploader':
+        """
+        Creates a BackgroundUploader that uploads to this bucket on a thread pool.
+
+        :param max_workers: Number of uploads in flight at once.
+        :param max_pending_bytes: Bytes of queued and in-flight uploads before submitting blocks.
+        :return: BackgroundUploader; flush() it before relying on the uploads.
+        """
+        from handlers.s3_uploader import BackgroundUploader # imports this module
+        return BackgroundUploader(self, max_workers=max_workers, max_pending_bytes=max_pending_bytes)
+
+    def run_index(self, prefix: str, cache_dir: str = 'data/s3_index_cache') -> 'RunIndex':
+        """
+        Creates a RunIndex for a prefix of this bucket, for finding runs and their objects
+        with one GET instead of listing the prefix.
+
+        :param prefix: Prefix of the indexed objects.
+        :param cache_dir: Directory of the index's local cached copy.
+        :return: RunIndex
+        """
+        from handlers.run_index import RunIndex # imports this module
+        return RunIndex(self, prefix, cache_dir=cache_dir)
+
+    def write_parquet_dataset(
+            self,
+            table: pa.Table,
+            base_key: str,
+            partition_cols: List[str],
+            timestamp: str,
+            object_name: str = 'part',
+            compression: str = 'zstd',
+            uploader: Optional['BackgroundUploader'] = None,
+            manifest: Optional[List[Dict[str, Any]]] = None
+        ) -> List[str]:
+        """
+        Writes an Arrow table to S3 as a Hive-partitioned Parquet dataset: one object per
+        distinct combination of partition_cols, under keys like
+        base_key/sport=nfl/date=2024-09-01/<object_name>_<timestamp>.parquet. The partition
+        columns are encoded in the key rather than stored in the files.
+
+        :param table: The data to write.
+        :param base_key: Prefix of the dataset.
+        :param partition_cols: Columns to partition by, outermost first.
+        :param timestamp: 14-character timestamp string, keeping each write's objects unique.
+        :param object_name: File name prefix within each partition.
+        :param compression: Parquet compression codec.
+        :param uploader: BackgroundUploader to queue the objects on instead of uploading them
+            inline; flush it to wait for them.
+        :param manifest: If given, {key, size, hash} and the partition values of each object
+            are appended to it, e.g. for RunIndex.record_run().
+        :return: Keys of the objects written or queued.
+        """
+        if table.num_rows == 0:
+            print(f"No rows to write to {base_key}.")
+            return []
+        partitions = table.select(partition_cols).group_by(partition_cols).aggregate([]).to_pylist()
+        keys = []
+        for partition in partitions:
+            mask = None
+            for col, value in partition.items():
+                matches = pc.is_null(table[col]) if value is None else pc.equal(table[col], value)
+                mask = matches if mask is None else pc.and_(mask, matches)
+            buffer = io.BytesIO()
+            pq.write_table(table.filter(mask).drop_columns(partition_cols), buffer, compression=compression)
+            partition_path = '/'.join([f"{col}={quote(str(value), safe='')}" for col, value in partition.items()])
+            key = f"{base_key}/{partition_path}/{object_name}_{timestamp}.parquet"
+            if uploader is not None:
+                uploader.put_object(key, buffer.getvalue())
+            else:
+                self.upload_object(
+                    obj=buffer.getvalue(),
+                    object_name=object_name,
+                    base_key=f"{base_key}/{partition_path}",
+                    file_extension='parquet',
+                    timestamp=timestamp,
+                    raise_exception=True
+                )
+            keys.append(key)
+            if manifest is not None:
+                body = buffer.getvalue()
+                manifest.append({'key': key, 'size': len(body), 'hash': compute_md5_hash(body), **{col: str(value) for col, value in partition.items()}})
+        print(f"Wrote {table.num_rows} rows to {len(keys)} partitions under {base_key}.")
+        return keys
+
+    def _partition_prefixes(self, base_key: str, allowed: Dict[str, set], partition_cols: Optional[List[str]]) -> Tuple[List[str], Dict[str, set]]:
+        """
+        Narrows the listing of a dataset to the partitions allowed by its leading filtered
+        partition columns, e.g. base_key/sport=nfl/date=2024-09-01/. With partition_cols
+        the prefixes are built directly; without them each level's column is found with one
+        delimited LIST per prefix. Stops at the first unfiltered level.
+
+        :return: The prefixes to list, and the filters not yet applied by them.
+        """
+        prefixes = [f"{base_key}/"]
+        remaining = dict(allowed)
+        level = 0
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        while remaining and prefixes:
+            if partition_cols is not None:
+                if level >= len(partition_cols) or partition_cols[level] not in remaining:
+                    break
+                col = partition_cols[level]
+                values = remaining.pop(col)
+                prefixes = [f"{prefix}{col}={quote(value, safe='')}/" for prefix in prefixes for value in sorted(values)]
+            else:
+                children = {}
+                for prefix in prefixes:
+                    for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+                        for common_prefix in page.get('CommonPrefixes', []):
+                            segment = common_prefix['Prefix'][len(prefix):-1]
+                            if '=' in segment:
+                                col, value = segment.split('=', 1)
+                                children.setdefault(col, []).append((common_prefix['Prefix'], unquote(value)))
+                # Every partition at one level has the same column
+                if len(children) != 1 or next(iter(children)) not in remaining:
+                    break
+                col, found = next(iter(children.items()))
+                values = remaining.pop(col)
+                prefixes = [child for child, value in found if value in values]
+            level += 1
+        return prefixes, remaining
+
+    def _list_parquet_objects(
+            self,
+            base_key: str,
+            partition_filters: Optional[Dict[str, Iterable]] = None,
+            partition_cols: Optional[List[str]] = None
+        ) -> List[Tuple[str, Dict[str, str], int]]:
+        allowed = {col: {str(value) for value in values} for col, values in (partition_filters or {}).items()}
+        prefixes, remaining = self._partition_prefixes(base_key, allowed, partition_cols)
+        objects = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for prefix in prefixes:
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for item in page.get('Contents', []):
+                    key = item['Key']
+                    if not key.endswith('.parquet'):
+                        continue
+                    segments = key[len(base_key) + 1:].split('/')[:-1]
+                    partition = dict(segment.split('=', 1) for segment in segments if '=' in segment)
+                    partition = {col: unquote(value) for col, value in partition.items()}
+                    if all(partition.get(col) in values for col, values in remaining.items()):
+                        objects.append((key, partition, item['Size']))
+        return objects
+
+    def list_parquet_dataset(
+            self,
+            base_key: str,
+            partition_filters: Optional[Dict[str, Iterable]] = None,
+            partition_cols: Optional[List[str]] = None
+        ) -> List[Tuple[str, Dict[str, str]]]:
+        """
+        Lists the Parquet objects of a Hive-partitioned dataset, skipping partitions that
+        partition_filters rule out. Filters on the leading partition columns narrow the
+        listing prefix itself, so e.g. {'sport': ['nfl'], 'date': [...]} lists only those
+        dates' partitions rather than the whole dataset.
+
+        :param base_key: Prefix of the dataset.
+        :param partition_filters: Allowed values per partition column, e.g. {'date': ['2024-09-01']}.
+        :param partition_cols: Partition columns, outermost first, as written. Saves finding
+            each filtered level with a LIST.
+        :return: List of (key, {partition column: value}) tuples.
+        """
+        return [(key, partition) for key, partition, _ in self._list_parquet_objects(base_key, partition_filters, partition_cols)]
+
+    def read_parquet_dataset(
+            self,
+            base_key: str,
+            partition_filters: Optional[Dict[str, Iterable]] = None,
+            columns: Optional[List[str]] = None,
+            filters: Optional[List[Tuple]] = None,
+            max_workers: int = 16,
+            partition_cols: Optional[List[str]] = None
+        ) -> Optional[pa.Table]:
+        """
+        Reads a Hive-partitioned Parquet dataset written by write_parquet_dataset.
+
+        Partitions ruled out by partition_filters are never listed or downloaded. Objects
+        are read with ranged GETs rather than downloaded whole: the footer first, then only
+        the column chunks of columns (and of the filtered columns) in row groups whose
+        statistics filters do not rule out. filters (pyarrow's [(column, op, value), ...]
+        form) are then applied exactly. Objects are read in parallel.
+
+        :param base_key: Prefix of the dataset.
+        :param partition_filters: Allowed values per partition column, e.g. {'date': ['2024-09-01']}.
+        :param columns: Data columns to read. None reads all of them.
+        :param filters: Row filters on data columns, e.g. [('outcome_label', '=', 'Over')].
+        :param max_workers: Number of objects read at once.
+        :param partition_cols: Partition columns, outermost first, as written.
+        :return: Table with the data columns plus partition columns (as strings), or None if nothing matches.
+        """
+        objects = self._list_parquet_objects(base_key, partition_filters, partition_cols)
+        if not objects:
+            print(f"No objects under {base_key} match {partition_filters}.")
+            return None
+        fetched = []
+
+        def read(key: str, partition: Dict[str, str], size: int) -> pa.Table:
+            source = S3RangeFile(self, key, size)
+            parquet_file = pq.ParquetFile(source)
+            row_groups = [
+                i for i in range(parquet_file.metadata.num_row_groups)
+                if _row_group_may_match(parquet_file.metadata.row_group(i), filters)
+            ]
+            read_columns = None
+            if columns is not None:
+                filter_columns = [f[0] for f in filters or [] if isinstance(f, tuple)]
+                read_columns = [col for col in dict.fromkeys(columns + filter_columns) if col in parquet_file.schema_arrow.names]
+            table = parquet_file.read_row_groups(row_groups, columns=read_columns, use_threads=False)
+            if filters:
+                table = table.filter(pq.filters_to_expression(filters))
+            if columns is not None:
+                table = table.select([col for col in columns if col in table.column_names])
+            for col, value in partition.items():
+                table = table.append_column(col, pa.array([value] * table.num_rows, type=pa.string()))
+            fetched.append(source.bytes_read)
+            return table
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            tables = list(executor.map(lambda item: read(*item), objects))
+        table = pa.concat_tables(tables, promote_options='default')
+        print(
+            f"Read {table.num_rows} rows from {len(objects)} objects under {base_key} "
+            f"({sum(fetched)} of {sum(size for _, _, size in objects)} bytes fetched)."
+        )
+        return table
+
+class S3RangeFile(io.RawIOBase):
+    def __init__(self, s3_handler: S3Handler, object_name: str, size: int):
+        """
+        Read-only file over an S3 object in which every read is a ranged GET, so a Parquet
+        reader fetches only the footer and the column chunks it needs.
+
+        :param s3_handler: S3Handler for the object's bucket.
+        :param object_name: The S3 key.
+        :param size: Size of the object in bytes, e.g. from a listing.
+        """
+        self.s3_handler = s3_handler
+        self.object_name = object_name
+        self.size = size
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.size - self.position
+        size = min(size, self.size - self.position)
+        if size <= 0:
+            return b''
+        data = self.s3_handler.download_range(self.object_name, self.position, size, raise_exception=True)
+        self.position += len(data)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _row_group_may_match(row_group: pq.RowGroupMetaData, filters: Optional[List[Tuple]]) -> bool:
+    """
+    Whether a row group's min/max statistics allow any row to pass filters. Only flat
+    [(column, op, value), ...] filters are checked; anything else keeps the row group.
+    """
+    if not filters or not all(isinstance(f, tuple) for f in filters):
+        return True
+    chunks = {row_group.column(i).path_in_schema: row_group.column(i) for i in range(row_group.num_columns)}
+    for column, op, value in filters:
+        chunk = chunks.get(column)
+        statistics = chunk.statistics if chunk is not None else None
+        if statistics is None or not statistics.has_min_max:
+            continue
+        low, high = statistics.min, statistics.max
+        try:
+            if op in ('=', '==') and (value < low or value > high):
+                return False
+            if op == '!=' and low == high == value:
+                return False
+            if (op == '<' and low >= value) or (op == '<=' and low > value):
+                return False
+            if (op == '>' and high <= value) or (op == '>=' and high < value):
+                return False
+            if op == 'in' and all(v < low or v > high for v in value):
+                return False
+        except TypeError:
+            continue # Statistics not comparable with the value
+    return True
+
+def _chunk_ranges(size: int, chunk_size: int, first_chunk_size: int = 0) -> List[Tuple[int, int]]:
+    """
+    (offset, length) of each chunk of a file: first_chunk_size bytes, if any, then
+    chunk_size bytes at a time.
+    """
+    ranges = [(0, min(first_chunk_size, size))] if first_chunk_size else []
+    ranges += [(offset, min(chunk_size, size - offset)) for offset in range(min(first_chunk_size, size), size, chunk_size)]
+    return ranges
+
+_shared_s3_handlers: Dict[str, S3Handler] = {}
+_shared_lock = threading.Lock()
+
+def get_s3_handler(bucket_name: str) -> S3Handler:
+    """
+    Returns the process-wide S3Handler for a bucket, creating it on first use so the
+    boto3 client is built once per process. boto3 clients are thread-safe.
+
+    :param bucket_name: The name of the AWS S3 bucket.
+    :return: S3Handler
+    """
+    with _shared_lock:
+        if bucket_name not in _shared_s3_handlers:
+            _shared_s3_handlers[bucket_name] = S3Handler(bucket_name)
+        return _shared_s3_handlers[bucket_name]
@@ -0,0 +1,152 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from botocore.exceptions import ClientError, ConnectionClosedError, EndpointConnectionError, ReadTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+from handlers.retry_policy import RetryPolicy
+from handlers.s3_handler import S3Handler
+
+# Network failures worth retrying; ClientErrors are retried by status code.
+RETRYABLE_EXCEPTIONS = (ConnectionClosedError, EndpointConnectionError, ReadTimeoutError)
+
+class BackgroundUploader:
+    def __init__(
+            self,
+            s3_handler: S3Handler,
+            max_workers: int = 8,
+            max_pending_bytes: int = 256 * 1024 * 1024,
+            retry_policy: Optional[RetryPolicy] = None
+        ):
+        """
+        Initializes the BackgroundUploader, which runs S3 uploads on a thread pool so the
+        caller can get on with fetching and parsing.
+
+        At most max_pending_bytes of queued or in-flight data are held in memory; submit()
+        blocks beyond that, so a slow S3 slows the flow down instead of exhausting memory.
+        A single upload larger than the limit is still accepted once nothing else is pending.
+        Throttling, transient server errors and connection errors are retried with
+        exponential backoff. flush() is the barrier that waits for everything submitted.
+
+        :param s3_handler: S3Handler whose client and bucket are used.
+        :param max_workers: Number of uploads in flight at once.
+        :param max_pending_bytes: Bytes of queued and in-flight uploads before submit() blocks.
+        :param retry_policy: Decides retries and backoff. Defaults to 5 attempts, at most 30 seconds apart.
+        """
+        self.s3_handler = s3_handler
+        self.max_pending_bytes = max_pending_bytes
+        self.retry_policy = retry_policy or RetryPolicy(5, max_backoff_secs=30)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='s3-upload')
+        self.condition = threading.Condition()
+        self.pending_bytes = 0
+        self.futures: List[Future] = []
+        self.latencies: List[Dict[str, Any]] = []
+
+    def submit(self, key: str, fn: Callable[..., Any], *args, size: int = 0, **kwargs) -> Future:
+        """
+        Queues fn(*args, **kwargs) to run in the background, blocking while the pending
+        uploads would exceed max_pending_bytes.
+
+        :param key: S3 key the call writes, used in retries and the latency report.
+        :param fn: Callable doing the upload, e.g. s3_client.upload_part.
+        :param size: Bytes the call holds in memory until it completes.
+        :return: Future of fn's return value.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending_bytes == 0 or self.pending_bytes + size <= self.max_pending_bytes)
+            self.pending_bytes += size
+        future = self.executor.submit(self._run, key, size, fn, *args, **kwargs)
+        self.futures.append(future)
+        return future
+
+    def put_object(self, key: str, body: bytes) -> Future:
+        """
+        Queues a put_object of body to key in the handler's bucket.
+
+        :param key: The S3 key.
+        :param body: The object data.
+        :return: Future of the put_object response.
+        """
+        return self.submit(
+            key, self.s3_handler.s3_client.put_object, size=len(body),
+            Bucket=self.s3_handler.bucket_name, Key=key, Body=body
+        )
+
+    def _run(self, key: str, size: int, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                self.retry_policy.record_attempt(key)
+                try:
+                    result = fn(*args, **kwargs)
+                    break
+                except (ClientError, *RETRYABLE_EXCEPTIONS) as e:
+                    if isinstance(e, ClientError):
+                        status_code = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+                        if not RetryPolicy.is_retryable_status(status_code):
+                            raise
+                    delay = self.retry_policy.next_delay(attempt)
+                    if delay is None:
+                        raise
+                    print(f"Upload of {key} failed ({e}); retrying in {delay:.1f} seconds.")
+                    time.sleep(delay)
+                    attempt += 1
+            with self.condition:
+                self.latencies.append({'key': key, 'bytes': size, 'seconds': time.perf_counter() - started, 'attempts': attempt + 1})
+            return result
+        finally:
+            with self.condition:
+                self.pending_bytes -= size
+                self.condition.notify_all()
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """
+        Waits for every upload submitted so far.
+
+        :return: Per-object latencies as {key, bytes, seconds, attempts}, in completion order.
+        :raises Exception: The first upload error, after all uploads have finished.
+        """
+        futures, self.futures = self.futures, []
+        errors = [future.exception() for future in futures]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            print(f"{len(errors)} of {len(futures)} uploads failed.")
+            raise errors[0]
+        return self.latencies
+
+    def report(self) -> Dict[str, float]:
+        """
+        Prints and returns a summary of the completed uploads' latencies.
+
+        :return: Dictionary with 'uploads', 'bytes', 'p50_secs', 'p95_secs' and 'max_secs'.
+        """
+        with self.condition:
+            seconds = sorted(latency['seconds'] for latency in self.latencies)
+            total_bytes = sum(latency['bytes'] for latency in self.latencies)
+        if not seconds:
+            print("No uploads completed.")
+            return {'uploads': 0, 'bytes': 0, 'p50_secs': 0.0, 'p95_secs': 0.0, 'max_secs': 0.0}
+        summary = {
+            'uploads': len(seconds),
+            'bytes': total_bytes,
+            'p50_secs': seconds[len(seconds) // 2],
+            'p95_secs': seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+            'max_secs': seconds[-1]
+        }
+        print(
+            f"{summary['uploads']} uploads, {summary['bytes']} bytes: "
+            f"p50 {summary['p50_secs']:.3f}s, p95 {summary['p95_secs']:.3f}s, max {summary['max_secs']:.3f}s."
+        )
+        return summary
+
+    def close(self) -> None:
+        """
+        Waits for pending uploads and shuts down the thread pool.
+        """
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self) -> 'BackgroundUploader':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,85 @@
+import os
+import json
+from typing import Dict, Any, Iterable, Optional
+from utils.utils import compute_md5_hash
+
+class ValidatorStore:
+    def __init__(self, path: str):
+        """
+        Initializes the ValidatorStore, a persistent record of the ETag, Last-Modified
+        header and body hash last seen for each URL. Used to send conditional GET requests
+        and to recognise unchanged responses.
+
+        Validators seen during a run are held back until save() is called, and only those
+        of URLs whose data was stored are kept, so a run that fails before its data is stored,
+        or a response that could not be parsed, does not cause the next run to skip that data.
+
+        :param path: Path to the JSON file holding the validators.
+        """
+        self.path = path
+        self.validators: Dict[str, Dict[str, Optional[str]]] = {}
+        self.pending: Dict[str, Dict[str, Optional[str]]] = {}
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.validators = json.load(file)
+        print(f"Loaded validators for {len(self.validators)} URLs from {path}")
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        Builds If-None-Match / If-Modified-Since headers from the stored validators.
+
+        :param url: URL about to be requested.
+        :return: Dictionary of conditional request headers, empty if the URL is unknown.
+        """
+        validator = self.validators.get(url, {})
+        headers = {}
+        if validator.get('etag'):
+            headers['If-None-Match'] = validator['etag']
+        if validator.get('last_modified'):
+            headers['If-Modified-Since'] = validator['last_modified']
+        return headers
+
+    def is_unchanged(self, url: str, response: Any) -> bool:
+        """
+        Checks a response against the stored validators. A 304 Not Modified, or a body whose
+        hash matches the stored one, counts as unchanged. Otherwise the response's validators
+        are staged for the next save().
+
+        :param url: URL that was requested.
+        :param response: requests.Response or httpx.Response.
+        :return: True if the resource has not changed since it was last stored.
+        """
+        if response.status_code == 304:
+            return True
+        validator = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body_hash': compute_md5_hash(response.content)
+        }
+        if self.validators.get(url, {}).get('body_hash') == validator['body_hash']:
+            return True
+        self.pending[url] = validator
+        return False
+
+    def save(self, urls: Optional[Iterable[str]] = None) -> None:
+        """
+        Commits validators staged during the run and writes the store to disk. Validators
+        of other URLs are dropped, so their responses are fetched and stored again next run.
+        Call this only once the responses have been stored downstream.
+
+        :param urls: URLs whose responses were stored, e.g. parsed and loaded. None for all.
+        """
+        if urls is None:
+            self.validators.update(self.pending)
+        else:
+            urls = set(urls)
+            self.validators.update({url: validator for url, validator in self.pending.items() if url in urls})
+        self.pending = {}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(self.validators, file)
+        os.replace(temp_path, self.path)
+        print(f"Saved validators for {len(self.validators)} URLs to {self.path}")
@@ -11,7 +11,7 @@ from prefect import flow, task
 # Internal
 from handlers.s3_handler import S3Handler
 from handlers.request_handler import RequestHandler
-from handlers.dk_response_parser import DKResponseParser
+from handlers.dk_response_parser import DKResponseParser, PathExtractor
 from utils.utils import load_config, get_event_group_by_name, generate_timestamp
 from utils.stats_utils import gamma_mean_from_market, poisson_mean_from_market, find_normal_mean, evaluate_normal_distribution
 
@@ -49,6 +49,30 @@ retries = environment_config['prefect']['retries']
 retry_delay_seconds = environment_config['prefect']['retry_delay_seconds']
 log_prints = environment_config['prefect']['log_prints']
 
+# Compiled once, applied to every subcategory response
+events_extractor = PathExtractor(
+    row_path='[*]',
+    columns={
+        'eventId': 'eventId',
+        'name': 'name',
+        'team1.name': 'team1.name',
+        'team2.name': 'team2.name'
+    }
+)
+offers_extractor = PathExtractor(
+    row_path='[*][*]', # offers is a list of lists
+    columns={
+        'eventId': 'eventId',
+        'label': 'label',
+        'outcomes[0]_label': 'outcomes[0].label',
+        'outcomes[0]_oddsAmerican': 'outcomes[0].oddsAmerican',
+        'outcomes[0]_oddsDecimal': 'outcomes[0].oddsDecimal',
+        'outcomes[1]_label': 'outcomes[1].label',
+        'outcomes[1]_oddsAmerican': 'outcomes[1].oddsAmerican',
+        'outcomes[1]_oddsDecimal': 'outcomes[1].oddsDecimal'
+    }
+)
+
 def calculate_weighted_score(df: pd.DataFrame, scoring_dict: dict) -> pd.DataFrame:
     """
     Adds a new column to the DataFrame that contains weighted scores.
@@ -166,40 +190,18 @@ if __name__ == "__main__":
     s3_handler = S3Handler(s3_bucket)
 
     responses = issue_requests()
+    request_handler.close()
 
     all_props_df = pd.DataFrame()
     for subcategory_name, response in responses.items():
         json_obj = response.json()
         parser = DKResponseParser(json_obj)
 
-        events = parser.find_nested_value(d=json_obj, key='events')
-        flattened_events = parser.flatten_item(item=events, exclude={'tags'})
-        events_df = parser.flattened_events_to_dataframe(flattened_events)
-        events_cols_to_keep = [
-            'eventId',
-            'name',
-            'team1.name',
-            'team2.name'
-        ]
-        events_df = events_df[events_cols_to_keep]
-
-        offers = parser.find_nested_value(d=json_obj, key='offers')
-        flattened_offers = parser.flatten_item(item=offers, exclude={'tags'})
-        offers_df = parser.flattened_props_offers_to_dataframe(flattened_offers)
-
-        
-        offers_cols_to_keep = [
-            'eventId',
-            'label',
-            'outcomes[0]_label',
-            'outcomes[0]_oddsAmerican',
-            'outcomes[0]_oddsDecimal',
-            'outcomes[1]_label',
-            'outcomes[1]_oddsAmerican',
-            'outcomes[1]_oddsDecimal'
-        ]
-        offers_df = offers_df[offers_cols_to_keep]
-        
+        events = parser.find('events')
+        events_df = events_extractor.to_dataframe(events)
+
+        offers = parser.find('offers')
+        offers_df = offers_extractor.to_dataframe(offers)
 
         props_df = pd.merge(left=events_df, right=offers_df, how='inner', on='eventId')
 
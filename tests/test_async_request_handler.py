@@ -0,0 +1,73 @@
+import unittest
+import asyncio
+import threading
+import time
+import httpx
+from handlers.async_request_handler import AsyncRequestHandler
+
+class TestAsyncRequestHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.in_flight = 0
+        self.max_seen = 0
+        self.requested = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.requested += 1
+            self.in_flight += 1
+            self.max_seen = max(self.max_seen, self.in_flight)
+            # Later subcategories answer faster than earlier ones
+            delay = 0.05 / int(request.url.params['n'])
+            await asyncio.sleep(delay)
+            self.in_flight -= 1
+            if request.url.path == '/missing':
+                return httpx.Response(404)
+            return httpx.Response(200, json={'n': request.url.params['n']})
+
+        self.transport = httpx.MockTransport(handler)
+
+    def test_fetch_all_bounds_in_flight_requests(self):
+        request_handler = AsyncRequestHandler(3, max_in_flight_per_host=2, transport=self.transport)
+        urls = [(n, f'https://example.com/offers?n={n}') for n in range(1, 7)]
+
+        results = request_handler.fetch_all(urls)
+
+        self.assertEqual(sorted(key for key, _ in results), list(range(1, 7)))
+        self.assertEqual(self.max_seen, 2)
+        for key, response in results:
+            self.assertEqual(response.json(), {'n': str(key)})
+
+    def test_results_arrive_in_completion_order(self):
+        request_handler = AsyncRequestHandler(3, max_in_flight_per_host=3, transport=self.transport)
+        urls = [(n, f'https://example.com/offers?n={n}') for n in range(1, 4)]
+
+        keys = [key for key, _ in request_handler.iter_as_completed(urls)]
+
+        self.assertEqual(keys, [3, 2, 1])
+
+    def test_stopping_early_cancels_outstanding_requests(self):
+        request_handler = AsyncRequestHandler(3, max_in_flight_per_host=1, transport=self.transport)
+        urls = [(n, f'https://example.com/offers?n={n}') for n in range(1, 21)]
+        threads = threading.active_count()
+
+        responses = request_handler.iter_as_completed(urls, max_pending=1)
+        next(responses)
+        # Fetching pauses while the consumer holds responses back
+        time.sleep(0.2)
+        self.assertLess(self.requested, 5)
+        responses.close()
+
+        self.assertEqual(threading.active_count(), threads)
+        requested = self.requested
+        time.sleep(0.1)
+        self.assertEqual(self.requested, requested)
+
+    def test_http_error_returns_none(self):
+        request_handler = AsyncRequestHandler(3, transport=self.transport)
+
+        results = request_handler.fetch_all([('missing', 'https://example.com/missing?n=1')])
+
+        self.assertEqual(results, [('missing', None)])
+
+if __name__ == '__main__':
+    unittest.main()
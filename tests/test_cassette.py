@@ -0,0 +1,57 @@
+import unittest
+import os
+import time
+import tempfile
+import httpx
+from handlers.cassette import Cassette
+from handlers.async_request_handler import AsyncRequestHandler
+from handlers.request_handler import RequestHandler
+from handlers.rate_limiter import RateLimiter
+
+class TestCassette(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'cassettes', 'run.jsonl.gz')
+        self.urls = [('a', 'https://example.com/a'), ('b', 'https://example.com/b'), ('missing', 'https://example.com/missing')]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == '/missing':
+                return httpx.Response(404)
+            return httpx.Response(200, headers={'ETag': '"1"'}, json={'path': request.url.path})
+
+        recorder = AsyncRequestHandler(3, cassette=Cassette(self.path, 'record'), transport=httpx.MockTransport(handler))
+        recorder.fetch_all(self.urls)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_replay_without_network(self):
+        def offline(request: httpx.Request) -> httpx.Response:
+            raise AssertionError('Replay must not touch the network')
+
+        # A slow rate limit would be noticeable if replay did not bypass it
+        replayer = AsyncRequestHandler(3, rate_limiter=RateLimiter.from_sleep_range(60, 60), cassette=Cassette(self.path, 'replay'), transport=httpx.MockTransport(offline))
+        start = time.monotonic()
+        results = dict(replayer.fetch_all(self.urls))
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(results['a'].json(), {'path': '/a'})
+        self.assertEqual(results['b'].headers['ETag'], '"1"')
+        self.assertIsNone(results['missing'])
+
+    def test_request_handler_replays_async_recordings(self):
+        request_handler = RequestHandler(60, 60, 3, cassette=Cassette(self.path, 'replay'))
+
+        response = request_handler.get('https://example.com/a')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'path': '/a'})
+        self.assertIsNone(request_handler.get('https://example.com/unrecorded'))
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            Cassette(self.path, 'rewind')
+
+if __name__ == '__main__':
+    unittest.main()
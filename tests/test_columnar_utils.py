@@ -0,0 +1,96 @@
+import unittest
+import orjson
+import numpy as np
+import pandas as pd
+from utils.utils import parse_dk_offers
+from utils.columnar_utils import (
+    DK_OFFER_COLUMNS, normalize_american_odds, normalize_id, parse_dk_offers_columnar,
+    concat_dk_offers_columnar, dk_offers_columnar_to_dataframe, dk_offers_columnar_to_arrow
+)
+
+def make_payload(subcategory_name: str, participant_name: str) -> dict:
+    outcomes = [
+        {'label': 'Over', 'oddsAmerican': '+150', 'oddsDecimal': 2.5, 'line': 4.5,
+         'participants': [{'id': 7, 'name': participant_name, 'type': 'Player'}]},
+        {'label': 'Under', 'oddsAmerican': '−180',
+         'participants': [{'id': 7, 'name': participant_name, 'type': 'Player'}]}
+    ]
+    return {'eventGroup': {'offerCategories': [{'offerSubcategoryDescriptors': [
+        {'subcategoryId': 1, 'name': subcategory_name, 'offerSubcategory': {'offers': [[
+            {'label': 'Receptions', 'providerOfferId': 'p1', 'eventId': 'e1', 'eventGroupId': '88808',
+             'playerNameIdentifier': participant_name, 'outcomes': outcomes}
+        ]]}},
+        {'subcategoryId': 2, 'name': 'No offers'}
+    ]}]}}
+
+class TestColumnarUtils(unittest.TestCase):
+
+    def test_normalize_american_odds(self):
+        self.assertEqual(normalize_american_odds('+150'), 150)
+        self.assertEqual(normalize_american_odds('-110'), -110)
+        self.assertEqual(normalize_american_odds('−110'), -110)
+        self.assertIsNone(normalize_american_odds(''))
+        self.assertIsNone(normalize_american_odds('EVEN'))
+        self.assertIsNone(normalize_american_odds(float('nan')))
+        self.assertIsNone(normalize_american_odds(float('inf')))
+        self.assertEqual(normalize_american_odds(-110.0), -110)
+
+    def test_normalize_id(self):
+        self.assertEqual(normalize_id('88808'), 88808)
+        self.assertEqual(normalize_id(7), 7)
+        self.assertIsNone(normalize_id(''))
+        self.assertIsNone(normalize_id(None))
+        self.assertIsNone(normalize_id(float('nan')))
+        self.assertIsNone(normalize_id(float('inf')))
+
+    def test_matches_row_parser(self):
+        payload = make_payload('Receptions', 'Bob')
+        rows = pd.DataFrame(parse_dk_offers(payload, '20240101120000'))
+        batch = parse_dk_offers_columnar(orjson.dumps(payload), '20240101120000')
+        df = dk_offers_columnar_to_dataframe(batch)
+
+        self.assertEqual(batch['num_rows'], len(rows))
+        self.assertEqual(list(df.columns), DK_OFFER_COLUMNS)
+        for column in ['subcategory_name', 'offer_label', 'outcome_label', 'participant_name']:
+            self.assertEqual(df[column].astype(str).tolist(), rows[column].tolist())
+        self.assertEqual(df['outcome_oddsAmerican'].tolist(), [150, -180])
+        self.assertTrue(np.isnan(batch['columns']['outcome_line'][1]))
+        self.assertEqual(df['timestamp'].iloc[0], pd.Timestamp('2024-01-01 12:00:00'))
+
+    def test_missing_odds_are_masked(self):
+        payload = make_payload('Receptions', 'Bob')
+        del payload['eventGroup']['offerCategories'][0]['offerSubcategoryDescriptors'][0]['offerSubcategory']['offers'][0][0]['outcomes'][0]['oddsAmerican']
+        df = dk_offers_columnar_to_dataframe(parse_dk_offers_columnar(orjson.dumps(payload), '20240101120000'))
+
+        self.assertTrue(pd.isna(df['outcome_oddsAmerican'].iloc[0]))
+        self.assertEqual(df['outcome_oddsAmerican'].iloc[1], -180)
+
+    def test_concat_merges_dictionaries(self):
+        first = parse_dk_offers_columnar(orjson.dumps(make_payload('Receptions', 'Bob')), '20240101120000')
+        second = parse_dk_offers_columnar(orjson.dumps(make_payload('Rush Yards O/U', 'Bob')), '20240101120500')
+        combined = concat_dk_offers_columnar([first, None, second])
+        df = dk_offers_columnar_to_dataframe(combined)
+
+        self.assertEqual(combined['num_rows'], 4)
+        self.assertEqual(list(combined['dictionaries']['participant_name']), ['Bob'])
+        self.assertEqual(df['subcategory_name'].astype(str).tolist(), ['Receptions'] * 2 + ['Rush Yards O/U'] * 2)
+
+    def test_concat_of_nothing_is_empty(self):
+        df = dk_offers_columnar_to_dataframe(concat_dk_offers_columnar([]))
+
+        self.assertTrue(df.empty)
+        self.assertEqual(list(df.columns), DK_OFFER_COLUMNS)
+
+    def test_to_arrow(self):
+        batch = parse_dk_offers_columnar(orjson.dumps(make_payload('Receptions', 'Bob')), '20240101120000')
+        table = dk_offers_columnar_to_arrow(batch)
+
+        self.assertEqual(table.column_names, DK_OFFER_COLUMNS)
+        self.assertEqual(str(table.schema.field('participant_name').type), 'dictionary<values=string, indices=int32, ordered=0>')
+        self.assertEqual(table.column('outcome_oddsAmerican').to_pylist(), [150, -180])
+        self.assertEqual(table.column('outcome_line').to_pylist(), [4.5, None])
+        self.assertEqual(table.column('subcategory_subcategoryId').to_pylist(), [1, 1])
+        self.assertEqual(table.column('participant_id').to_pylist(), [7, 7])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from handlers.dk_response_parser import DKResponseParser, PathExtractor
+
+class TestPathExtractor(unittest.TestCase):
+
+    def setUp(self):
+        self.offers = [
+            [{'eventId': '1', 'label': 'Passing Yards', 'outcomes': [
+                {'label': 'Over 3600.5', 'oddsAmerican': '-110'},
+                {'label': 'Under 3600.5', 'oddsAmerican': '-120'}
+            ]}],
+            [{'eventId': '2', 'label': 'Receptions', 'outcomes': [
+                {'label': 'Over 80.5', 'oddsAmerican': '+100'}
+            ]}]
+        ]
+
+    def test_compile_path(self):
+        self.assertEqual(PathExtractor.compile_path('outcomes[0].label'), ('outcomes', 0, 'label'))
+        self.assertEqual(PathExtractor.compile_path('[*][*]'), ('*', '*'))
+        self.assertEqual(PathExtractor.compile_path('team1.name'), ('team1', 'name'))
+        self.assertEqual(PathExtractor.compile_path(''), ())
+
+    def test_invalid_path_raises(self):
+        with self.assertRaises(ValueError):
+            PathExtractor.compile_path('outcomes[x]')
+
+    def test_column_wildcard_raises(self):
+        with self.assertRaises(ValueError):
+            PathExtractor('[*]', {'label': 'outcomes[*].label'})
+
+    def test_list_of_lists_to_dataframe(self):
+        extractor = PathExtractor('[*][*]', {
+            'eventId': 'eventId',
+            'outcomes[0]_label': 'outcomes[0].label',
+            'outcomes[1]_oddsAmerican': 'outcomes[1].oddsAmerican'
+        })
+        df = extractor.to_dataframe(self.offers)
+
+        self.assertEqual(list(df.columns), ['eventId', 'outcomes[0]_label', 'outcomes[1]_oddsAmerican'])
+        self.assertEqual(df['eventId'].tolist(), ['1', '2'])
+        self.assertEqual(df['outcomes[0]_label'].tolist(), ['Over 3600.5', 'Over 80.5'])
+        self.assertEqual(df['outcomes[1]_oddsAmerican'].tolist(), ['-120', None])
+
+    def test_nested_row_path(self):
+        payload = {'eventGroup': {'events': [{'eventId': '1', 'team1': {'name': 'GB'}}, {'eventId': '2'}]}}
+        extractor = PathExtractor('eventGroup.events[*]', {'eventId': 'eventId', 'team1.name': 'team1.name'})
+
+        self.assertEqual(extractor.extract(payload), {'eventId': ['1', '2'], 'team1.name': ['GB', None]})
+        self.assertEqual(extractor.extract({}), {'eventId': [], 'team1.name': []})
+
+class TestDKResponseParser(unittest.TestCase):
+
+    def setUp(self):
+        self.payload = {'eventGroup': {
+            'events': [{'eventId': '1', 'name': 'GB @ CHI'}],
+            'offerCategories': [
+                {'name': 'Passing', 'offerSubcategoryDescriptors': [
+                    {'name': 'Pass Yards', 'offerSubcategory': {'offers': [[{'eventId': '1'}]]}}
+                ]},
+                {'name': 'Rushing', 'offerSubcategoryDescriptors': [{'name': 'Rush Yards'}]}
+            ]
+        }}
+
+    def test_find(self):
+        parser = DKResponseParser(self.payload)
+
+        self.assertEqual(parser.find('events'), [{'eventId': '1', 'name': 'GB @ CHI'}])
+        self.assertEqual(parser.find('offers'), [[{'eventId': '1'}]])
+        self.assertIsNone(parser.find('missing'))
+
+    def test_find_returns_first_match(self):
+        parser = DKResponseParser(self.payload)
+
+        self.assertEqual(parser.find('offerSubcategoryDescriptors'), parser.find_all('offerSubcategoryDescriptors')[0])
+        # A dictionary's own key comes before those nested in it
+        self.assertEqual(DKResponseParser.find_nested_value({'a': {'name': 'inner'}, 'name': 'outer'}, 'name'), 'outer')
+
+    def test_find_unique_raises_on_duplicates_in_sibling_branches(self):
+        parser = DKResponseParser(self.payload)
+
+        self.assertEqual(parser.find_unique('events'), [{'eventId': '1', 'name': 'GB @ CHI'}])
+        with self.assertRaises(ValueError):
+            parser.find_unique('offerSubcategoryDescriptors')
+        with self.assertRaises(ValueError):
+            parser.find_unique('eventId')
+
+    def test_find_all_in_document_order(self):
+        parser = DKResponseParser(self.payload, eager_index=True)
+
+        self.assertEqual(parser.find_all('name'), ['GB @ CHI', 'Passing', 'Pass Yards', 'Rushing', 'Rush Yards'])
+        self.assertEqual(parser.key_index['offers'][0][0], ('eventGroup', 'offerCategories', 0, 'offerSubcategoryDescriptors', 0, 'offerSubcategory', 'offers'))
+
+    def test_index_is_built_once(self):
+        parser = DKResponseParser(self.payload)
+        self.assertIsNone(parser._key_index)
+
+        parser.find('events')
+        index = parser._key_index
+        parser.find('offers')
+        self.assertIs(parser._key_index, index)
+
+if __name__ == '__main__':
+    unittest.main()
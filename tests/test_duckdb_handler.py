@@ -1,7 +1,17 @@
 import unittest
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+import duckdb
 import pandas as pd
-from handlers.duckdb_handler import DuckDBHandler
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shutil
+import tempfile
+from moto import mock_aws
+from handlers.duckdb_handler import DuckDBHandler, get_connection
+from transformations.python.calculate_props import create_run_odds_view
 
 class TestDuckDBHandler(unittest.TestCase):
 
@@ -22,6 +32,7 @@ class TestDuckDBHandler(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls):
+        cls.duckdb_handler.close()
         if os.path.exists(cls.db_path):
             os.remove(cls.db_path)
 
@@ -31,6 +42,32 @@ class TestDuckDBHandler(unittest.TestCase):
         result = result.astype({'id': 'int64'})
         pd.testing.assert_frame_equal(result, self.test_df)
 
+    def test_append_arrow(self):
+        self.duckdb_handler.conn.execute("CREATE TABLE arrow_table (id INTEGER, name STRING, score DOUBLE)")
+        # Columns out of table order, and 'score' missing
+        table = pa.table({'name': ['Alice', 'Bob', 'Charlie'], 'id': pa.array([1, 2, 3], type=pa.int32())})
+        batches = table.to_batches(max_chunksize=1)
+
+        self.assertEqual(self.duckdb_handler.append_arrow('arrow_table', table), 3)
+        self.assertEqual(self.duckdb_handler.append_arrow('arrow_table', iter(batches), commit_every=2), 3)
+        self.assertEqual(self.duckdb_handler.append_arrow('arrow_table', pa.RecordBatchReader.from_batches(table.schema, batches)), 3)
+        self.assertEqual(self.duckdb_handler.append_arrow('arrow_table', []), 0)
+
+        result = self.duckdb_handler.query('SELECT id, name, score FROM main.arrow_table ORDER BY id')
+        self.assertEqual(result['id'].tolist(), [1, 1, 1, 2, 2, 2, 3, 3, 3])
+        self.assertEqual(result['name'].tolist()[::3], ['Alice', 'Bob', 'Charlie'])
+        self.assertTrue(result['score'].isna().all())
+
+    def test_append_arrow_rolls_back_failed_batch(self):
+        self.duckdb_handler.conn.execute("CREATE TABLE arrow_strict (id INTEGER NOT NULL)")
+        good = pa.record_batch({'id': pa.array([1, 2], type=pa.int32())})
+        bad = pa.record_batch({'id': pa.array([3, None], type=pa.int32())})
+
+        with self.assertRaises(Exception):
+            self.duckdb_handler.append_arrow('arrow_strict', [good, bad], commit_every=1)
+        result = self.duckdb_handler.query('SELECT id FROM main.arrow_strict ORDER BY id')
+        self.assertEqual(result['id'].tolist(), [1, 2])
+
     def test_upsert_data(self):
         """
         Note: above methods have been executed already
@@ -52,7 +89,8 @@ class TestDuckDBHandler(unittest.TestCase):
             'id': [1, 2, 3, 4],
             'name': ['Alice', 'Bob', 'Cole', 'David']
         })
-        self.duckdb_handler.upsert_data('test_table', upsert_df, ['id'])
+        counts = self.duckdb_handler.upsert_data('test_table', upsert_df, ['id'])
+        self.assertEqual(counts, {'inserted': 1, 'updated': 2})
         result = self.duckdb_handler.query('SELECT * FROM main.test_table')
         result = result.astype({'id': 'int64'})
         pd.testing.assert_frame_equal(result.sort_values('id').reset_index(drop=True), expected_df)
@@ -73,5 +111,369 @@ class TestDuckDBHandler(unittest.TestCase):
         expected_result = self.test_df[self.test_df['id'] == 1]
         pd.testing.assert_frame_equal(result, expected_result)
 
+    def test_upsert_data_rejects_duplicate_keys(self):
+        self.duckdb_handler.conn.execute("CREATE TABLE upsert_dupes (id INTEGER, name STRING)")
+        self.duckdb_handler.conn.execute("INSERT INTO upsert_dupes VALUES (1, 'Alice'), (1, 'Alicia')")
+
+        with self.assertRaises(ValueError):
+            self.duckdb_handler.upsert_data('upsert_dupes', pd.DataFrame({'id': [2, 2], 'name': ['Bob', 'Rob']}), ['id'])
+        with self.assertRaises(ValueError):
+            self.duckdb_handler.upsert_data('upsert_dupes', pd.DataFrame({'id': [2], 'name': ['Bob']}), ['id'])
+        result = self.duckdb_handler.query('SELECT count(*) AS n FROM main.upsert_dupes')
+        self.assertEqual(result['n'].iloc[0], 2)
+        tables = self.duckdb_handler.query("SELECT table_name FROM duckdb_tables() WHERE table_name LIKE 'upsert_dupes%'")
+        self.assertEqual(tables['table_name'].tolist(), ['upsert_dupes'])
+
+    def test_upsert_data_uses_existing_constraint(self):
+        self.duckdb_handler.conn.execute("CREATE TABLE upsert_keyed (week INTEGER, player STRING, points DOUBLE, PRIMARY KEY (player, week))")
+        first = pd.DataFrame({'player': ['Bob', 'Al'], 'week': [1, 1], 'points': [10.0, 8.0]})
+        second = pd.DataFrame({'player': ['Bob'], 'week': [1], 'points': [12.0]})
+        self.assertEqual(self.duckdb_handler.upsert_data('upsert_keyed', first, ['week', 'player']), {'inserted': 2, 'updated': 0})
+        self.assertEqual(self.duckdb_handler.upsert_data('upsert_keyed', second, ['week', 'player']), {'inserted': 0, 'updated': 1})
+        # The primary key's index is used; no second index is created
+        indexes = self.duckdb_handler.query("SELECT index_name FROM duckdb_indexes() WHERE table_name = 'upsert_keyed'")
+        self.assertEqual(indexes['index_name'].tolist(), [])
+        result = self.duckdb_handler.query("SELECT points FROM upsert_keyed ORDER BY player")
+        self.assertEqual(result['points'].tolist(), [8.0, 12.0])
+
+    def test_upsert_data_composite_key(self):
+        self.duckdb_handler.conn.execute("CREATE TABLE upsert_composite (player STRING, week INTEGER, points DOUBLE)")
+        first = pd.DataFrame({'player': ['A', 'A', 'B'], 'week': [1, 2, 1], 'points': [10.0, 12.0, 8.0]})
+        second = pd.DataFrame({'player': ['A', 'B'], 'week': [2, 2], 'points': [15.0, 9.0]})
+
+        self.assertEqual(self.duckdb_handler.upsert_data('upsert_composite', first, ['player', 'week']), {'inserted': 3, 'updated': 0})
+        self.assertEqual(self.duckdb_handler.upsert_data('upsert_composite', second, ['player', 'week']), {'inserted': 1, 'updated': 1})
+        result = self.duckdb_handler.query('SELECT points FROM main.upsert_composite ORDER BY player, week')
+        self.assertEqual(result['points'].tolist(), [10.0, 15.0, 8.0, 9.0])
+
+    def test_merge_history(self):
+        self.duckdb_handler.conn.execute(
+            "CREATE TABLE odds_history (market STRING, outcome STRING, odds INTEGER, valid_from TIMESTAMP, valid_to TIMESTAMP, run_id BIGINT, closed_run_id BIGINT)"
+        )
+        merge = lambda df, valid_from, markets, run_id: self.duckdb_handler.merge_history(
+            'odds_history', pa.Table.from_pandas(df), ['market', 'outcome'], ['odds'],
+            pd.Timestamp(valid_from), 'market', markets, run_id
+        )
+        first = pd.DataFrame({'market': ['A', 'A', 'B'], 'outcome': ['Over', 'Under', 'Over'], 'odds': [100, -120, 150]})
+        self.assertEqual(merge(first, '2024-09-01 10:00', ['A', 'B'], 1), {'inserted': 3, 'closed': 0, 'unchanged': 0})
+        # A moves, A Under disappears; B was not fetched and stays open
+        second = pd.DataFrame({'market': ['A'], 'outcome': ['Over'], 'odds': [110]})
+        self.assertEqual(merge(second, '2024-09-01 11:00', ['A'], 2), {'inserted': 1, 'closed': 2, 'unchanged': 0})
+        self.assertEqual(merge(second, '2024-09-01 12:00', ['A'], 3), {'inserted': 0, 'closed': 0, 'unchanged': 1})
+
+        result = self.duckdb_handler.query(
+            "SELECT market, outcome, odds, valid_to IS NULL AS current, run_id, closed_run_id FROM odds_history ORDER BY market, outcome, run_id"
+        )
+        self.assertEqual(result['odds'].tolist(), [100, 110, -120, 150])
+        self.assertEqual(result['current'].tolist(), [False, True, False, True])
+        self.assertEqual(result['closed_run_id'].fillna(0).tolist(), [2, 0, 2, 0])
+
+class TestDuckDBConnectionManager(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_duckdb_shared.db'
+
+    def tearDown(self):
+        for path in (self.db_path, f'{self.db_path}.wal'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_handlers_share_one_connection(self):
+        with DuckDBHandler(self.db_path, s3_bucket='unused') as first:
+            connection = get_connection(self.db_path)
+            with DuckDBHandler(self.db_path) as second:
+                first.conn.execute("CREATE TABLE shared (id INTEGER)")
+                first.conn.execute("INSERT INTO shared VALUES (1)")
+                self.assertEqual(second.query("SELECT count(*) AS n FROM shared")['n'].iloc[0], 1)
+                # Each handler has its own cursor, closed along with it
+                self.assertIsNot(first.conn, second.conn)
+            # Still open while the first handler is
+            self.assertIs(get_connection(self.db_path), connection)
+            self.assertEqual(first.query("SELECT count(*) AS n FROM shared")['n'].iloc[0], 1)
+        self.assertIsNot(get_connection(self.db_path), connection)
+        DuckDBHandler(self.db_path).close()
+
+    def test_stream_query(self):
+        with DuckDBHandler(self.db_path) as duckdb_handler:
+            query = "SELECT range AS id FROM range(25)"
+            batches = list(duckdb_handler.stream_query(query, batch_size=10))
+            chunks = list(duckdb_handler.stream_query(query + " WHERE range >= ?", [20], batch_size=10, as_pandas=True))
+
+        self.assertEqual(sum(batch.num_rows for batch in batches), 25)
+        self.assertTrue(all(batch.num_rows <= 10 for batch in batches))
+        self.assertEqual(pd.concat(chunks)['id'].tolist(), [20, 21, 22, 23, 24])
+        self.assertEqual(duckdb_handler.stream_stats['rows'], 5)
+
+    def test_export_query(self):
+        with tempfile.TemporaryDirectory() as temp_dir, DuckDBHandler(self.db_path) as duckdb_handler:
+            parquet_path = os.path.join(temp_dir, 'export.parquet')
+            csv_path = os.path.join(temp_dir, 'export.csv')
+            stats = duckdb_handler.export_query("SELECT range AS id, 'x' AS name FROM range(25)", parquet_path, batch_size=10)
+            duckdb_handler.export_query("SELECT range AS id FROM range(3)", csv_path, file_format='csv')
+            empty_stats = duckdb_handler.export_query("SELECT range AS id FROM range(0)", os.path.join(temp_dir, 'empty.parquet'))
+
+            self.assertEqual(stats['rows'], 25)
+            self.assertGreater(stats['file_bytes'], 0)
+            self.assertEqual(pq.read_table(parquet_path).column('id').to_pylist(), list(range(25)))
+            with open(csv_path) as file:
+                self.assertEqual(file.read().split(), ['"id"', '0', '1', '2'])
+            self.assertEqual(empty_stats['rows'], 0)
+            self.assertEqual(pq.read_table(os.path.join(temp_dir, 'empty.parquet')).column_names, ['id'])
+
+    @mock_aws
+    def test_query_parquet_lake(self):
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='test-parquet-lake')
+        with DuckDBHandler(self.db_path, 'test-parquet-lake') as duckdb_handler:
+            duckdb_handler.s3_handler.write_parquet_dataset(
+                pa.table({'date': ['2024-09-01', '2024-09-02'], 'odds': [100, 110]}), 'offers', ['date'], '20240902120000'
+            )
+            duckdb_handler.execute("CREATE TABLE lake_offers (date DATE, odds INTEGER)")
+            duckdb_handler.query_parquet_lake("INSERT INTO lake_offers BY NAME SELECT * FROM lake", 'offers', {'date': ['2024-09-02']})
+            result = duckdb_handler.query("SELECT * FROM lake_offers")
+            empty = duckdb_handler.query_parquet_lake("SELECT * FROM lake", 'offers', {'date': ['2024-09-03']})
+
+        self.assertEqual(result['odds'].tolist(), [110])
+        self.assertEqual(str(result['date'].iloc[0].date()), '2024-09-02')
+        self.assertTrue(empty.empty)
+
+    @mock_aws
+    def test_backup_and_restore(self):
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='test-duckdb-backups')
+        with DuckDBHandler(self.db_path, 'test-duckdb-backups') as duckdb_handler:
+            duckdb_handler.execute("CREATE TABLE backed_up AS SELECT range AS id FROM range(1000)")
+            stats = duckdb_handler.backup_to_s3('backups/test.duckdb')
+            duckdb_handler.execute("DELETE FROM backed_up WHERE id >= 10")
+
+            duckdb_handler.restore_from_s3('backups/test.duckdb')
+            count = duckdb_handler.query("SELECT count(*) AS n FROM backed_up")['n'].iloc[0]
+
+        self.assertEqual(count, 1000)
+        self.assertGreater(stats['bytes'], 0)
+        self.assertFalse(os.path.exists(f'{self.db_path}.restore'))
+
+    @mock_aws
+    def test_incremental_backup_and_restore(self):
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='test-duckdb-incremental')
+        with DuckDBHandler(self.db_path, 'test-duckdb-incremental') as duckdb_handler:
+            duckdb_handler.execute("CREATE TABLE backed_up AS SELECT range AS id FROM range(100000)")
+            first = duckdb_handler.backup_to_s3_incremental('backups', '20240901121700')
+            # Nothing changed, so nothing new is stored
+            second = duckdb_handler.backup_to_s3_incremental('backups', '20240901131700')
+            duckdb_handler.execute("DELETE FROM backed_up WHERE id >= 10")
+
+            duckdb_handler.restore_from_s3_incremental('backups', '20240901121700')
+            count = duckdb_handler.query("SELECT count(*) AS n FROM backed_up")['n'].iloc[0]
+
+        self.assertEqual(count, 100000)
+        self.assertGreater(first['uploaded_chunks'], 0)
+        self.assertEqual(second['uploaded_chunks'], 0)
+        chunks = s3.list_objects_v2(Bucket='test-duckdb-incremental', Prefix='backups/chunks/')['KeyCount']
+        self.assertEqual(chunks, first['uploaded_chunks'])
+
+    def test_threads_get_their_own_cursor(self):
+        with DuckDBHandler(self.db_path) as duckdb_handler:
+            cursors = []
+            thread = threading.Thread(target=lambda: cursors.append(duckdb_handler.conn))
+            thread.start()
+            thread.join()
+            self.assertIsNot(cursors[0], duckdb_handler.conn)
+            self.assertIs(duckdb_handler.get_cursor(), duckdb_handler.conn)
+
+    def test_close_closes_the_handlers_cursors(self):
+        with DuckDBHandler(self.db_path) as other:
+            with DuckDBHandler(self.db_path) as duckdb_handler:
+                with ThreadPoolExecutor(max_workers=2) as pool:
+                    cursors = list(pool.map(lambda _: duckdb_handler.get_cursor(), range(4)))
+            # Every cursor the pool threads opened is closed with their handler
+            for cursor in cursors:
+                with self.assertRaises(duckdb.ConnectionException):
+                    cursor.execute("SELECT 1")
+            self.assertEqual(other.conn.execute("SELECT 1").fetchone()[0], 1)
+
+    def test_closed_handler_raises(self):
+        duckdb_handler = DuckDBHandler(self.db_path)
+        duckdb_handler.close()
+        with self.assertRaises(ValueError):
+            duckdb_handler.conn
+
+class TestDuckDBMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_duckdb_migrations.db'
+        self.duckdb_handler = DuckDBHandler(self.db_path)
+
+    def tearDown(self):
+        self.duckdb_handler.close()
+        for path in (self.db_path, f'{self.db_path}.wal'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def insert_offer(self, participant_name, outcome_label, odds, timestamp, run_id=None):
+        self.duckdb_handler.execute(
+            "INSERT INTO fact_dk_offers (subcategory_subcategoryId, subcategory_name, offer_label, outcome_label, "
+            "outcome_oddsAmerican, outcome_line, participant_name, timestamp" + (", run_id" if run_id else "") + ") "
+            "VALUES ('1', 'Receptions', 'Receptions', ?, ?, 4.5, ?, ?" + (", ?" if run_id else "") + ")",
+            [outcome_label, odds, participant_name, timestamp] + ([run_id] if run_id else [])
+        )
+
+    def test_apply_migrations_backfills_runs(self):
+        self.duckdb_handler.execute(open('data/duckdb/ddl.sql').read().replace('fact_dk_props', 'fact_dk_offers'))
+        self.insert_offer('Bob', 'Over', '+100', '2024-09-01 10:17:00')
+        self.insert_offer('Bob', 'Over', '+110', '2024-09-01 11:17:00')
+        self.insert_offer('Bob', 'Under', '-130', '2024-09-01 11:21:00')
+
+        self.assertIn('0001_ingest_runs', self.duckdb_handler.apply_migrations())
+        self.assertEqual(self.duckdb_handler.apply_migrations(), [])
+        runs = self.duckdb_handler.query("SELECT run_id, rows_loaded FROM ingest_runs ORDER BY run_id")
+        self.assertEqual(runs['rows_loaded'].tolist(), [1, 2])
+        latest = self.duckdb_handler.query("SELECT run_id FROM latest_ingest_run")['run_id'].iloc[0]
+        self.assertEqual(latest, 2)
+
+        offers = self.duckdb_handler.query("SELECT outcome_oddsAmerican FROM fact_dk_offers WHERE run_id = 2 ORDER BY timestamp")
+        self.assertEqual(offers['outcome_oddsAmerican'].tolist(), [110, -130])
+
+    def test_select_raw_props_reads_one_run(self):
+        self.duckdb_handler.apply_migrations()
+        self.duckdb_handler.execute("INSERT INTO ingest_runs (started_at, status) VALUES ('2024-09-01 10:17:00', 'completed'), ('2024-09-01 11:17:00', 'completed')")
+        offers = lambda over, under: pa.table({
+            'subcategory_subcategoryId': ['1', '1'], 'subcategory_name': ['Receptions'] * 2, 'offer_label': ['Receptions'] * 2,
+            'outcome_label': ['Over', 'Under'], 'outcome_oddsAmerican': [over, under], 'outcome_line': [4.5, 4.5],
+            'participant_name': ['Bob', 'Bob']
+        })
+        merge = lambda table, valid_from, run_id: self.duckdb_handler.merge_history(
+            'fact_dk_odds_history', table, ['subcategory_subcategoryId', 'offer_providerOfferId', 'outcome_label', 'participant_id'],
+            ['outcome_oddsAmerican', 'outcome_oddsDecimal', 'outcome_line'], pd.Timestamp(valid_from), 'subcategory_subcategoryId', ['1'], run_id
+        )
+        merge(offers('+100', '-120'), '2024-09-01 10:17:00', 1)
+        # Only the Under moved in the second run
+        self.assertEqual(merge(offers('+100', '-130'), '2024-09-01 11:17:00', 2)['inserted'], 1)
+
+        with open('transformations/sql/select_raw_props.sql') as file:
+            query = file.read()
+        for run_id, expected in [(1, [[100, -120]]), (2, [[100, -130]]), (None, [[100, -130]])]:
+            self.assertEqual(create_run_odds_view(self.duckdb_handler.conn, run_id), run_id or 2)
+            props = self.duckdb_handler.conn.execute(query).fetchdf()
+            self.assertEqual(props[['over_odds', 'under_odds']].values.tolist(), expected)
+        # timestamp is the run's, even where the Over price dates from the first run
+        self.assertEqual(props['timestamp'].tolist(), [pd.Timestamp('2024-09-01 11:17:00')])
+        self.assertEqual(props['valid_from'].tolist(), [pd.Timestamp('2024-09-01 10:17:00')])
+        # The latest run reads only the open intervals
+        run_odds_sql = lambda: self.duckdb_handler.conn.execute("SELECT sql FROM duckdb_views() WHERE view_name = 'run_odds'").fetchone()[0]
+        self.assertIn('current_dk_odds', run_odds_sql())
+
+        # While a newer run is in progress, current prices may already be its own
+        self.duckdb_handler.execute("INSERT INTO ingest_runs (started_at, status) VALUES ('2024-09-01 12:17:00', 'running')")
+        merge(offers('+105', '-130'), '2024-09-01 12:17:00', 3)
+        create_run_odds_view(self.duckdb_handler.conn)
+        self.assertIn('dk_odds_as_of_run', run_odds_sql())
+        props = self.duckdb_handler.conn.execute(query).fetchdf()
+        self.assertEqual(props[['over_odds', 'under_odds']].values.tolist(), [[100, -130]])
+
+    def test_missing_subcategory_is_closed(self):
+        self.duckdb_handler.apply_migrations()
+        self.duckdb_handler.execute("INSERT INTO ingest_runs (started_at, status) VALUES ('2024-09-01 10:17:00', 'completed'), ('2024-09-01 11:17:00', 'completed')")
+        offers = lambda subcategory_ids: pa.table({
+            'subcategory_subcategoryId': subcategory_ids, 'outcome_label': ['Over'] * len(subcategory_ids),
+            'outcome_oddsAmerican': ['+100'] * len(subcategory_ids), 'participant_name': ['Bob'] * len(subcategory_ids)
+        })
+        merge = lambda table, valid_from, run_id, unchanged: self.duckdb_handler.merge_history(
+            'fact_dk_odds_history', table, ['subcategory_subcategoryId', 'offer_providerOfferId', 'outcome_label', 'participant_id'],
+            ['outcome_oddsAmerican', 'outcome_oddsDecimal', 'outcome_line'], pd.Timestamp(valid_from), 'subcategory_subcategoryId',
+            run_id=run_id, skip_scope_values=unchanged
+        )
+        merge(offers(['1', '2', '3']), '2024-09-01 10:17:00', 1, [])
+        # 2 is gone from the second run and 3 is unchanged
+        self.assertEqual(merge(offers(['1']), '2024-09-01 11:17:00', 2, ['3']), {'inserted': 0, 'closed': 1, 'unchanged': 1})
+
+        current = self.duckdb_handler.query("SELECT subcategory_subcategoryId FROM current_dk_odds ORDER BY 1")
+        self.assertEqual(current['subcategory_subcategoryId'].tolist(), [1, 3])
+        closed = self.duckdb_handler.query("SELECT subcategory_subcategoryId, closed_run_id FROM fact_dk_odds_history WHERE valid_to IS NOT NULL")
+        self.assertEqual(closed.values.tolist(), [[2, 2]])
+
+    def test_odds_history_backfill(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shutil.copy('data/duckdb/migrations/0001_ingest_runs.sql', temp_dir)
+            self.duckdb_handler.apply_migrations(temp_dir)
+        self.duckdb_handler.execute(
+            "INSERT INTO ingest_runs (started_at, status) VALUES "
+            "('2024-09-01 10:17:00', 'completed'), ('2024-09-01 11:17:00', 'completed'), ('2024-09-01 12:17:00', 'completed')"
+        )
+        self.insert_offer('Bob', 'Over', '+100', '2024-09-01 10:17:00', run_id=1)
+        self.insert_offer('Bob', 'Under', '-120', '2024-09-01 10:17:00', run_id=1)
+        self.insert_offer('Bob', 'Over', '+100', '2024-09-01 11:17:00', run_id=2)
+        self.insert_offer('Bob', 'Under', '-130', '2024-09-01 11:17:00', run_id=2)
+        self.insert_offer('Bob', 'Over', '+110', '2024-09-01 12:17:00', run_id=3)
+        # A price seen in every run is still current
+        for run_id in (1, 2, 3):
+            self.insert_offer('Bob', 'Yes', '-200', f'2024-09-01 1{run_id - 1}:17:00', run_id=run_id)
+
+        self.assertEqual(self.duckdb_handler.apply_migrations(), ['0002_odds_history', '0003_typed_odds'])
+        history = self.duckdb_handler.query(
+            "SELECT outcome_label, outcome_oddsAmerican, run_id, closed_run_id FROM fact_dk_odds_history ORDER BY outcome_label, run_id"
+        )
+        self.assertEqual(history['outcome_oddsAmerican'].tolist(), [100, 110, -120, -130, -200])
+        self.assertEqual(history['closed_run_id'].fillna(0).tolist(), [3, 0, 2, 3, 0])
+        self.assertEqual(history['run_id'].tolist(), [1, 3, 1, 2, 1])
+
+        snapshot = lambda query: sorted(self.duckdb_handler.query(query)['outcome_oddsAmerican'].tolist())
+        self.assertEqual(snapshot("SELECT * FROM current_dk_odds"), [-200, 110])
+        self.assertEqual(snapshot("SELECT * FROM dk_odds_as_of(TIMESTAMP '2024-09-01 11:30:00')"), [-200, -130, 100])
+        self.assertEqual(snapshot("SELECT * FROM dk_odds_as_of_run(1)"), [-200, -120, 100])
+        self.assertEqual(snapshot("SELECT * FROM dk_odds_as_of_run(3)"), [-200, 110])
+
+    def test_typed_odds_migration(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for file_name in ('0001_ingest_runs.sql', '0002_odds_history.sql'):
+                shutil.copy(f'data/duckdb/migrations/{file_name}', temp_dir)
+            self.duckdb_handler.apply_migrations(temp_dir)
+        # '+110' and '110' were stored as different strings, splitting one price in two
+        self.duckdb_handler.execute(
+            "INSERT INTO fact_dk_odds_history (subcategory_subcategoryId, outcome_label, outcome_oddsAmerican, participant_id, valid_from, valid_to, run_id, closed_run_id) VALUES "
+            "('1', 'Over', '+110', '7', '2024-09-01 10:17:00', '2024-09-01 11:17:00', 1, 2), "
+            "('1', 'Over', '110', '7', '2024-09-01 11:17:00', NULL, 2, NULL), "
+            "('1', 'Under', '−130', '7', '2024-09-01 10:17:00', NULL, 1, NULL)"
+        )
+        self.duckdb_handler.execute("CREATE TABLE dim_participant (participant_id VARCHAR PRIMARY KEY, participant_name VARCHAR, participant_type VARCHAR)")
+        self.duckdb_handler.execute("INSERT INTO dim_participant VALUES ('7', 'Bob', 'Player'), ('007', 'Bob', 'Player'), ('abc', 'Al', 'Player')")
+
+        self.assertEqual(self.duckdb_handler.apply_migrations(), ['0003_typed_odds'])
+        history = self.duckdb_handler.query(
+            "SELECT outcome_label, outcome_oddsAmerican, participant_id, valid_to, run_id FROM fact_dk_odds_history ORDER BY outcome_label"
+        )
+        self.assertEqual(history['outcome_oddsAmerican'].tolist(), [110, -130])
+        self.assertEqual(history['participant_id'].tolist(), [7, 7])
+        self.assertTrue(history['valid_to'].isna().all())
+        self.assertEqual(history['run_id'].tolist(), [1, 1])
+        types = dict(self.duckdb_handler.conn.execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'fact_dk_offers'"
+        ).fetchall())
+        self.assertEqual(types['outcome_oddsAmerican'], 'INTEGER')
+        self.assertEqual(types['subcategory_subcategoryId'], 'BIGINT')
+
+        # The dimension's key has the facts' type, so they join without a cast
+        joined = self.duckdb_handler.query(
+            "SELECT DISTINCT d.participant_id, d.participant_name FROM fact_dk_odds_history h JOIN dim_participant d USING (participant_id)"
+        )
+        self.assertEqual(joined.values.tolist(), [[7, 'Bob']])
+        constraints = self.duckdb_handler.query(
+            "SELECT constraint_type, constraint_column_names FROM duckdb_constraints() WHERE table_name = 'dim_participant' AND constraint_type = 'PRIMARY KEY'"
+        )
+        self.assertEqual(constraints['constraint_column_names'].tolist(), [['participant_id']])
+
+    def test_failed_migration_rolls_back(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, '0001_good.sql'), 'w') as file:
+                file.write("CREATE TABLE good (id INTEGER);")
+            with open(os.path.join(temp_dir, '0002_bad.sql'), 'w') as file:
+                file.write("CREATE TABLE bad (id INTEGER); SELECT * FROM missing_table;")
+
+            with self.assertRaises(Exception):
+                self.duckdb_handler.apply_migrations(temp_dir)
+        versions = self.duckdb_handler.query("SELECT version FROM schema_migrations")['version'].tolist()
+        tables = self.duckdb_handler.query("SELECT table_name FROM duckdb_tables()")['table_name'].tolist()
+        self.assertEqual(versions, ['0001_good'])
+        self.assertNotIn('bad', tables)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import threading
+import orjson
+from handlers.parse_pool import ParsePool
+from utils.columnar_utils import parse_dk_offers_columnar
+
+def make_payload(subcategory_id: int) -> bytes:
+    return orjson.dumps({'eventGroup': {'offerCategories': [{'offerSubcategoryDescriptors': [
+        {'subcategoryId': subcategory_id, 'name': 'Receptions', 'offerSubcategory': {'offers': [[
+            {'label': 'Receptions', 'outcomes': [
+                {'label': 'Over', 'oddsAmerican': '+100', 'participants': [{'id': 1, 'name': 'Bob', 'type': 'Player'}]}
+            ]}
+        ]]}}
+    ]}]}})
+
+class TestParsePool(unittest.TestCase):
+
+    def test_parses_in_worker_processes(self):
+        with ParsePool(parse_dk_offers_columnar, max_workers=2) as parse_pool:
+            for subcategory_id in range(5):
+                parse_pool.submit(subcategory_id, make_payload(subcategory_id), '20240101120000')
+            results = list(parse_pool.ready()) + list(parse_pool.drain())
+
+        self.assertEqual(sorted(key for key, _, _ in results), list(range(5)))
+        for key, batch, error in results:
+            self.assertIsNone(error)
+            self.assertEqual(batch['num_rows'], 1)
+            self.assertEqual(list(batch['columns']['subcategory_subcategoryId']), [key])
+
+    def test_errors_are_returned_not_raised(self):
+        with ParsePool(parse_dk_offers_columnar, max_workers=1) as parse_pool:
+            parse_pool.submit('bad', b'not json', '20240101120000')
+            [(key, batch, error)] = list(parse_pool.drain())
+
+        self.assertEqual(key, 'bad')
+        self.assertIsNone(batch)
+        self.assertIsInstance(error, ValueError)
+
+    def test_submit_blocks_when_full(self):
+        with ParsePool(parse_dk_offers_columnar, max_workers=1, max_pending=1) as parse_pool:
+            parse_pool.slots.acquire() # Occupy the only slot
+            submitted = threading.Event()
+            thread = threading.Thread(target=lambda: (parse_pool.submit(0, make_payload(0), '20240101120000'), submitted.set()))
+            thread.start()
+
+            self.assertFalse(submitted.wait(0.2))
+            parse_pool.slots.release()
+            self.assertTrue(submitted.wait(5))
+            thread.join()
+            self.assertEqual(len(list(parse_pool.drain())), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import httpx
+from handlers.proxy_pool import ProxyPool
+from handlers.async_request_handler import AsyncRequestHandler
+from handlers.request_handler import RequestHandler
+
+class TestProxyPool(unittest.TestCase):
+
+    def setUp(self):
+        self.proxies = ['http://p1:8080', 'http://p2:8080', 'http://p3:8080']
+
+    def test_keeps_proxy_for_max_requests(self):
+        proxy_pool = ProxyPool(self.proxies, max_requests_per_proxy=3)
+
+        chosen = [proxy_pool.choose() for _ in range(3)]
+
+        self.assertEqual(len(set(chosen)), 1)
+
+    def test_weights_favour_fast_healthy_proxies(self):
+        proxy_pool = ProxyPool(self.proxies, max_requests_per_proxy=1)
+        for _ in range(5):
+            proxy_pool.record_success('http://p1:8080', 0.1)
+            proxy_pool.record_success('http://p2:8080', 2.0)
+        proxy_pool.record_success('http://p3:8080', 0.1)
+        proxy_pool.record_failure('http://p3:8080')
+
+        weights = {proxy: proxy_pool.weight(proxy) for proxy in self.proxies}
+
+        self.assertGreater(weights['http://p1:8080'], weights['http://p2:8080'])
+        self.assertGreater(weights['http://p1:8080'], weights['http://p3:8080'])
+
+    def test_failures_cool_down_then_eject(self):
+        proxy_pool = ProxyPool(self.proxies, cooldown_after_failures=2, eject_after_failures=3)
+
+        proxy_pool.record_failure('http://p1:8080')
+        proxy_pool.record_failure('http://p1:8080')
+        self.assertGreater(proxy_pool.stats['http://p1:8080']['cooldown_until'], 0)
+        self.assertFalse(proxy_pool.stats['http://p1:8080']['ejected'])
+
+        proxy_pool.record_failure('http://p1:8080')
+        self.assertTrue(proxy_pool.stats['http://p1:8080']['ejected'])
+        self.assertNotIn('http://p1:8080', {proxy_pool.choose() for _ in range(30)})
+
+    def test_blocked_responses_count_as_failures(self):
+        proxy_pool = ProxyPool(self.proxies)
+
+        proxy_pool.record_response('http://p1:8080', 403, 0.5)
+        proxy_pool.record_response('http://p2:8080', 404, 0.5)
+
+        self.assertEqual(proxy_pool.stats['http://p1:8080']['errors'], 1)
+        self.assertEqual(proxy_pool.stats['http://p2:8080']['errors'], 0)
+        self.assertEqual(proxy_pool.stats['http://p2:8080']['latency'], 0.5)
+
+    def test_all_ejected(self):
+        proxy_pool = ProxyPool(self.proxies[:1], eject_after_failures=1)
+        proxy_pool.record_failure('http://p1:8080')
+
+        self.assertIsNone(proxy_pool.choose())
+
+    def test_async_request_handler_records_proxy_health(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+        request_handler = AsyncRequestHandler(3, proxies=self.proxies, transport=transport)
+
+        request_handler.fetch_all([(n, f'https://example.com/{n}') for n in range(4)])
+
+        requests_sent = sum(stats['requests'] for stats in request_handler.proxy_pool.stats.values())
+        self.assertEqual(requests_sent, 4)
+
+    def test_handlers_close_proxy_sessions(self):
+        for request_handler in (RequestHandler(0, 0, 3, proxies=self.proxies), AsyncRequestHandler(3, proxies=self.proxies)):
+            session = request_handler.proxy_pool.session('http://p1:8080')
+            closed = []
+            session.close = lambda: closed.append(True)
+
+            request_handler.close()
+
+            self.assertEqual(closed, [True])
+            self.assertEqual(request_handler.proxy_pool.sessions, {})
+
+if __name__ == '__main__':
+    unittest.main()
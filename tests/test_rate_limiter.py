@@ -0,0 +1,50 @@
+import unittest
+import time
+from handlers.rate_limiter import TokenBucket, RateLimiter, get_rate_limiter
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_bucket_paces_requests(self):
+        bucket = TokenBucket(requests_per_minute=60, burst=1)
+
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 1.0, places=1)
+        self.assertAlmostEqual(bucket.reserve(), 2.0, places=1)
+
+    def test_elapsed_time_counts_toward_budget(self):
+        bucket = TokenBucket(requests_per_minute=600, burst=1)
+        bucket.reserve()
+
+        time.sleep(0.06)  # e.g. time spent on the network
+
+        self.assertAlmostEqual(bucket.reserve(), 0.04, delta=0.02)
+
+    def test_disabled_bucket_never_waits(self):
+        bucket = TokenBucket(requests_per_minute=None)
+
+        self.assertEqual([bucket.reserve() for _ in range(5)], [0.0] * 5)
+
+    def test_hosts_and_proxies_have_separate_buckets(self):
+        rate_limiter = RateLimiter(requests_per_minute=60, proxy_requests_per_minute=6)
+
+        self.assertEqual(rate_limiter.reserve('https://a.com/x'), 0.0)
+        self.assertEqual(rate_limiter.reserve('https://b.com/x'), 0.0)
+        self.assertGreater(rate_limiter.reserve('https://a.com/y'), 0.5)
+        self.assertEqual(rate_limiter.reserve('https://c.com/x', proxy='http://p1'), 0.0)
+        self.assertAlmostEqual(rate_limiter.reserve('https://d.com/x', proxy='http://p1'), 10.0, places=1)
+
+    def test_from_sleep_range(self):
+        rate_limiter = RateLimiter.from_sleep_range(3, 10)
+
+        self.assertEqual(rate_limiter.requests_per_minute, 20)
+        self.assertEqual(rate_limiter.jitter_secs, 7)
+
+    def test_shared_limiter_is_reused(self):
+        first = get_rate_limiter('test', requests_per_minute=30)
+        second = get_rate_limiter('test', requests_per_minute=90)
+
+        self.assertIs(first, second)
+        self.assertEqual(second.requests_per_minute, 30)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import boto3
+from moto import mock_aws
+from handlers.s3_handler import S3Handler
+from handlers.raw_archive import RawArchiveWriter, RawArchiveReader, RawHashIndex, MIN_PART_SIZE
+
+class TestRawArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_aws = mock_aws()
+        self.mock_aws.start()
+        self.bucket_name = 'raw-archive-bucket'
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket=self.bucket_name)
+        self.s3_handler = S3Handler(bucket_name=self.bucket_name)
+        self.archive_key = 'raw/20240901121700.ndjson.gz'
+
+    def tearDown(self):
+        self.mock_aws.stop()
+
+    def test_round_trip(self):
+        payloads = {'Receptions': b'{"eventGroup": {"name": "NFL"}}', 'TD Scorer': b'{"eventGroup": {}}'}
+        with RawArchiveWriter(self.s3_handler, self.archive_key) as archive:
+            for name, payload in payloads.items():
+                archive.add(name, payload, '20240901121700')
+
+        # One archive and one index, however many payloads
+        keys = [item['Key'] for item in self.s3.list_objects_v2(Bucket=self.bucket_name)['Contents']]
+        self.assertEqual(sorted(keys), [self.archive_key, f'{self.archive_key}.index.json'])
+        body = self.s3.get_object(Bucket=self.bucket_name, Key=self.archive_key)['Body'].read()
+        self.assertEqual(gzip.decompress(body).splitlines(), list(payloads.values()))
+
+        reader = RawArchiveReader(self.s3_handler, self.archive_key)
+        for name, payload in payloads.items():
+            self.assertEqual(reader.get(name), payload)
+        with self.assertRaises(KeyError):
+            reader.get('Missing')
+
+    def test_uploads_parts_as_data_builds_up(self):
+        # Random bytes do not compress, so two payloads fill a part
+        payloads = [os.urandom(MIN_PART_SIZE // 2) for _ in range(3)]
+        with RawArchiveWriter(self.s3_handler, self.archive_key, part_size=MIN_PART_SIZE) as archive:
+            for i, payload in enumerate(payloads):
+                archive.add(f'payload_{i}', payload, '20240901121700')
+            self.assertEqual(len(archive.parts), 1)
+        self.assertEqual(len(archive.parts), 2)
+
+        reader = RawArchiveReader(self.s3_handler, self.archive_key)
+        self.assertEqual(reader.get('payload_2'), payloads[2])
+        index = json.loads(self.s3.get_object(Bucket=self.bucket_name, Key=f'{self.archive_key}.index.json')['Body'].read())
+        self.assertEqual([entry['size'] for entry in index['entries']], [len(payload) for payload in payloads])
+
+    def test_background_part_uploads(self):
+        payloads = [os.urandom(MIN_PART_SIZE // 2) for _ in range(3)]
+        with self.s3_handler.background_uploader() as uploader:
+            with RawArchiveWriter(self.s3_handler, self.archive_key, part_size=MIN_PART_SIZE, uploader=uploader) as archive:
+                for i, payload in enumerate(payloads):
+                    archive.add(f'payload_{i}', payload, '20240901121700')
+            uploader.flush()
+
+        reader = RawArchiveReader(self.s3_handler, self.archive_key)
+        self.assertEqual([reader.get(f'payload_{i}') for i in range(3)], payloads)
+
+    def test_empty_archive_writes_nothing(self):
+        RawArchiveWriter(self.s3_handler, self.archive_key).close()
+        self.assertNotIn('Contents', self.s3.list_objects_v2(Bucket=self.bucket_name))
+
+    def test_duplicate_payloads_stored_once(self):
+        with RawArchiveWriter(self.s3_handler, self.archive_key) as archive:
+            archive.add('Receptions', b'{"same": true}', '20240901121700')
+            archive.add('Receiving Yards', b'{"same": true}', '20240901121701')
+            archive.add('TD Scorer', b'{"other": true}', '20240901121702')
+
+        body = self.s3.get_object(Bucket=self.bucket_name, Key=self.archive_key)['Body'].read()
+        self.assertEqual(gzip.decompress(body).splitlines(), [b'{"same": true}', b'{"other": true}'])
+        reader = RawArchiveReader(self.s3_handler, self.archive_key)
+        self.assertEqual(reader.get('Receiving Yards'), b'{"same": true}')
+        self.assertEqual(reader.by_name['Receptions']['offset'], reader.by_name['Receiving Yards']['offset'])
+
+    def test_hash_index_dedups_across_runs(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            index_path = os.path.join(temp_dir, 'raw_hashes.json')
+            first_key = 'raw/20240901121700.ndjson.gz'
+            second_key = 'raw/20240901131700.ndjson.gz'
+            third_key = 'raw/20240901141700.ndjson.gz'
+
+            hash_index = RawHashIndex(index_path)
+            with RawArchiveWriter(self.s3_handler, first_key, hash_index=hash_index) as archive:
+                archive.add('Receptions', b'{"unchanged": true}', '20240901121700')
+                archive.add('TD Scorer', b'{"version": 1}', '20240901121700')
+            hash_index.save()
+
+            # Only the changed payload is stored again, with no HEAD requests
+            hash_index = RawHashIndex(index_path)
+            with RawArchiveWriter(self.s3_handler, second_key, hash_index=hash_index) as archive:
+                archive.add('Receptions', b'{"unchanged": true}', '20240901131700')
+                archive.add('TD Scorer', b'{"version": 2}', '20240901131700')
+            hash_index.save()
+            body = self.s3.get_object(Bucket=self.bucket_name, Key=second_key)['Body'].read()
+            self.assertEqual(gzip.decompress(body).splitlines(), [b'{"version": 2}'])
+
+            # Replay of each run is exact, wherever its payloads are stored
+            first = RawArchiveReader(self.s3_handler, first_key)
+            second = RawArchiveReader(self.s3_handler, second_key)
+            self.assertEqual(first.get('TD Scorer'), b'{"version": 1}')
+            self.assertEqual(second.get('TD Scorer'), b'{"version": 2}')
+            self.assertEqual(second.get('Receptions'), b'{"unchanged": true}')
+            self.assertEqual(second.by_name['Receptions']['archive_key'], first_key)
+
+            # A run with nothing new writes only its manifest
+            hash_index = RawHashIndex(index_path)
+            with RawArchiveWriter(self.s3_handler, third_key, hash_index=hash_index) as archive:
+                archive.add('Receptions', b'{"unchanged": true}', '20240901141700')
+            keys = [item['Key'] for item in self.s3.list_objects_v2(Bucket=self.bucket_name, Prefix=third_key)['Contents']]
+            self.assertEqual(keys, [f'{third_key}.index.json'])
+            self.assertEqual(RawArchiveReader(self.s3_handler, third_key).get('Receptions'), b'{"unchanged": true}')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_unsaved_hash_index_stores_payloads_again(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            index_path = os.path.join(temp_dir, 'raw_hashes.json')
+            with RawArchiveWriter(self.s3_handler, self.archive_key, hash_index=RawHashIndex(index_path)) as archive:
+                archive.add('Receptions', b'{"a": 1}', '20240901121700')
+            # Not saved, e.g. because the run's uploads failed
+            self.assertIsNone(RawHashIndex(index_path).get(archive.entries[0]['hash']))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_reader_rejects_corrupt_payload(self):
+        with RawArchiveWriter(self.s3_handler, self.archive_key) as archive:
+            archive.add('Receptions', b'{"a": 1}', '20240901121700')
+        index_key = f'{self.archive_key}.index.json'
+        index = json.loads(self.s3.get_object(Bucket=self.bucket_name, Key=index_key)['Body'].read())
+        index['entries'][0]['hash'] = '0' * 32
+        self.s3.put_object(Bucket=self.bucket_name, Key=index_key, Body=json.dumps(index).encode('utf-8'))
+        with self.assertRaises(ValueError):
+            RawArchiveReader(self.s3_handler, self.archive_key).get('Receptions')
+
+    def test_rejects_small_parts(self):
+        with self.assertRaises(ValueError):
+            RawArchiveWriter(self.s3_handler, self.archive_key, part_size=1024)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import httpx
+from handlers.retry_policy import RetryPolicy
+from handlers.async_request_handler import AsyncRequestHandler
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_classifies_status_codes(self):
+        self.assertTrue(RetryPolicy.is_retryable_status(429))
+        self.assertTrue(RetryPolicy.is_retryable_status(503))
+        self.assertFalse(RetryPolicy.is_retryable_status(404))
+        self.assertFalse(RetryPolicy.is_retryable_status(403))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(RetryPolicy.parse_retry_after('7'), 7.0)
+        self.assertIsNone(RetryPolicy.parse_retry_after(None))
+        self.assertIsNone(RetryPolicy.parse_retry_after('soon'))
+        retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        self.assertAlmostEqual(RetryPolicy.parse_retry_after(retry_at), 30, delta=2)
+
+    def test_next_delay_honours_retry_after_and_attempt_limit(self):
+        retry_policy = RetryPolicy(retries_max=3, max_backoff_secs=60)
+
+        self.assertEqual(retry_policy.next_delay(0, '12'), 12)
+        self.assertIsNone(retry_policy.next_delay(0, '600'))
+        self.assertIsNone(retry_policy.next_delay(2))
+
+    def test_retry_budget_is_shared_across_requests(self):
+        retry_policy = RetryPolicy(retries_max=5, retry_budget_secs=10)
+
+        self.assertEqual(retry_policy.next_delay(0, '6'), 6)
+        self.assertIsNone(retry_policy.next_delay(0, '6'))
+        self.assertEqual(retry_policy.next_delay(0, '4'), 4)
+
+    def test_async_request_handler_recovers_from_throttling(self):
+        calls = {'throttled': 0}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == '/throttled' and calls['throttled'] == 0:
+                calls['throttled'] += 1
+                return httpx.Response(429, headers={'Retry-After': '0'})
+            if request.url.path == '/forbidden':
+                return httpx.Response(403)
+            return httpx.Response(200, json={})
+
+        retry_policy = RetryPolicy(retries_max=3)
+        request_handler = AsyncRequestHandler(3, retry_policy=retry_policy, transport=httpx.MockTransport(handler))
+
+        results = dict(request_handler.fetch_all([
+            ('throttled', 'https://example.com/throttled'),
+            ('forbidden', 'https://example.com/forbidden')
+        ]))
+
+        self.assertEqual(results['throttled'].status_code, 200)
+        self.assertIsNone(results['forbidden'])
+        self.assertEqual(retry_policy.report(), {'https://example.com/throttled': 2})
+
+if __name__ == '__main__':
+    unittest.main()
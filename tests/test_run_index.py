@@ -0,0 +1,150 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import boto3
+import pyarrow as pa
+from moto import mock_aws
+from handlers.s3_handler import S3Handler
+from handlers.run_index import RunIndex
+
+class TestRunIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_aws = mock_aws()
+        self.mock_aws.start()
+        self.bucket_name = 'run-index-bucket'
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket=self.bucket_name)
+        self.s3_handler = S3Handler(bucket_name=self.bucket_name)
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        self.mock_aws.stop()
+
+    def record_runs(self, run_index: RunIndex) -> None:
+        run_index.record_run(1, '20240901120000', [
+            {'key': 'raw/20240901120000.ndjson.gz', 'size': 10, 'hash': 'a', 'subcategory': 'Receptions'},
+            {'key': 'raw/20240901120000.ndjson.gz', 'size': 20, 'hash': 'b', 'subcategory': 'TD Scorer'}
+        ])
+        run_index.record_run(2, '20240902120000', [
+            {'key': 'raw/20240902120000.ndjson.gz', 'size': 30, 'hash': 'c', 'subcategory': 'TD Scorer'}
+        ])
+
+    def test_lookups(self):
+        run_index = self.s3_handler.run_index('raw', cache_dir=self.cache_dir)
+        self.assertIsNone(run_index.latest())
+        self.record_runs(run_index)
+
+        self.assertEqual(run_index.latest()['run_id'], 2)
+        latest_receptions = run_index.latest(subcategory='Receptions')
+        self.assertEqual(latest_receptions['run_id'], 1)
+        self.assertEqual([obj['hash'] for obj in latest_receptions['objects']], ['a'])
+        self.assertEqual([run['run_id'] for run in run_index.between('20240901000000', '20240901235959')], [1])
+        self.assertEqual([run['run_id'] for run in run_index.between(start='20240901120001')], [2])
+        self.assertEqual([run['run_id'] for run in run_index.between(subcategory='TD Scorer')], [1, 2])
+        self.assertEqual(run_index.between(subcategory='Missing'), [])
+
+        # Recording a run again replaces it
+        run_index.record_run(2, '20240902120000', [])
+        self.assertEqual(len(run_index.between()), 2)
+        self.assertEqual(run_index.latest()['objects'], [])
+
+    def test_runs_are_sharded_by_day(self):
+        run_index = self.s3_handler.run_index('raw', cache_dir=self.cache_dir)
+        self.record_runs(run_index)
+        run_index.record_run(3, '20240902130000', [{'key': 'raw/20240902130000.ndjson.gz', 'size': 1, 'hash': 'd'}])
+        keys = sorted(item['Key'] for item in self.s3.list_objects_v2(Bucket=self.bucket_name, Prefix='raw/')['Contents'])
+        self.assertEqual(keys, ['raw/_latest.json', 'raw/_runs/20240901.json', 'raw/_runs/20240902.json'])
+        self.assertEqual(run_index.shards(), ['20240901', '20240902'])
+
+        # An out-of-order run does not move the pointer
+        run_index.record_run(0, '20240831120000', [{'key': 'raw/20240831120000.ndjson.gz', 'size': 1, 'hash': 'e'}])
+        self.assertEqual(run_index.shards(), ['20240831', '20240901', '20240902'])
+
+        reader = self.s3_handler.run_index('raw', cache_dir=tempfile.mkdtemp(dir=self.cache_dir))
+        fetched = []
+        self.s3_handler.s3_client.meta.events.register(
+            'provide-client-params.s3.GetObject', lambda params, **kwargs: fetched.append(params['Key'].split('/', 1)[1])
+        )
+        # latest() reads only the pointer
+        self.assertEqual(reader.latest()['run_id'], 3)
+        self.assertEqual(fetched, ['_latest.json'])
+        # A time range reads only its days' shards
+        fetched.clear()
+        self.assertEqual([run['run_id'] for run in reader.between('20240902000000', '20240902125959')], [2])
+        self.assertEqual(fetched, ['_latest.json', '_runs/20240902.json'])
+        # A subcategory missing from the newest run is found further back
+        fetched.clear()
+        self.assertEqual(reader.latest(subcategory='Receptions')['run_id'], 1)
+        self.assertEqual(fetched, ['_latest.json', '_runs/20240902.json', '_runs/20240901.json'])
+
+    def test_run_survives_a_crash_before_its_shard_is_written(self):
+        run_index = self.s3_handler.run_index('raw', cache_dir=self.cache_dir)
+        self.record_runs(run_index)
+        put = run_index._put
+
+        def crash_on_shard(key, body):
+            if '/_runs/' in key:
+                raise RuntimeError('crashed')
+            put(key, body)
+
+        run_index._put = crash_on_shard
+        with self.assertRaises(RuntimeError):
+            run_index.record_run(3, '20240903120000', [{'key': 'raw/20240903120000.ndjson.gz', 'size': 1, 'hash': 'd'}])
+        run_index._put = put
+
+        # The pointer already lists the run, so readers still find it
+        reader = self.s3_handler.run_index('raw', cache_dir=tempfile.mkdtemp(dir=self.cache_dir))
+        self.assertEqual(reader.latest()['run_id'], 3)
+        self.assertEqual([run['run_id'] for run in reader.between(start='20240903000000')], [3])
+        self.assertEqual(reader.shards(), ['20240901', '20240902', '20240903'])
+
+        # The next run writes it to its shard
+        run_index.record_run(4, '20240904120000', [])
+        shard = json.loads(self.s3.get_object(Bucket=self.bucket_name, Key='raw/_runs/20240903.json')['Body'].read())
+        self.assertEqual([run['run_id'] for run in shard['runs']], [3])
+        self.assertEqual([run['run_id'] for run in reader.between()], [1, 2, 3, 4])
+
+    def test_unchanged_index_is_served_from_cache(self):
+        self.record_runs(self.s3_handler.run_index('raw', cache_dir=self.cache_dir))
+        # The pointer and two shards
+        self.assertEqual(len(os.listdir(self.cache_dir)), 3)
+
+        # A new instance starts from the cached copy; the conditional GET returns nothing
+        run_index = self.s3_handler.run_index('raw', cache_dir=self.cache_dir)
+        calls = []
+        self.s3_handler.s3_client.meta.events.register(
+            'after-call.s3.GetObject', lambda http_response, **kwargs: calls.append(http_response.status_code)
+        )
+        self.assertEqual(run_index.latest()['run_id'], 2)
+        self.assertEqual(calls, [304])
+
+        # Another writer's update is picked up
+        other = RunIndex(S3Handler(bucket_name=self.bucket_name), 'raw', cache_dir=tempfile.mkdtemp(dir=self.cache_dir))
+        other.record_run(3, '20240903120000', [{'key': 'raw/20240903120000.ndjson.gz', 'size': 1, 'hash': 'd'}])
+        self.assertEqual(run_index.latest()['run_id'], 3)
+        self.assertEqual(calls, [304, 200])
+
+    def test_parquet_dataset_manifest(self):
+        manifest = []
+        keys = self.s3_handler.write_parquet_dataset(
+            pa.table({'date': ['2024-09-01', '2024-09-02'], 'odds': [100, 110]}), 'lake', ['date'], '20240902120000', manifest=manifest
+        )
+        self.assertEqual([obj['key'] for obj in manifest], keys)
+        self.assertEqual([obj['date'] for obj in manifest], ['2024-09-01', '2024-09-02'])
+        for obj in manifest:
+            head = self.s3.head_object(Bucket=self.bucket_name, Key=obj['key'])
+            self.assertEqual(head['ContentLength'], obj['size'])
+            self.assertEqual(head['ETag'].strip('"'), obj['hash'])
+
+        run_index = self.s3_handler.run_index('lake', cache_dir=self.cache_dir)
+        run_index.record_run(None, '20240902120000', manifest)
+        self.assertEqual(len(run_index.latest(date='2024-09-02')['objects']), 1)
+        # The index is not mistaken for part of the dataset
+        self.assertEqual(len(self.s3_handler.list_parquet_dataset('lake')), 2)
+
+if __name__ == '__main__':
+    unittest.main()
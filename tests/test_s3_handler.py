@@ -1,6 +1,11 @@
 import unittest
 import boto3
+import io
 import os
+import json
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
 from moto import mock_aws
 from handlers.s3_handler import S3Handler
 
@@ -112,10 +117,143 @@ class TestS3Handler(unittest.TestCase):
         new_object_data = b'This is a modified test file.'
         self.assertTrue(self.s3_handler.has_file_changed(object_name, new_object_data))
 
+        # The object is not in S3 yet
+        self.assertTrue(self.s3_handler.has_file_changed('missing_file.txt', object_data))
+
         # Clean up
         if os.path.exists('test_file.txt'):
             os.remove('test_file.txt')
 
+    @mock_aws
+    def test_parquet_dataset_round_trip(self):
+        table = pa.table({
+            'sport': ['nfl'] * 4,
+            'date': ['2024-09-01', '2024-09-01', '2024-09-02', '2024-09-02'],
+            'subcategory_subcategoryId': [1, 2, 1, 1],
+            'outcome_label': ['Over', 'Under', 'Over', 'Under'],
+            'outcome_oddsAmerican': [100, -120, 110, -130]
+        })
+        keys = self.s3_handler.write_parquet_dataset(table, 'lake', ['sport', 'date', 'subcategory_subcategoryId'], '20240902120000')
+        self.assertEqual(len(keys), 3)
+        self.assertIn('lake/sport=nfl/date=2024-09-01/subcategory_subcategoryId=2/part_20240902120000.parquet', keys)
+
+        # Partitions outside the filter are not even listed
+        listed = self.s3_handler.list_parquet_dataset('lake', {'date': ['2024-09-02']})
+        self.assertEqual([partition['subcategory_subcategoryId'] for _, partition in listed], ['1'])
+
+        result = self.s3_handler.read_parquet_dataset(
+            'lake', {'date': ['2024-09-02']}, columns=['outcome_oddsAmerican'], filters=[('outcome_oddsAmerican', '>', 0)]
+        )
+        self.assertEqual(result.to_pylist(), [
+            {'outcome_oddsAmerican': 110, 'sport': 'nfl', 'date': '2024-09-02', 'subcategory_subcategoryId': '1'}
+        ])
+        self.assertEqual(self.s3_handler.read_parquet_dataset('lake').num_rows, 4)
+        self.assertIsNone(self.s3_handler.read_parquet_dataset('lake', {'sport': ['nba']}))
+
+    @mock_aws
+    def test_parquet_dataset_pruning(self):
+        table = pa.table({
+            'sport': ['nfl', 'nfl', 'nfl', 'nba'],
+            'date': ['2024-09-01', '2024-09-02', '2024-09-02', '2024-09-02'],
+            'odds': [100, 110, 120, 130]
+        })
+        self.s3_handler.write_parquet_dataset(table, 'lake', ['sport', 'date'], '20240902120000')
+        listed_prefixes = []
+        self.s3_handler.s3_client.meta.events.register(
+            'provide-client-params.s3.ListObjectsV2', lambda params, **kwargs: listed_prefixes.append(params['Prefix'])
+        )
+
+        # Leading partition filters become the listing prefix
+        filters = {'sport': ['nfl'], 'date': ['2024-09-02']}
+        listed = self.s3_handler.list_parquet_dataset('lake', filters, partition_cols=['sport', 'date'])
+        self.assertEqual(len(listed), 1)
+        self.assertEqual(listed_prefixes, ['lake/sport=nfl/date=2024-09-02/'])
+        # Without partition_cols each filtered level is found with a delimited listing
+        listed_prefixes.clear()
+        self.assertEqual(self.s3_handler.list_parquet_dataset('lake', filters), listed)
+        self.assertEqual(listed_prefixes, ['lake/', 'lake/sport=nfl/', 'lake/sport=nfl/date=2024-09-02/'])
+        # A filter on an inner level only narrows the listing down to that level
+        listed_prefixes.clear()
+        self.assertEqual(len(self.s3_handler.list_parquet_dataset('lake', {'date': ['2024-09-02']}, partition_cols=['sport', 'date'])), 2)
+        self.assertEqual(listed_prefixes, ['lake/'])
+
+    @mock_aws
+    def test_parquet_dataset_ranged_reads(self):
+        table = pa.table({'odds': list(range(200000)), 'label': ['Over', 'Under'] * 100000, 'line': [4.5] * 200000})
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, row_group_size=50000)
+        key = 'lake/sport=nfl/part_20240902120000.parquet'
+        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=buffer.getvalue())
+        ranges = []
+        self.s3_handler.s3_client.meta.events.register(
+            'provide-client-params.s3.GetObject', lambda params, **kwargs: ranges.append(params.get('Range'))
+        )
+
+        result = self.s3_handler.read_parquet_dataset('lake', columns=['odds'], filters=[('odds', '>=', 175000), ('label', '=', 'Over')])
+        self.assertEqual(result.column_names, ['odds', 'sport'])
+        self.assertEqual(result['odds'].to_pylist(), list(range(175000, 200000, 2)))
+        # Every GET is ranged; the footer plus odds and label of the last row group only
+        self.assertNotIn(None, ranges)
+        self.assertEqual(len(ranges), 3)
+        fetched = sum(int(end) - int(start) + 1 for start, end in (r[len('bytes='):].split('-') for r in ranges))
+        self.assertLess(fetched, len(buffer.getvalue()) / 3)
+
+    @mock_aws
+    def test_parallel_file_transfer(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, 'source.bin')
+            target = os.path.join(temp_dir, 'target.bin')
+            data = os.urandom(11 * 1024 * 1024)
+            with open(source, 'wb') as f:
+                f.write(data)
+
+            upload_stats = self.s3_handler.upload_file_parallel(source, 'backups/source.bin', part_size=5 * 1024 * 1024)
+            download_stats = self.s3_handler.download_file_parallel('backups/source.bin', target)
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), data)
+            self.assertEqual(upload_stats['parts'], 3)
+            self.assertEqual(download_stats['parts'], 3)
+            self.assertEqual(download_stats['bytes'], len(data))
+
+            # A part whose checksum no longer matches is rejected and the target left alone
+            manifest = json.loads(self.s3.get_object(Bucket=self.bucket_name, Key='backups/source.bin.manifest.json')['Body'].read())
+            manifest['parts'][1]['md5'] = '0' * 32
+            self.s3.put_object(Bucket=self.bucket_name, Key='backups/source.bin.manifest.json', Body=json.dumps(manifest))
+            with self.assertRaises(ValueError):
+                self.s3_handler.download_file_parallel('backups/source.bin', target)
+            self.assertFalse(os.path.exists(f'{target}.part'))
+
+            # Objects without a manifest are fetched in ranges and checked by size only
+            self.s3.put_object(Bucket=self.bucket_name, Key='plain.bin', Body=data[:1000])
+            self.s3_handler.download_file_parallel('plain.bin', target, part_size=300)
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), data[:1000])
+
+    @mock_aws
+    def test_incremental_backup_chunks_follow_blocks(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, 'source.db')
+            target = os.path.join(temp_dir, 'target.db')
+            # A 300-byte header followed by 1 KiB blocks
+            data = bytearray(os.urandom(300 + 4 * 1024))
+            with open(source, 'wb') as f:
+                f.write(data)
+            backup = lambda name: self.s3_handler.upload_file_incremental(source, 'backups', name, chunk_size=1024, first_chunk_size=300)
+            self.assertEqual(backup('first')['uploaded_chunks'], 5)
+
+            # Changing one block changes one chunk, and the chunk store is not listed
+            data[300 + 1024 + 5] ^= 0xFF
+            with open(source, 'wb') as f:
+                f.write(data)
+            listed = []
+            self.s3_handler.s3_client.meta.events.register('provide-client-params.s3.ListObjectsV2', lambda params, **kwargs: listed.append(params))
+            self.assertEqual(backup('second')['uploaded_chunks'], 1)
+            self.assertEqual(listed, [])
+
+            self.s3_handler.download_file_incremental('backups', 'second', target)
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), bytes(data))
+
 
 if __name__ == '__main__':
     unittest.main()
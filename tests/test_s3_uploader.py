@@ -0,0 +1,77 @@
+import unittest
+import threading
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+from handlers.s3_handler import S3Handler
+from handlers.s3_uploader import BackgroundUploader
+from handlers.retry_policy import RetryPolicy
+
+def client_error(status_code: int) -> ClientError:
+    return ClientError({'Error': {'Code': str(status_code)}, 'ResponseMetadata': {'HTTPStatusCode': status_code}}, 'PutObject')
+
+class TestBackgroundUploader(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_aws = mock_aws()
+        self.mock_aws.start()
+        self.bucket_name = 'background-uploads'
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket=self.bucket_name)
+        self.s3_handler = S3Handler(bucket_name=self.bucket_name)
+
+    def tearDown(self):
+        self.mock_aws.stop()
+
+    def test_put_object_and_flush(self):
+        with self.s3_handler.background_uploader(max_workers=4) as uploader:
+            for i in range(10):
+                uploader.put_object(f'objects/{i}.json', b'{}')
+            latencies = uploader.flush()
+            summary = uploader.report()
+
+        keys = [item['Key'] for item in self.s3.list_objects_v2(Bucket=self.bucket_name)['Contents']]
+        self.assertEqual(len(keys), 10)
+        self.assertEqual(sorted(latency['key'] for latency in latencies), sorted(keys))
+        self.assertEqual(summary['uploads'], 10)
+        self.assertEqual(summary['bytes'], 20)
+
+    def test_submit_blocks_when_queue_is_full(self):
+        release = threading.Event()
+        with BackgroundUploader(self.s3_handler, max_workers=2, max_pending_bytes=10) as uploader:
+            uploader.submit('a', release.wait, size=8)
+            blocked = threading.Thread(target=lambda: uploader.submit('b', lambda: None, size=8))
+            blocked.start()
+            blocked.join(timeout=0.2)
+            self.assertTrue(blocked.is_alive())
+            release.set()
+            blocked.join(timeout=5)
+            self.assertFalse(blocked.is_alive())
+            uploader.flush()
+        self.assertEqual(uploader.pending_bytes, 0)
+
+    def test_retries_transient_errors(self):
+        calls = []
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise client_error(503)
+            return 'ok'
+
+        with BackgroundUploader(self.s3_handler, retry_policy=RetryPolicy(5, max_backoff_secs=0)) as uploader:
+            self.assertEqual(uploader.submit('flaky', flaky).result(), 'ok')
+            self.assertEqual(uploader.flush()[0]['attempts'], 3)
+
+    def test_flush_raises_fatal_errors(self):
+        def forbidden():
+            raise client_error(403)
+
+        with BackgroundUploader(self.s3_handler, retry_policy=RetryPolicy(5, max_backoff_secs=0)) as uploader:
+            uploader.submit('forbidden', forbidden)
+            uploader.put_object('fine.json', b'{}')
+            with self.assertRaises(ClientError):
+                uploader.flush()
+        self.assertEqual(uploader.retry_policy.attempts['forbidden'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
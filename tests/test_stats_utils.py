@@ -0,0 +1,80 @@
+import unittest
+import numpy as np
+import pandas as pd
+from utils.stats_utils import (
+    VIG_REMOVAL_METHODS, american_odds_to_probability, american_to_decimal, decimal_to_american,
+    probability_to_american, overround, hold, remove_vig, remove_vig_two_way, calculate_vig_free_odds_and_vig
+)
+
+class TestStatsUtils(unittest.TestCase):
+
+    def test_conversions(self):
+        # Scalars stay scalars
+        self.assertIsInstance(american_odds_to_probability(-110), float)
+        self.assertAlmostEqual(american_odds_to_probability(-110), 110 / 210)
+        np.testing.assert_allclose(american_odds_to_probability([150, -150]), [0.4, 0.6])
+        np.testing.assert_allclose(american_to_decimal([-150, 150, 100]), [5 / 3, 2.5, 2.0])
+        np.testing.assert_allclose(decimal_to_american([5 / 3, 2.5, 2.0]), [-150, 150, 100])
+        np.testing.assert_allclose(probability_to_american([0.6, 0.4]), [-150, 150])
+        self.assertTrue(np.isnan(american_to_decimal([np.nan])[0]))
+
+    def test_overround_and_hold(self):
+        implied = american_odds_to_probability([-110, -110])
+        self.assertAlmostEqual(overround(implied), 20 / 420)
+        self.assertAlmostEqual(hold(implied), 1 - 210 / 220)
+        np.testing.assert_allclose(overround([[0.55, 0.55, np.nan], [0.4, 0.4, 0.4]]), [0.1, 0.2])
+
+    def test_two_way_matches_row_by_row(self):
+        over_odds = pd.Series([-110, 150, -200, 120, None], dtype='Int32')
+        under_odds = pd.Series([-110, -180, 160, -140, -110], dtype='Int32')
+        p_over, p_under = remove_vig_two_way(over_odds, under_odds)
+        for i in range(4):
+            expected_over, _ = calculate_vig_free_odds_and_vig(over_odds[i], 'over', under_odds[i])
+            expected_under, _ = calculate_vig_free_odds_and_vig(over_odds[i], 'under', under_odds[i])
+            self.assertAlmostEqual(p_over[i], expected_over)
+            self.assertAlmostEqual(p_under[i], expected_under)
+        # Missing a side
+        self.assertTrue(np.isnan(p_over[4]) and np.isnan(p_under[4]))
+
+    def test_methods_sum_to_one(self):
+        markets = np.array([
+            [0.5, 0.3, 0.3],
+            [0.6, 0.45, np.nan],
+            [0.25, 0.25, 0.25], # Underround
+            [0.9, 0.08, 0.07]
+        ])
+        for method in VIG_REMOVAL_METHODS:
+            fair = remove_vig(markets, method=method)
+            np.testing.assert_allclose(np.nansum(fair, axis=1), 1, err_msg=method)
+            self.assertTrue(np.isnan(fair[1, 2]))
+            # Equal prices stay equal
+            np.testing.assert_allclose(fair[2], [1 / 3] * 3, err_msg=method)
+
+    def test_longshot_bias(self):
+        favourite, longshot = american_odds_to_probability([-400, 300])
+        results = {method: remove_vig([favourite, longshot], method=method) for method in VIG_REMOVAL_METHODS}
+        # power and shin take more of the margin from the longshot than multiplicative
+        self.assertLess(results['power'][1], results['multiplicative'][1])
+        self.assertLess(results['shin'][1], results['multiplicative'][1])
+        # For two outcomes Shin's model reduces to the additive method
+        np.testing.assert_allclose(results['shin'], results['additive'])
+
+    def test_power_and_shin_solutions(self):
+        implied = np.array([0.5, 0.3, 0.3])
+        power = remove_vig(implied, method='power')
+        k = np.log(power[0]) / np.log(implied[0])
+        np.testing.assert_allclose(power, implied ** k)
+
+        # Shin's model prices each outcome at pi^2 / sum(pi) = z p + (1 - z) p^2, for one z
+        shin = remove_vig(implied, method='shin')
+        priced = implied ** 2 / implied.sum()
+        z = (priced[0] - shin[0] ** 2) / (shin[0] - shin[0] ** 2)
+        self.assertGreater(z, 0)
+        np.testing.assert_allclose(priced, z * shin + (1 - z) * shin ** 2)
+
+    def test_rejects_unknown_method(self):
+        with self.assertRaises(ValueError):
+            remove_vig([0.5, 0.5], method='proportional')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import os
+import tempfile
+import httpx
+from handlers.validator_store import ValidatorStore
+from handlers.async_request_handler import AsyncRequestHandler
+
+class TestValidatorStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'validators.json')
+        self.url = 'https://example.com/offers'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_unknown_url_has_no_conditional_headers(self):
+        validator_store = ValidatorStore(self.path)
+
+        self.assertEqual(validator_store.conditional_headers(self.url), {})
+
+    def test_validators_persist_only_after_save(self):
+        validator_store = ValidatorStore(self.path)
+        response = httpx.Response(200, headers={'ETag': '"abc"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}, content=b'{}')
+
+        self.assertFalse(validator_store.is_unchanged(self.url, response))
+        self.assertEqual(ValidatorStore(self.path).validators, {})
+
+        validator_store.save()
+        reloaded = ValidatorStore(self.path)
+        self.assertEqual(reloaded.conditional_headers(self.url), {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'
+        })
+
+    def test_only_stored_urls_are_saved(self):
+        validator_store = ValidatorStore(self.path)
+        failed_url = 'https://example.com/unparseable'
+        validator_store.is_unchanged(self.url, httpx.Response(200, content=b'{"a": 1}'))
+        validator_store.is_unchanged(failed_url, httpx.Response(200, content=b'not json'))
+        validator_store.save(urls=[self.url])
+
+        reloaded = ValidatorStore(self.path)
+        self.assertTrue(reloaded.is_unchanged(self.url, httpx.Response(200, content=b'{"a": 1}')))
+        # The response that was not stored is not skipped next time
+        self.assertFalse(reloaded.is_unchanged(failed_url, httpx.Response(200, content=b'not json')))
+
+    def test_matching_body_hash_is_unchanged(self):
+        validator_store = ValidatorStore(self.path)
+        validator_store.is_unchanged(self.url, httpx.Response(200, content=b'{"a": 1}'))
+        validator_store.save()
+
+        self.assertTrue(validator_store.is_unchanged(self.url, httpx.Response(200, content=b'{"a": 1}')))
+        self.assertFalse(validator_store.is_unchanged(self.url, httpx.Response(200, content=b'{"a": 2}')))
+
+    def test_not_modified_is_unchanged(self):
+        validator_store = ValidatorStore(self.path)
+
+        self.assertTrue(validator_store.is_unchanged(self.url, httpx.Response(304)))
+
+    def test_async_request_handler_sends_conditional_requests(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.headers.get('If-None-Match') == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, headers={'ETag': '"v1"'}, content=b'{"offers": []}')
+
+        validator_store = ValidatorStore(self.path)
+        request_handler = AsyncRequestHandler(3, validator_store=validator_store, transport=httpx.MockTransport(handler))
+
+        [(_, first)] = request_handler.fetch_all([('offers', self.url)])
+        validator_store.save()
+        [(_, second)] = request_handler.fetch_all([('offers', self.url)])
+
+        self.assertFalse(first.unchanged)
+        self.assertEqual(second.status_code, 304)
+        self.assertTrue(second.unchanged)
+
+if __name__ == '__main__':
+    unittest.main()
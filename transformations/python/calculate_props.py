@@ -1,4 +1,3 @@
-import duckdb
 import json
 import sys
 import numpy as np
@@ -6,8 +5,9 @@ import pandas as pd
 from datetime import datetime
 from collections import defaultdict
 from scipy.stats import poisson, norm, expon, lognorm, gamma
-from utils.stats_utils import calculate_vig_free_odds_and_vig, poisson_mean_from_market, gamma_mean_from_market, calculate_gamma_scale
+from utils.stats_utils import remove_vig_two_way, poisson_mean_from_market, gamma_mean_from_market, calculate_gamma_scale
 from utils.stats_utils import gamma_over_100_prob, evaluate_normal_distribution, fit_normal_to_qb_data
+from handlers.duckdb_handler import DuckDBHandler
 
 def get_positions(
         conn,
@@ -52,19 +52,16 @@ def get_positions(
     # Return a dictionary of distinct participant names and their positions
     return merged_df.drop_duplicates(subset='participant_name').set_index('participant_name')['position'].to_dict()
 
-def query_weekly_scores(db_path, table_name, position, stat_category) -> list:
+def query_weekly_scores(conn, table_name, position, stat_category) -> list:
     """
     :params:
-        db_path: Path to database.
+        conn: Database connection.
         table_name: Name of table to query.
         position: Player position to query.
         stat_category: Stat category to query.
     :returns:
         A list of weekly scores for the given position.
     """
-    # Connect to the DuckDB database
-    conn = duckdb.connect(database=db_path, read_only=False)
-
     # Execute the query and fetch the results into a DataFrame
     # TODO: may want to filter this further for a better scale.
     if (position == 'QB') and (stat_category == 'passing_yards'):
@@ -86,25 +83,59 @@ def query_weekly_scores(db_path, table_name, position, stat_category) -> list:
         """
     df = conn.execute(query).fetchdf()
     weekly_scores = df[f'{stat_category}'].tolist()
-    
-    # Close the connection
-    conn.close()
 
     return weekly_scores
 
-def execute_query_and_calculate_props(db_path, sql_file_path):
-    # Connect to the DuckDB database
-    conn = duckdb.connect(database=db_path, read_only=False)
+def create_run_odds_view(conn, run_id=None) -> int:
+    """
+    Creates the run_odds temp view that select_raw_props.sql reads: the odds snapshot
+    seen by an ingest run, with the run's start time as run_started_at.
+
+    The latest completed run reads current_dk_odds, which holds only open intervals, so
+    its cost does not grow with the history. An earlier run, or the latest one while a
+    newer run is still in progress and may have changed current prices, is filtered out
+    of the full history with dk_odds_as_of_run.
+
+    :params:
+        conn: Database connection.
+        run_id: Ingest run to read. Defaults to the latest completed run.
+    :returns:
+        The run ID read.
+    """
+    latest_run_id = conn.execute("SELECT run_id FROM latest_ingest_run").fetchone()[0]
+    if run_id is None:
+        run_id = latest_run_id
+    newer_runs_in_progress = conn.execute(
+        "SELECT count(*) FROM ingest_runs WHERE run_id > ? AND status = 'running'", [run_id]
+    ).fetchone()[0]
+    if run_id == latest_run_id and newer_runs_in_progress == 0:
+        odds = "current_dk_odds"
+    else:
+        odds = f"dk_odds_as_of_run({int(run_id)})"
+    conn.execute(f"""
+    CREATE OR REPLACE TEMP VIEW run_odds AS
+    SELECT o.*, r.started_at AS run_started_at
+    FROM {odds} o, (SELECT started_at FROM ingest_runs WHERE run_id = {int(run_id)}) r
+    """)
+    return run_id
+
+def execute_query_and_calculate_props(db_path, sql_file_path, run_id=None):
+    # Share the process-wide connection, e.g. with a flow that has the database open
+    duckdb_handler = DuckDBHandler(db_path)
+    conn = duckdb_handler.get_cursor()
     
     # Read the SQL query from the file
     with open(sql_file_path, 'r') as file:
         query = file.read()
+
+    # Project from the latest completed ingest run unless told otherwise
+    create_run_odds_view(conn, run_id)
     
     # Execute the query and fetch the results into a DataFrame
     df = conn.execute(query).fetchdf()
     
-    df['p_over_vig_free'] = df.apply(lambda row: calculate_vig_free_odds_and_vig(row['over_odds'], 'over', row['under_odds'])[0], axis=1)
-    df['p_under_vig_free'] = df.apply(lambda row: calculate_vig_free_odds_and_vig(row['under_odds'], 'over', row['over_odds'])[0], axis=1)
+    # Whole columns at once; props missing a side come out NaN
+    df['p_over_vig_free'], df['p_under_vig_free'] = remove_vig_two_way(df['over_odds'], df['under_odds'])
 
     # Match players to their position
     position_dict = get_positions(
@@ -138,12 +169,12 @@ def execute_query_and_calculate_props(db_path, sql_file_path):
     for position in positions:
         for category in gamma_categories:
             player_weekly_category = category_map[category]
-            weekly_scores = query_weekly_scores(db_path, 'fact_player_weekly', position, player_weekly_category)
+            weekly_scores = query_weekly_scores(conn, 'fact_player_weekly', position, player_weekly_category)
             shape, loc, scale = gamma.fit(weekly_scores)
             gamma_scales[position][player_weekly_category] = scale
         if position == 'QB':
             player_weekly_category = category_map['Pass Yards O/U']
-            weekly_scores = query_weekly_scores(db_path, 'fact_player_weekly', position, player_weekly_category)
+            weekly_scores = query_weekly_scores(conn, 'fact_player_weekly', position, player_weekly_category)
             mu, sigma = fit_normal_to_qb_data(weekly_scores)
 
     # TODO: save these to json
@@ -191,8 +222,8 @@ def execute_query_and_calculate_props(db_path, sql_file_path):
     df['fpts'] = (df['mean_outcome'] * df['fpts_per']) + (df['prob_bonus'] * 3)
     df['fpts'] = df['fpts'].round(1)
 
-    # Close the connection
-    conn.close()
+    # Close the cursor, and the connection if nothing else is using it
+    duckdb_handler.close()
     
     return df
 
@@ -40,7 +40,7 @@ dk_data_dir = '/home/john/props/data/draftkings/player_name_matching'
 
 # Connect to your DuckDB database
 con = duckdb.connect(f'{db_path}/{db_name}')
-table1 = 'fact_dk_offers'
+table1 = 'fact_dk_odds_history'
 column_table1 = 'participant_name'
 table2 = 'players'
 column_table2 = 'display_name'
@@ -1,3 +1,10 @@
+/*
+run_odds is the odds snapshot seen by one ingest run, created by
+create_run_odds_view in calculate_props.py: current_dk_odds (open intervals
+only) for the latest completed run, dk_odds_as_of_run for an earlier one.
+timestamp is when that run started; valid_from is when each price first
+appeared, possibly many runs earlier.
+*/
 with 
 	overs as (
 		select
@@ -5,9 +12,10 @@ with
 			subcategory_name ,
 			outcome_label ,
 			outcome_line ,
-			outcome_oddsAmerican::int as over_odds ,
-			timestamp
-		from main.fact_dk_offers 
+			outcome_oddsAmerican as over_odds ,
+			run_started_at as timestamp ,
+			valid_from
+		from run_odds
 		where 
 			outcome_label = 'Over'
 			/* fantasy-relevant stats categories */
@@ -15,14 +23,6 @@ with
 				'FG Made', 'Interceptions O/U', 'Pass TDs O/U', 'Pass Yards O/U', 'Rec Yards O/U',
 				'Receptions', 'Rush + Rec Yards O/U', 'Rush Yards O/U', 'PAT Made'
 			)
-			/* 
-			shortest run: 6:24
-			longest run: 7:13
-
-			using 15:00 as the timestamp cutoff; this should 
-			avoid pulling from older runs.
-			*/
-			and timestamp > (select max(timestamp) from main.fact_dk_offers) - interval '15 minutes'
 	),
 	unders as (
 		select
@@ -30,30 +30,30 @@ with
 			subcategory_name ,
 			outcome_label ,
 			outcome_line ,
-			outcome_oddsAmerican::int as under_odds ,
-			timestamp
-		from main.fact_dk_offers 
+			outcome_oddsAmerican as under_odds ,
+			run_started_at as timestamp ,
+			valid_from
+		from run_odds
 		where 
 			outcome_label = 'Under'
 			and subcategory_name in (
 				'FG Made', 'Interceptions O/U', 'Pass TDs O/U', 'Pass Yards O/U', 'Rec Yards O/U',
 				'Receptions', 'Rush + Rec Yards O/U', 'Rush Yards O/U', 'PAT Made'
 			)
-			and timestamp > (select max(timestamp) from main.fact_dk_offers) - interval '15 minutes'
 	),
 	tds as (
 		select
 			participant_name ,
 			subcategory_name ,
 			0.5 as outcome_line ,
-			outcome_oddsAmerican::int as over_odds ,
-			outcome_oddsAmerican::int * -1 as under_odds ,
-			timestamp
-		from main.fact_dk_offers 
+			outcome_oddsAmerican as over_odds ,
+			-outcome_oddsAmerican as under_odds ,
+			run_started_at as timestamp ,
+			valid_from
+		from run_odds
 		where 
 			subcategory_name = 'TD Scorer'
 			and offer_label = 'Anytime TD Scorer'
-			and timestamp > (select max(timestamp) from main.fact_dk_offers) - interval '15 minutes'
 	)
 select
 	o.participant_name ,
@@ -61,7 +61,8 @@ select
 	o.outcome_line ,
 	o.over_odds ,
 	u.under_odds ,
-	o.timestamp 
+	o.timestamp ,
+	o.valid_from
 from overs o
 join unders u
 	on 
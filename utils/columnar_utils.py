@@ -0,0 +1,242 @@
+import math
+import orjson
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Union
+
+################################################################################
+# DraftKings offers, columnar
+################################################################################
+# Same columns, in the same order, as the rows built by utils.parse_dk_offers.
+DK_OFFER_COLUMNS = [
+    'subcategory_subcategoryId',
+    'subcategory_name',
+    'offer_label',
+    'offer_providerOfferId',
+    'offer_eventId',
+    'offer_eventGroupId',
+    'offer_playerNameIdentifier',
+    'outcome_label',
+    'outcome_oddsAmerican',
+    'outcome_oddsDecimal',
+    'outcome_line',
+    'participant_id',
+    'participant_name',
+    'participant_type',
+    'timestamp'
+]
+# Low-cardinality string columns, stored as int32 codes into a per-batch dictionary.
+DK_OFFER_DICTIONARY_COLUMNS = ['subcategory_name', 'outcome_label', 'participant_name', 'participant_type']
+# Numeric DraftKings IDs, stored as int64 (BIGINT in DuckDB).
+DK_OFFER_ID_COLUMNS = ['subcategory_subcategoryId', 'offer_eventId', 'offer_eventGroupId', 'participant_id']
+DK_OFFER_OBJECT_COLUMNS = [
+    'subcategory_subcategoryId', 'offer_label', 'offer_providerOfferId', 'offer_eventId',
+    'offer_eventGroupId', 'offer_playerNameIdentifier', 'participant_id'
+]
+
+def normalize_american_odds(odds: Any) -> Optional[int]:
+    """
+    Converts American odds as DraftKings sends them ('+150', '-110', or with a Unicode
+    minus sign, '−110') to an int.
+
+    Args:
+        odds (Any): Odds as a string or number.
+
+    Returns:
+        Optional[int]: The odds, or None if missing or malformed.
+    """
+    if odds is None or odds == '':
+        return None
+    if isinstance(odds, float) and not math.isfinite(odds):
+        return None
+    if isinstance(odds, (int, float)):
+        return int(odds)
+    try:
+        return int(odds.replace('−', '-').replace('+', '').strip())
+    except (AttributeError, ValueError):
+        return None
+
+def normalize_id(value: Any) -> Optional[int]:
+    """
+    Converts a DraftKings ID, sent either as a number or a numeric string, to an int.
+
+    Args:
+        value (Any): ID as a string or number.
+
+    Returns:
+        Optional[int]: The ID, or None if missing or malformed.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def parse_dk_offers_columnar(raw: Union[bytes, str], timestamp: str) -> Dict[str, Any]:
+    """
+    Parses a raw DraftKings response straight into typed column buffers, producing the
+    same rows as parse_dk_offers without building a dictionary per row.
+
+    Odds are int32 with a validity mask, decimal odds and lines are float64 (NaN when
+    missing), the timestamp is datetime64, the columns in DK_OFFER_ID_COLUMNS are ints
+    (None when missing), and the columns in DK_OFFER_DICTIONARY_COLUMNS are int32 codes
+    into a dictionary of distinct values.
+
+    Args:
+        raw (Union[bytes, str]): Response body, e.g. response.content.
+        timestamp (str): 14-character timestamp string.
+
+    Returns:
+        Dict[str, Any]: {'num_rows': int, 'columns': {name: np.ndarray},
+                         'dictionaries': {name: np.ndarray}, 'masks': {name: np.ndarray}}
+    """
+    data = orjson.loads(raw)
+
+    objects = {name: [] for name in DK_OFFER_OBJECT_COLUMNS}
+    codes = {name: [] for name in DK_OFFER_DICTIONARY_COLUMNS}
+    dictionaries = {name: {} for name in DK_OFFER_DICTIONARY_COLUMNS}
+    odds_american, odds_valid, odds_decimal, lines = [], [], [], []
+
+    def encode(name: str, value: str) -> None:
+        dictionary = dictionaries[name]
+        code = dictionary.get(value)
+        if code is None:
+            code = dictionary[value] = len(dictionary)
+        codes[name].append(code)
+
+    for category in data.get("eventGroup", {}).get("offerCategories", []):
+        for subcategory in category.get("offerSubcategoryDescriptors", []):
+            offer_subcategory = subcategory.get("offerSubcategory")
+            if not offer_subcategory or "offers" not in offer_subcategory:
+                continue
+            subcategory_id = normalize_id(subcategory.get("subcategoryId"))
+            subcategory_name = subcategory.get("name", "")
+            for offer_list in offer_subcategory["offers"]:  # offers is a list of lists
+                for offer in offer_list:
+                    offer_values = (
+                        offer.get("label", ""),
+                        offer.get("providerOfferId", ""),
+                        normalize_id(offer.get("eventId")),
+                        normalize_id(offer.get("eventGroupId")),
+                        offer.get("playerNameIdentifier", "")
+                    )
+                    for outcome in offer["outcomes"]:
+                        odds = normalize_american_odds(outcome.get("oddsAmerican"))
+                        odds_decimal_value = outcome.get("oddsDecimal")
+                        line = outcome.get("line")
+                        for participant in outcome.get("participants", []):
+                            objects['subcategory_subcategoryId'].append(subcategory_id)
+                            objects['offer_label'].append(offer_values[0])
+                            objects['offer_providerOfferId'].append(offer_values[1])
+                            objects['offer_eventId'].append(offer_values[2])
+                            objects['offer_eventGroupId'].append(offer_values[3])
+                            objects['offer_playerNameIdentifier'].append(offer_values[4])
+                            objects['participant_id'].append(normalize_id(participant.get("id")))
+                            encode('subcategory_name', subcategory_name)
+                            encode('outcome_label', outcome.get("label", ""))
+                            encode('participant_name', participant.get("name", ""))
+                            encode('participant_type', participant.get("type", ""))
+                            odds_american.append(odds or 0)
+                            odds_valid.append(odds is not None)
+                            odds_decimal.append(np.nan if odds_decimal_value is None else odds_decimal_value)
+                            lines.append(np.nan if line is None else line)
+
+    num_rows = len(odds_american)
+    columns = {name: np.array(values, dtype=object) for name, values in objects.items()}
+    columns.update({name: np.array(values, dtype=np.int32) for name, values in codes.items()})
+    columns['outcome_oddsAmerican'] = np.array(odds_american, dtype=np.int32)
+    columns['outcome_oddsDecimal'] = np.array(odds_decimal, dtype=np.float64)
+    columns['outcome_line'] = np.array(lines, dtype=np.float64)
+    columns['timestamp'] = np.full(num_rows, np.datetime64(datetime.strptime(timestamp, '%Y%m%d%H%M%S'), 's'))
+    return {
+        'num_rows': num_rows,
+        'columns': columns,
+        'dictionaries': {name: np.array(list(values), dtype=object) for name, values in dictionaries.items()},
+        'masks': {'outcome_oddsAmerican': np.array(odds_valid, dtype=bool)}
+    }
+
+def concat_dk_offers_columnar(batches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Concatenates columnar batches, merging their dictionaries and remapping codes.
+
+    Args:
+        batches (List[Dict[str, Any]]): Output of parse_dk_offers_columnar. Empty entries are skipped.
+
+    Returns:
+        Dict[str, Any]: A single batch in the same layout.
+    """
+    batches = [batch for batch in batches if batch and batch['num_rows']]
+    if not batches:
+        return parse_dk_offers_columnar(b'{}', datetime.now().strftime('%Y%m%d%H%M%S'))
+
+    columns, dictionaries = {}, {}
+    for name in DK_OFFER_COLUMNS:
+        if name in DK_OFFER_DICTIONARY_COLUMNS:
+            merged = pd.Index(np.concatenate([batch['dictionaries'][name] for batch in batches])).unique()
+            remapped = [merged.get_indexer(batch['dictionaries'][name]).astype(np.int32)[batch['columns'][name]] for batch in batches]
+            columns[name] = np.concatenate(remapped)
+            dictionaries[name] = np.asarray(merged, dtype=object)
+        else:
+            columns[name] = np.concatenate([batch['columns'][name] for batch in batches])
+    return {
+        'num_rows': sum(batch['num_rows'] for batch in batches),
+        'columns': columns,
+        'dictionaries': dictionaries,
+        'masks': {name: np.concatenate([batch['masks'][name] for batch in batches]) for name in batches[0]['masks']}
+    }
+
+def dk_offers_columnar_to_dataframe(batch: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Converts a columnar batch to a DataFrame with categorical columns for the
+    dictionary-encoded columns and nullable integer odds.
+
+    Args:
+        batch (Dict[str, Any]): Output of parse_dk_offers_columnar or concat_dk_offers_columnar.
+
+    Returns:
+        pd.DataFrame: One row per participant-outcome, columns in DK_OFFER_COLUMNS order.
+    """
+    data = {}
+    for name in DK_OFFER_COLUMNS:
+        values = batch['columns'][name]
+        if name in DK_OFFER_DICTIONARY_COLUMNS:
+            data[name] = pd.Categorical.from_codes(values, categories=pd.Index(batch['dictionaries'][name], dtype=object))
+        elif name in batch['masks']:
+            data[name] = pd.arrays.IntegerArray(values, ~batch['masks'][name])
+        else:
+            data[name] = values
+    return pd.DataFrame(data, columns=DK_OFFER_COLUMNS)
+
+def dk_offers_columnar_to_arrow(batch: Dict[str, Any]) -> pa.Table:
+    """
+    Converts a columnar batch to an Arrow table without going through pandas. The
+    dictionary-encoded columns become DictionaryArrays over the batch's dictionaries.
+
+    Args:
+        batch (Dict[str, Any]): Output of parse_dk_offers_columnar or concat_dk_offers_columnar.
+
+    Returns:
+        pa.Table: One row per participant-outcome, columns in DK_OFFER_COLUMNS order.
+    """
+    arrays = []
+    for name in DK_OFFER_COLUMNS:
+        values = batch['columns'][name]
+        if name in DK_OFFER_DICTIONARY_COLUMNS:
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(values, type=pa.int32()),
+                pa.array(batch['dictionaries'][name], type=pa.string())
+            ))
+        elif name in batch['masks']:
+            arrays.append(pa.array(values, mask=~batch['masks'][name]))
+        elif name == 'timestamp':
+            arrays.append(pa.array(values, type=pa.timestamp('s')))
+        elif name in DK_OFFER_ID_COLUMNS:
+            arrays.append(pa.array(values, type=pa.int64()))
+        elif name in ('outcome_oddsDecimal', 'outcome_line'):
+            arrays.append(pa.array(values, from_pandas=True)) # NaN -> null
+        else:
+            arrays.append(pa.array([None if value is None else str(value) for value in values], type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=DK_OFFER_COLUMNS)
@@ -1,25 +1,212 @@
+import numpy as np
 from scipy.optimize import minimize_scalar, fsolve
 from scipy.stats import poisson, norm, expon, lognorm, gamma
 
+VIG_REMOVAL_METHODS = ('multiplicative', 'additive', 'power', 'shin')
+
+def _to_float_array(values) -> np.ndarray:
+    """
+    Converts a scalar, list, array or pandas Series (including nullable integer columns)
+    to a float64 array, with missing values as NaN.
+    """
+    if hasattr(values, 'to_numpy'):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+def _scalar_or_array(result: np.ndarray):
+    # Scalars in, Python float out, so scalar callers see no change
+    return float(result) if result.ndim == 0 else result
 
 def american_odds_to_probability(odds):
     """
     Convert American betting odds to the corresponding probability.
     
     Parameters:
-    odds (int): The American odds value. Can be positive or negative.
+    odds (int or array-like): The American odds value(s). Can be positive or negative.
 
     Returns:
-    float: The probability of the event occurring, as calculated from the odds.
+    float or np.ndarray: The probability of the event occurring, as calculated from the odds.
     """
-    if odds > 0:
-        # For positive odds
-        probability = 100 / (odds + 100)
-    else:
-        # For negative odds
-        probability = -odds / (-odds + 100)
-    
-    return probability
+    odds = _to_float_array(odds)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probability = np.where(odds > 0, 100 / (odds + 100), -odds / (-odds + 100))
+    return _scalar_or_array(probability)
+
+def american_to_decimal(odds):
+    """
+    Convert American odds to decimal odds, e.g. -150 -> 1.667 and +150 -> 2.5.
+
+    Parameters:
+    odds (int or array-like): American odds. Missing values give NaN.
+
+    Returns:
+    float or np.ndarray: Decimal odds.
+    """
+    odds = _to_float_array(odds)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        decimal = np.where(odds > 0, odds / 100 + 1, 100 / np.abs(odds) + 1)
+    return _scalar_or_array(decimal)
+
+def decimal_to_american(decimal):
+    """
+    Convert decimal odds to American odds, e.g. 1.667 -> -150 and 2.5 -> +150.
+
+    Parameters:
+    decimal (float or array-like): Decimal odds, greater than 1.
+
+    Returns:
+    float or np.ndarray: American odds, unrounded.
+    """
+    decimal = _to_float_array(decimal)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        american = np.where(decimal >= 2, (decimal - 1) * 100, -100 / (decimal - 1))
+    return _scalar_or_array(american)
+
+def decimal_to_probability(decimal):
+    """
+    Convert decimal odds to the implied probability, 1 / decimal.
+    """
+    with np.errstate(divide='ignore'):
+        return _scalar_or_array(1 / _to_float_array(decimal))
+
+def probability_to_decimal(probability):
+    """
+    Convert a probability to fair decimal odds, 1 / probability.
+    """
+    with np.errstate(divide='ignore'):
+        return _scalar_or_array(1 / _to_float_array(probability))
+
+def probability_to_american(probability):
+    """
+    Convert a probability to fair American odds, e.g. 0.6 -> -150 and 0.4 -> +150.
+    """
+    return decimal_to_american(probability_to_decimal(probability))
+
+def overround(implied_probs, axis: int = -1):
+    """
+    The bookmaker's margin as the amount the implied probabilities of a market exceed 1,
+    e.g. 0.0476 for a -110/-110 market. This is the 'vig' of calculate_vig_free_odds_and_vig.
+
+    Parameters:
+    implied_probs (array-like): Implied probabilities, one market per row. NaN marks
+        outcomes a market does not have.
+    axis (int): Axis of the outcomes.
+
+    Returns:
+    float or np.ndarray: Overround per market.
+    """
+    return _scalar_or_array(np.nansum(_to_float_array(implied_probs), axis=axis) - 1)
+
+def hold(implied_probs, axis: int = -1):
+    """
+    The bookmaker's theoretical hold: the share of money staked it keeps if a market is
+    bet in proportion to its implied probabilities, 1 - 1 / sum(implied_probs), e.g.
+    0.0455 for a -110/-110 market.
+
+    Parameters:
+    implied_probs (array-like): Implied probabilities, one market per row. NaN marks
+        outcomes a market does not have.
+    axis (int): Axis of the outcomes.
+
+    Returns:
+    float or np.ndarray: Hold per market.
+    """
+    return _scalar_or_array(1 - 1 / np.nansum(_to_float_array(implied_probs), axis=axis))
+
+def remove_vig(implied_probs, method: str = 'multiplicative', max_iter: int = 100, tol: float = 1e-12) -> np.ndarray:
+    """
+    Remove the vig from whole markets at once, turning implied probabilities that sum to
+    more than 1 into fair probabilities that sum to 1.
+
+    Methods:
+    - multiplicative: scale every probability by the same factor, p / sum(p).
+    - additive: subtract the same amount from every probability, p - (sum(p) - 1) / n.
+      Longshots can come out negative.
+    - power: raise every probability to the same power k, with k solved so they sum to 1.
+      Takes more of the margin from longshots.
+    - shin: Shin's model, which assumes the margin protects the bookmaker against a share
+      z of insider money; z is solved per market. Also takes more from longshots.
+
+    power (Newton's method on k) and shin (bisection on z) iterate on every market in the
+    array together, so there is no per-market Python loop.
+
+    Parameters:
+    implied_probs (array-like): Implied probabilities of shape (markets, outcomes), or
+        (outcomes,) for a single market. NaN marks outcomes a market does not have; markets
+        with fewer than two outcomes come out as NaN.
+    method (str): One of VIG_REMOVAL_METHODS.
+    max_iter (int): Iteration limit for power and shin.
+    tol (float): Convergence tolerance for power and shin.
+
+    Returns:
+    np.ndarray: Fair probabilities, the same shape as implied_probs.
+    """
+    if method not in VIG_REMOVAL_METHODS:
+        raise ValueError(f"method must be one of {VIG_REMOVAL_METHODS}, got {method!r}")
+    probs = np.atleast_2d(_to_float_array(implied_probs))
+    valid = ~np.isnan(probs)
+    n = valid.sum(axis=1, keepdims=True)
+    filled = np.where(valid, probs, 0.0)
+    total = filled.sum(axis=1, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'multiplicative':
+            fair = filled / total
+        elif method == 'additive':
+            fair = filled - (total - 1) / n
+        elif method == 'power':
+            # Newton's method on f(k) = sum(p^k) - 1, which is convex and decreasing in k
+            log_probs = np.where(valid & (filled > 0), np.log(filled), 0.0)
+            k = np.ones_like(total)
+            for _ in range(max_iter):
+                powered = np.where(valid, np.exp(k * log_probs), 0.0)
+                f = powered.sum(axis=1, keepdims=True) - 1
+                df = (powered * log_probs).sum(axis=1, keepdims=True)
+                step = np.where(df != 0, f / df, 0.0)
+                k = k - step
+                if np.nanmax(np.abs(step), initial=0.0) < tol:
+                    break
+            fair = np.where(valid, np.exp(k * log_probs), 0.0)
+        else:
+            squared = filled ** 2 / total
+
+            def shin_probs(z):
+                return (np.sqrt(z ** 2 + 4 * (1 - z) * squared) - z) / (2 * (1 - z))
+
+            # The fair probabilities sum to less as z grows, to sqrt(total) at z = 0
+            # and at least 1 at z = -1, so bisect for the z where they sum to 1
+            low = np.full_like(total, -1.0)
+            high = np.ones_like(total)
+            for _ in range(max_iter):
+                z = (low + high) / 2
+                too_high = np.where(valid, shin_probs(z), 0.0).sum(axis=1, keepdims=True) > 1
+                low = np.where(too_high, z, low)
+                high = np.where(too_high, high, z)
+                if np.max(high - low, initial=0.0) < tol:
+                    break
+            fair = shin_probs((low + high) / 2)
+
+    fair = np.where(valid & (n >= 2), fair, np.nan)
+    return fair[0] if np.ndim(implied_probs) == 1 else fair
+
+def remove_vig_two_way(over_odds, under_odds, method: str = 'multiplicative'):
+    """
+    Vig-free probabilities for whole columns of two-way markets at once, e.g. the over and
+    under odds of every prop in a DataFrame. With the default method this matches
+    calculate_vig_free_odds_and_vig row by row.
+
+    Parameters:
+    over_odds (array-like): American odds of the first outcome.
+    under_odds (array-like): American odds of the second outcome.
+    method (str): One of VIG_REMOVAL_METHODS, see remove_vig.
+
+    Returns:
+    tuple: (p_over, p_under) arrays. Markets missing either side give NaN.
+    """
+    over_probs = _to_float_array(american_odds_to_probability(over_odds))
+    under_probs = _to_float_array(american_odds_to_probability(under_odds))
+    fair = remove_vig(np.column_stack([np.atleast_1d(over_probs), np.atleast_1d(under_probs)]), method=method)
+    return fair[:, 0], fair[:, 1]
 
 def calculate_vig_free_odds_and_vig(over_odds, over_under, under_odds):
     # Convert American odds to decimal odds